@@ -5,17 +5,24 @@ Can be used as an easy library to create egg files for Panda3d.
 Written by Jeroen van der Heijden.
 
 """
+from contextlib import contextmanager
 from .entrytypes.entrytype import EntryType
 from .entrytypes.comment import MixInComment
 from .entrytypes.coordinatesystem import MixInCoordinateSystem
 from .entrytypes.group import MixInGroup, MixInInstance
 from .entrytypes.material import MixInMaterial
+from .entrytypes.opaque import MixInOpaque
 from .entrytypes.texture import MixInTexture
 from .entrytypes.vertexpool import MixInVertexPool
+from .entrytypes.parser import read
+from .entrytypes.reader import EventReader, iter_events
+from .entrytypes.profiler import Profiler
+from .entrytypes.validation import test_dangling
+from .entrytypes.heightfield import grid
 
 __version_info__ = (0, 1, 0)
 __version__ = ".".join(map(str, __version_info__))
-__all__ = ["Pegg", "Cube"]
+__all__ = ["Pegg", "Cube", "Heightfield", "load", "iter_events", "EventReader", "Profiler"]
 
 
 
@@ -27,12 +34,79 @@ class Pegg(
         MixInGroup,
         MixInInstance,
         MixInMaterial,
+        MixInOpaque,
         MixInTexture,
         MixInVertexPool):
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
 
+    @staticmethod
+    def from_string(text):
+        """
+        Returns a new Pegg instance with all entries read from the given egg text.
+
+        Vertices and polygons are stored in bulk (see add_vertices() and
+        append_polygons()) where possible. Entries which pegg does not know
+        are kept as Opaque entries, so prettify() writes them again, with their
+        content and child entries, but after the other entries of their parent
+        instead of at their original place. // and /* */ comments are dropped,
+        <Comment> entries are kept.
+
+        Numbers are written again like they are read when one precision (like
+        the precision argument of add_vertices()) or str() reproduces them, so
+        egg files written by pegg with or without a precision are written again
+        unchanged. Other numbers, like
+        "1 0.5", keep their value but are written with str(): "1.0 0.5".
+        """
+        pegg = Pegg()
+        read(pegg, text)
+        return pegg
+
+    @contextmanager
+    def deferred_validation(self):
+        """
+        Skips checking the references to VertexPools, vertices, Textures, Materials
+        and uv-names when entries are added within the with block, and checks all
+        references at once when the block ends, see validate(). Use this when
+        building from data which is known to be valid:
+
+            with pegg.deferred_validation():
+                group.append_polygon(1, 2, 3, ref="pool")
+                ...
+
+        Writing the egg text within the block checks all references first as well.
+        Entries with invalid references are not removed when the check fails.
+        """
+        registry = self._registry
+        registry.deferred += 1
+        try:
+            yield self
+        finally:
+            registry.deferred -= 1
+        if not registry.deferred:
+            self.validate()
+
+    def validate(self):
+        """
+        Checks all references in this pegg instance and raises a ValueError
+        listing every reference to a VertexPool, vertex, Texture, Material or
+        uv-name which does not exist.
+        """
+        test_dangling(self)
+
+def load(path):
+    """
+    Returns a new Pegg instance with all entries read from the egg file at the
+    given path, see Pegg.from_string().
+    """
+    with open(path, encoding="utf-8") as fileobj:
+        return Pegg.from_string(fileobj.read())
+
 class Cube(Pegg):
+    __slots__ = ()
+
     def __init__(self, size=2):
         # Initialize superclass
         super().__init__()
@@ -64,3 +138,27 @@ class Cube(Pegg):
         group.append_polygon(2, 6, 7, 3, ref="Cube")
         group.append_polygon(4, 0, 3, 7, ref="Cube")
 
+class Heightfield(Pegg):
+    """
+    A terrain mesh built from a 2D array with heights, like a heightmap image.
+
+    heights : The height (z) of each grid point, a 2D NumPy array or a sequence of
+              rows. The rows go along the y axis, the columns along the x axis.
+    spacing : The distance between the grid points, one number or (x, y).
+    uv_scale : The uvs go from 0 to uv_scale over the terrain, one number or (u, v).
+               Use a larger value to repeat the texture over the terrain.
+    precision : The decimals of the written values, see add_vertices().
+
+    The vertices are numbered row by row from 0 and stored in arrays with their
+    normals and uvs in the VertexPool "Heightfield", each grid cell is split in
+    two triangles. No Vertex or Polygon EntryTypes are created, with NumPy the
+    values are computed without a Python loop.
+    """
+    __slots__ = ()
+
+    def __init__(self, heights, spacing=1.0, uv_scale=1.0, precision=None):
+        super().__init__()
+        numbers, coords, normals, uvs, indices = grid(heights, spacing, uv_scale)
+        group = self.add_group("Heightfield")
+        group.add_vertexpool("Heightfield").add_vertices(numbers, coords, normals=normals, uvs=uvs, precision=precision)
+        group.append_polygons(indices, "Heightfield", counts=3)
@@ -0,0 +1,5 @@
+"""
+Benchmarks for pegg, run them as a module, for example:
+
+    python -m pegg.benchmarks.formatting
+"""
@@ -0,0 +1,49 @@
+"""
+Benchmark for the float formatting used when exporting, reported in numbers formatted per second.
+
+    python -m pegg.benchmarks.formatting [--count COUNT] [--precision PRECISION]
+"""
+import argparse
+import io
+import random
+import time
+from array import array
+from .. import Pegg
+from ..entrytypes.tools import fstr, fjoin, frows, numpy
+
+def measure(function, count):
+    """
+    Returns the numbers formatted per second when function formats count numbers.
+    """
+    start = time.perf_counter()
+    function()
+    return count / (time.perf_counter() - start)
+
+def run(count=10**6, precision=None):
+    values = [random.uniform(-1000, 1000) for _ in range(count)]
+    buffers = [("list", values), ("array", array("d", values))]
+    if numpy is not None:
+        buffers.append(("numpy", numpy.array(values)))
+    results = {"fstr (per value)": measure(lambda: " ".join([fstr(value, precision) for value in values]), count)}
+    for name, buffer in buffers:
+        results["fjoin ({0})".format(name)] = measure(lambda: fjoin(buffer, precision), count)
+        results["frows ({0})".format(name)] = measure(lambda: frows(buffer, precision, 3), count)
+
+    # Complete export of a VertexPool with normals, 6 numbers for each vertex
+    pegg = Pegg()
+    vertexpool = pegg.add_group("Benchmark").add_vertexpool("Benchmark")
+    vertices = count // 6
+    vertexpool.add_vertices(range(vertices), values[:vertices*3], normals=values[vertices*3:vertices*6], precision=precision)
+    results["export (VertexPool.write)"] = measure(lambda: pegg.write(io.StringIO()), vertices * 6)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--count", type=int, default=10**6, help="numbers to format (default: %(default)s)")
+    parser.add_argument("--precision", type=int, default=None, help="decimals, omit for str() formatting")
+    args = parser.parse_args()
+    for name, rate in run(args.count, args.precision).items():
+        print("{0:<28} {1:>14,.0f} numbers/s".format(name, rate))
+
+if __name__ == "__main__":
+    main()
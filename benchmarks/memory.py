@@ -0,0 +1,79 @@
+"""
+Benchmark for the memory used by a single node, reported in bytes per node for common entry types.
+
+    python -m pegg.benchmarks.memory [--count COUNT]
+"""
+import argparse
+import tracemalloc
+from .. import Pegg
+
+def measure(build, count):
+    """
+    Returns the bytes allocated per node when build(pegg, count) adds count nodes.
+    """
+    pegg = Pegg()
+    texture = pegg.add_texture("texture", "texture.png")
+    texture.set_uv_name("uv")
+    pegg.add_material("material")
+    group = pegg.add_group("group")
+    vertexpool = group.add_vertexpool("pool")
+    for number in range(3):
+        vertexpool.add_vertex(number, 0.0, 0.0, 0.0)
+    tracemalloc.start()
+    start = tracemalloc.get_traced_memory()[0]
+    nodes = build(pegg, count)
+    used = tracemalloc.get_traced_memory()[0] - start
+    tracemalloc.stop()
+    del nodes
+    return used / count
+
+def plain_vertices(pegg, count):
+    vertexpool = pegg.groups["group"].vertexpools["pool"]
+    return [vertexpool.add_vertex(number, 1.0, 2.0, 3.0) for number in range(3, count + 3)]
+
+def vertices_with_normal_and_uv(pegg, count):
+    vertices = []
+    for vertex in plain_vertices(pegg, count):
+        vertex.set_normal(0.0, 0.0, 1.0)
+        vertex.add_uv(0.5, 0.5, name="uv")
+        vertices.append(vertex)
+    return vertices
+
+def plain_polygons(pegg, count):
+    group = pegg.groups["group"]
+    return [group.append_polygon(0, 1, 2, ref="pool") for _ in range(count)]
+
+def polygons_with_mref_and_tref(pegg, count):
+    polygons = plain_polygons(pegg, count)
+    for polygon in polygons:
+        polygon.set_mref("material")
+        polygon.append_tref("texture")
+    return polygons
+
+def groups(pegg, count):
+    group = pegg.groups["group"]
+    return [group.add_group(number) for number in range(count)]
+
+def comments(pegg, count):
+    for _ in range(count):
+        pegg.append_comment("comment")
+
+def run(count=10**4):
+    # Every node is counted with the nodes below it, for example a polygon is a Polygon, VertexRef and Ref
+    return {
+        "Vertex": measure(plain_vertices, count),
+        "Vertex + Normal + UV": measure(vertices_with_normal_and_uv, count),
+        "Polygon (3 nodes)": measure(plain_polygons, count),
+        "Polygon + MRef + TRef (5 nodes)": measure(polygons_with_mref_and_tref, count),
+        "Group": measure(groups, count),
+        "Comment": measure(comments, count)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--count", type=int, default=10**4, help="nodes to create for each entry type (default: %(default)s)")
+    args = parser.parse_args()
+    for name, size in run(args.count).items():
+        print("{0:<34} {1:>10,.0f} bytes".format(name, size))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+Benchmark for exporting top-level groups in parallel with write(workers=N), reported in seconds and speedup.
+
+    python -m pegg.benchmarks.parallel [--groups GROUPS] [--vertices VERTICES] [--workers WORKERS ...]
+"""
+import argparse
+import io
+import os
+import random
+import time
+from array import array
+from .. import Pegg
+
+def build(groups, vertices):
+    """
+    Returns a Pegg instance with the given number of top-level groups, each with a
+    VertexPool and as many triangles as vertices.
+    """
+    pegg = Pegg()
+    pegg.set_cache(False)
+    for index in range(groups):
+        group = pegg.add_group("Group{0}".format(index))
+        name = "Pool{0}".format(index)
+        group.add_vertexpool(name).add_vertices(array("q", range(1, vertices+1)), [random.uniform(-1000, 1000) for _ in range(vertices*3)])
+        group.append_polygons(array("q", [random.randint(1, vertices) for _ in range(vertices*3)]), name)
+    return pegg
+
+def run(groups=64, vertices=5000, workers=(1, 2, 4)):
+    """
+    Returns a dict with the seconds for writing the egg file with each number of workers.
+    """
+    pegg = build(groups, vertices)
+    results = {}
+    for count in workers:
+        start = time.perf_counter()
+        pegg.write(io.StringIO(), workers=count)
+        results[count] = time.perf_counter() - start
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--groups", type=int, default=64, help="top-level groups (default: %(default)s)")
+    parser.add_argument("--vertices", type=int, default=5000, help="vertices for each group (default: %(default)s)")
+    parser.add_argument("--workers", type=int, nargs="+", default=sorted({1, 2, 4, os.cpu_count() or 1}), help="numbers of workers")
+    args = parser.parse_args()
+    results = run(args.groups, args.vertices, args.workers)
+    serial = results[min(results)]
+    for count, seconds in results.items():
+        print("{0:>3} workers {1:>8.3f} s {2:>6.2f}x".format(count, seconds, serial / seconds))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+Benchmark for reading egg files with pegg.load() and pegg.iter_events(), reported in MB/s.
+
+    python -m pegg.benchmarks.reading [--vertices VERTICES] [FILE ...]
+
+Without files, an egg file with a VertexPool and triangles is generated.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from array import array
+from .. import Pegg, load, iter_events
+
+def generate(path, vertices):
+    """
+    Writes an egg file with a VertexPool with normals and uvs and as many triangles as vertices.
+    """
+    pegg = Pegg()
+    group = pegg.add_group("Benchmark")
+    vertexpool = group.add_vertexpool("Benchmark")
+    vertexpool.add_vertices(
+        array("q", range(1, vertices+1)),
+        [random.uniform(-1000, 1000) for _ in range(vertices*3)],
+        normals=[0.0, 0.0, 1.0] * vertices,
+        uvs=[random.random() for _ in range(vertices*2)])
+    group.append_polygons(array("q", [random.randint(1, vertices) for _ in range(vertices*3)]), "Benchmark")
+    pegg.write(path)
+
+def run(path):
+    """
+    Returns a dict with the MB/s for each way of reading the egg file at path.
+    """
+    size = os.path.getsize(path) / 10**6
+    start = time.perf_counter()
+    load(path)
+    results = {"load": size / (time.perf_counter() - start)}
+    reader = iter_events(path)
+    for event in reader:
+        pass
+    results["iter_events"] = reader.throughput
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--vertices", type=int, default=10**5, help="vertices in the generated file (default: %(default)s)")
+    parser.add_argument("files", nargs="*", help="egg files to read")
+    args = parser.parse_args()
+    paths = args.files
+    if not paths:
+        fd, path = tempfile.mkstemp(suffix=".egg")
+        os.close(fd)
+        generate(path, args.vertices)
+        paths = [path]
+    try:
+        for path in paths:
+            for name, rate in run(path).items():
+                print("{0:<28} {1:>8.1f} MB/s".format("{0} ({1})".format(name, os.path.basename(path)), rate))
+    finally:
+        if not args.files:
+            os.remove(paths[0])
+
+if __name__ == "__main__":
+    main()
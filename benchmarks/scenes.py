@@ -0,0 +1,266 @@
+"""
+Benchmark for building and exporting synthetic scenes of increasing size, reported as JSON.
+
+    python -m pegg.benchmarks.scenes [--sizes SIZES ...] [--scenes SCENES ...] [--skip-memory] [--output FILE]
+    python -m pegg.benchmarks.scenes --compare OLD NEW
+
+Each scene is built with the given number of vertices (10**2 up to 10**7) and
+every phase is measured separately: the build time (also split in the time
+for adding the vertices and for adding the polygons), the time for looking up
+VertexPools by name, the prettify() time with the output bytes per second and
+the peak memory of building and exporting, traced with tracemalloc in a separate
+run so the tracing doesn't affect the timings (use --skip-memory for a quick
+run without the memory results, tracing is slow). Use --compare to compare the
+results of two runs, for example before and after a change.
+
+The grid scene uses the bulk add_vertices() and append_polygons(), grid_entries
+builds the same grid with add_vertex() and append_polygon(). The scenes which
+create an EntryType for each vertex and polygon (grid_entries, cubes, hierarchy
+and materials) take minutes and gigabytes of memory at 10**7 vertices.
+"""
+import argparse
+import json
+import math
+import platform
+import sys
+import time
+import tracemalloc
+from array import array
+from .. import Pegg
+from ..entrytypes.tools import numpy
+
+def grid(pegg, vertices):
+    """
+    A square grid of quads in a single VertexPool, stored in bulk with add_vertices() and append_polygons().
+    """
+    side = max(math.isqrt(vertices), 2)
+    group = pegg.add_group("Grid")
+    group.add_vertexpool("Grid").add_vertices(
+        range(side * side),
+        [value for y in range(side) for x in range(side) for value in (float(x), float(y), 0.0)],
+        uvs=[value for y in range(side) for x in range(side) for value in (x / (side - 1), y / (side - 1))])
+    yield "vertices"
+    indices = array("q")
+    for y in range(side - 1):
+        for x in range(side - 1):
+            corner = y * side + x
+            indices.extend((corner, corner + 1, corner + side + 1, corner + side))
+    group.append_polygons(indices, "Grid", counts=4)
+    yield "polygons"
+
+def grid_entries(pegg, vertices):
+    """
+    The same grid as grid, with add_vertex() and append_polygon() for each vertex and quad.
+    """
+    side = max(math.isqrt(vertices), 2)
+    group = pegg.add_group("Grid")
+    vertexpool = group.add_vertexpool("Grid")
+    for y in range(side):
+        for x in range(side):
+            vertexpool.add_vertex(y * side + x, float(x), float(y), 0.0).add_uv(x / (side - 1), y / (side - 1))
+    yield "vertices"
+    for y in range(side - 1):
+        for x in range(side - 1):
+            corner = y * side + x
+            group.append_polygon(corner, corner + 1, corner + side + 1, corner + side, ref="Grid")
+    yield "polygons"
+
+CUBE_VERTICES = [(1, 1, -1), (1, -1, -1), (-1, -1, -1), (-1, 1, -1), (1, 1, 1), (1, -1, 1), (-1, -1, 1), (-1, 1, 1)]
+CUBE_POLYGONS = [(0, 1, 2, 3), (4, 7, 6, 5), (0, 4, 5, 1), (1, 5, 6, 2), (2, 6, 7, 3), (4, 0, 3, 7)]
+
+def _add_cube_vertices(group, name, size=1.0):
+    # The same vertices and polygons as the Cube class
+    vertexpool = group.add_vertexpool(name)
+    for number, (x, y, z) in enumerate(CUBE_VERTICES):
+        vertexpool.add_vertex(number, x * size, y * size, z * size)
+
+def _add_cube_polygons(group, name):
+    for polygon in CUBE_POLYGONS:
+        group.append_polygon(*polygon, ref=name)
+
+def cubes(pegg, vertices):
+    """
+    The Cube class repeated, a group with its own VertexPool for every 8 vertices.
+    """
+    names = ["Cube{0}".format(index) for index in range(max(vertices // 8, 1))]
+    groups = [pegg.add_group(name) for name in names]
+    yield "setup"
+    for group, name in zip(groups, names):
+        _add_cube_vertices(group, name)
+    yield "vertices"
+    for group, name in zip(groups, names):
+        _add_cube_polygons(group, name)
+    yield "polygons"
+
+def hierarchy(pegg, vertices, depth=16):
+    """
+    Chains of depth nested groups, each group with a cube (8 vertices).
+    """
+    groups = []
+    for index in range(max(vertices // 8, 1)):
+        if not index % depth:
+            parent = pegg
+        parent = parent.add_group("Level{0}".format(index))
+        groups.append((parent, "Level{0}".format(index)))
+    yield "setup"
+    for group, name in groups:
+        _add_cube_vertices(group, name)
+    yield "vertices"
+    for group, name in groups:
+        _add_cube_polygons(group, name)
+    yield "polygons"
+
+def materials(pegg, vertices, polygons_per_material=100):
+    """
+    Quads with add_vertex() and append_polygon(), with a Material and two
+    Textures (with scalars) for every polygons_per_material quads.
+    """
+    count = max(vertices // 4, 1)
+    kinds = max(count // polygons_per_material, 1)
+    for index in range(kinds):
+        material = pegg.add_material("Material{0}".format(index))
+        material.set_diffuse(1.0, 0.5, 0.25, 1.0)
+        material.set_shininess(16.0)
+        for kind in ("diffuse", "normal"):
+            texture = pegg.add_texture("{0}{1}".format(kind, index), "textures/{0}{1}.png".format(kind, index))
+            texture.set_wrap("REPEAT")
+            texture.set_format("RGBA")
+    group = pegg.add_group("Materials")
+    vertexpool = group.add_vertexpool("Materials")
+    yield "setup"
+    for index in range(count):
+        start = index * 4
+        for corner, (x, y) in enumerate([(0, 0), (1, 0), (1, 1), (0, 1)]):
+            vertex = vertexpool.add_vertex(start + corner, float(index + x), float(y), 0.0)
+            vertex.add_uv(float(x), float(y))
+    yield "vertices"
+    for index in range(count):
+        start = index * 4
+        polygon = group.append_polygon(start, start + 1, start + 2, start + 3, ref="Materials")
+        kind = index % kinds
+        polygon.set_mref("Material{0}".format(kind))
+        polygon.append_tref("diffuse{0}".format(kind))
+        polygon.append_tref("normal{0}".format(kind))
+    yield "polygons"
+
+SCENES = {"grid": grid, "grid_entries": grid_entries, "cubes": cubes, "hierarchy": hierarchy, "materials": materials}
+
+def lookups(pegg, count=10**5):
+    """
+    Returns the VertexPool lookups by name per second, count lookups spread over all VertexPools.
+    """
+    names = list(pegg.vertexpools)
+    names = (names * (count // len(names) + 1))[:count]
+    start = time.perf_counter()
+    for name in names:
+        pegg.vertexpools[name]
+    return count / (time.perf_counter() - start)
+
+def phases(build, pegg, vertices):
+    """
+    Returns a dict with the seconds of each phase of building the scene, build
+    yields the name of each phase ("setup", "vertices", "polygons") when it's done.
+    """
+    seconds = {}
+    start = time.perf_counter()
+    for phase in build(pegg, vertices):
+        now = time.perf_counter()
+        seconds[phase] = now - start
+        start = now
+    return seconds
+
+def measure(build, vertices, memory=True):
+    """
+    Returns a dict with the results for building the scene with build(pegg, vertices)
+    and exporting it, without the peak memory results when memory is False.
+    The time for adding the vertices and for adding the polygons is also
+    given separately.
+    """
+    pegg = Pegg()
+    seconds = phases(build, pegg, vertices)
+    lookups_per_second = lookups(pegg)
+    start = time.perf_counter()
+    text = pegg.prettify()
+    prettify_seconds = time.perf_counter() - start
+    size = len(text.encode("utf-8"))
+    del pegg, text
+    results = {
+        "build_seconds": sum(seconds.values()),
+        "vertices_seconds": seconds["vertices"],
+        "polygons_seconds": seconds["polygons"],
+        "lookups_per_second": lookups_per_second,
+        "prettify_seconds": prettify_seconds,
+        "output_bytes": size,
+        "output_bytes_per_second": size / prettify_seconds}
+    if not memory:
+        return results
+
+    tracemalloc.start()
+    pegg = Pegg()
+    phases(build, pegg, vertices)
+    build_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.reset_peak()
+    pegg.prettify()
+    prettify_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    results["build_peak_bytes"] = build_peak
+    results["prettify_peak_bytes"] = prettify_peak
+    return results
+
+def run(sizes=(10**2, 10**3, 10**4, 10**5), scenes=tuple(SCENES), memory=True):
+    """
+    Returns a dict with the environment and the results by scene and number of vertices.
+    """
+    results = {}
+    for scene in scenes:
+        results[scene] = {str(vertices): measure(SCENES[scene], vertices, memory) for vertices in sizes}
+    return {
+        "python": platform.python_version(),
+        "numpy": None if numpy is None else numpy.__version__,
+        "results": results}
+
+def compare(old, new):
+    """
+    Yields a line for each result found in both old and new, with the ratio new / old.
+    Higher is better for the results per second, lower is better for all other results.
+    """
+    yield "{0:<10} {1:>9} {2:<24} {3:>14} {4:>14} {5:>7}".format("scene", "vertices", "result", "old", "new", "new/old")
+    for scene, sizes in new["results"].items():
+        for vertices, results in sizes.items():
+            previous = old["results"].get(scene, {}).get(vertices)
+            if previous is None:
+                continue
+            for name, value in results.items():
+                if name not in previous:
+                    continue
+                ratio = value / previous[name] if previous[name] else float("inf")
+                better = ratio > 1 if name.endswith("_per_second") else ratio < 1
+                yield "{0:<10} {1:>9} {2:<24} {3:>14,.4g} {4:>14,.4g} {5:>6.2f}{6}".format(
+                    scene, vertices, name, previous[name], value, ratio, "" if ratio == 1 or name == "output_bytes" else "+" if better else "-")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().split("\n")[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10**2, 10**3, 10**4, 10**5], help="numbers of vertices (default: %(default)s)")
+    parser.add_argument("--scenes", nargs="+", choices=list(SCENES), default=list(SCENES), help="scenes to build (default: all)")
+    parser.add_argument("--skip-memory", action="store_true", help="skip the peak memory results")
+    parser.add_argument("--output", help="file to write the JSON results to, omit for stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two JSON result files instead of running")
+    args = parser.parse_args()
+    if args.compare:
+        files = []
+        for path in args.compare:
+            with open(path) as file:
+                files.append(json.load(file))
+        for line in compare(*files):
+            print(line)
+        return
+    results = run(args.sizes, args.scenes, not args.skip_memory)
+    if args.output:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,8 @@ from .entrytype import EntryType
 from .tools import strname
 
 class Comment(EntryType):
+    __slots__ = ("_comment", )
+
     def __init__(self, parent, comment):
         super().__init__(parent=parent)
         self._comment = strname(comment, quote=True)
@@ -10,6 +12,9 @@ class Comment(EntryType):
         return self._comment
 
 class MixInComment:
+    __slots__ = ()
+    _entrytypes = ("Comment", )
+
     def append_comment(self, comment):
         """
         <Comment> { text }
@@ -21,3 +26,4 @@ class MixInComment:
         it's safest to quote the entire comment.
         """
         self._entries["Comment"].append(Comment(self, comment))
+        self._changed()
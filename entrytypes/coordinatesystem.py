@@ -1,6 +1,8 @@
 from .entrytype import EntryType
 
 class CoordinateSystem(EntryType):
+    __slots__ = ("_coordinatesystem", )
+
     def __init__(self, parent, coordinatesystem):
         coordinatesystems = ["Y-up", "Z-up", "Y-up-right", "Z-up-right", "Y-up-left", "Z-up-left"]
         if coordinatesystem not in coordinatesystems:
@@ -12,6 +14,9 @@ class CoordinateSystem(EntryType):
         return self._coordinatesystem
 
 class MixInCoordinateSystem:
+    __slots__ = ()
+    _entrytypes = ("CoordinateSystem", )
+
     def set_coordinatesystem(self, coordinatesystem="Y-up"):
         """
         <CoordinateSystem> { string }
@@ -28,6 +33,7 @@ class MixInCoordinateSystem:
         If it is omitted, Y-up is assumed.
         """
         self._entries["CoordinateSystem"] = CoordinateSystem(self, coordinatesystem)
+        self._changed()
 
     def get_coordinatesystem(self):
         """
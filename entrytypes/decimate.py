@@ -0,0 +1,160 @@
+"""
+This is not an EntryType module. The decimation used by generate_lods() is defined here.
+"""
+import heapq
+import math
+
+def _plane(p, q, r):
+    """
+    Returns the unit normal (a, b, c), d of the plane ax + by + cz + d = 0 and
+    the area of the triangle p q r, None for a degenerate triangle.
+    """
+    ux, uy, uz = q[0] - p[0], q[1] - p[1], q[2] - p[2]
+    vx, vy, vz = r[0] - p[0], r[1] - p[1], r[2] - p[2]
+    nx, ny, nz = uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+    length = math.sqrt(nx * nx + ny * ny + nz * nz)
+    if not length:
+        return None
+    nx, ny, nz = nx / length, ny / length, nz / length
+    return nx, ny, nz, -(nx * p[0] + ny * p[1] + nz * p[2]), length / 2
+
+def _add_plane(quadric, a, b, c, d, weight):
+    # The quadric is the upper triangle of the symmetric 4x4 matrix (a b c d)^T (a b c d), times weight
+    for position, value in enumerate((a * a, a * b, a * c, a * d, b * b, b * c, b * d, c * c, c * d, d * d)):
+        quadric[position] += weight * value
+
+def _error(quadric, point):
+    """
+    Returns the sum of the squared (weighted) distances of point to the planes of the quadric.
+    """
+    x, y, z = point
+    q = quadric
+    return (q[0] * x * x + 2 * q[1] * x * y + 2 * q[2] * x * z + 2 * q[3] * x + q[4] * y * y
+        + 2 * q[5] * y * z + 2 * q[6] * y + q[7] * z * z + 2 * q[8] * z + q[9])
+
+def _normal(p, q, r):
+    ux, uy, uz = q[0] - p[0], q[1] - p[1], q[2] - p[2]
+    vx, vy, vz = r[0] - p[0], r[1] - p[1], r[2] - p[2]
+    return uy * vz - uz * vy, uz * vx - ux * vz, ux * vy - uy * vx
+
+def decimate(triangles, coordinates, targets, boundary_weight=1000.0, max_angle=45.0):
+    """
+    Returns a list with the decimated triangles for each of the given targets,
+    a list of (index, (a, b, c)) tuples with the index in triangles of the
+    triangle it is made of, in the order of triangles.
+
+    triangles : A sequence with the (a, b, c) vertex numbers of each triangle.
+    coordinates : A function which returns the (x, y, z) coordinates for a list of vertex numbers.
+    targets : The number of triangles to keep for each result.
+    boundary_weight : The weight of the planes which keep the edges used by
+                      a single triangle (the border of the mesh) in place.
+    max_angle : The maximum change in degrees of the normal of a triangle by a collapse.
+
+    Edges are collapsed in the order of the quadric error metric of Garland and
+    Heckbert: each vertex holds the sum of the squared distances to the planes
+    of its triangles (weighted by their area), and the cost of moving vertex v
+    onto vertex u is the sum of both quadrics at the position of u (for each
+    edge the direction with the lowest cost is used). Vertices
+    are only moved onto a neighbour (half-edge collapse), so no vertices are
+    added and the normals and uvs of the vertices stay valid. A collapse is
+    skipped when it would fold the mesh (a triangle normal turns more than
+    max_angle) or make it non-manifold. The collapses are done once for all
+    targets, from the largest to the smallest, in O(n log n) time.
+    Degenerate triangles are left out, a target may not be reached when no
+    more edges can be collapsed.
+    """
+    triangles = [tuple(triangle) for triangle in triangles]
+    numbers = list(dict.fromkeys(number for triangle in triangles for number in triangle))
+    points = dict(zip(numbers, coordinates(numbers) if numbers else ()))
+    quadrics = {number: [0.0] * 10 for number in numbers}
+    faces = {number: set() for number in numbers} # The indices of the triangles using each vertex
+    alive = bytearray(len(triangles))
+    edges = {} # The number of triangles and the last triangle using each edge
+    for index, (a, b, c) in enumerate(triangles):
+        if a == b or b == c or c == a:
+            continue
+        alive[index] = 1
+        plane = _plane(points[a], points[b], points[c])
+        for number in (a, b, c):
+            faces[number].add(index)
+            if plane is not None:
+                _add_plane(quadrics[number], *plane)
+        for edge in ((a, b), (b, c), (c, a)):
+            key = (edge[0], edge[1]) if edge[0] < edge[1] else (edge[1], edge[0])
+            count = edges.get(key, (0, index))[0]
+            edges[key] = (count + 1, index)
+    for (a, b), (count, index) in edges.items():
+        plane = _plane(*(points[number] for number in triangles[index]))
+        if count != 1 or plane is None:
+            continue
+        # A plane through the border edge, perpendicular to the triangle
+        p, q = points[a], points[b]
+        ex, ey, ez = q[0] - p[0], q[1] - p[1], q[2] - p[2]
+        nx, ny, nz = ey * plane[2] - ez * plane[1], ez * plane[0] - ex * plane[2], ex * plane[1] - ey * plane[0]
+        length = math.sqrt(nx * nx + ny * ny + nz * nz)
+        if length:
+            nx, ny, nz = nx / length, ny / length, nz / length
+            for number in (a, b):
+                _add_plane(quadrics[number], nx, ny, nz, -(nx * p[0] + ny * p[1] + nz * p[2]), boundary_weight * length * length)
+
+    stamps = dict.fromkeys(numbers, 0) # Changed when the quadric of a vertex changes, -1 when it is removed
+
+    def candidate(a, b):
+        # Moving a onto b or b onto a, whichever costs less
+        quadric = [x + y for x, y in zip(quadrics[a], quadrics[b])]
+        to_b, to_a = _error(quadric, points[b]), _error(quadric, points[a])
+        if to_a < to_b:
+            return to_a, stamps[b], stamps[a], b, a
+        return to_b, stamps[a], stamps[b], a, b
+
+    heap = [candidate(a, b) for a, b in edges]
+    heapq.heapify(heap)
+    minimum = math.cos(math.radians(max_angle))
+
+    def collapse(v, u):
+        # Moves v onto u, returns the number of triangles removed, 0 when the collapse is not allowed
+        shared = faces[v] & faces[u]
+        if not shared:
+            return 0
+        neighbours_v = {number for index in faces[v] for number in triangles[index]} - {v}
+        neighbours_u = {number for index in faces[u] for number in triangles[index]} - {u}
+        opposite = {number for index in shared for number in triangles[index]} - {u, v}
+        if neighbours_v & neighbours_u != opposite:
+            return 0
+        moved = []
+        for index in faces[v] - shared:
+            triangle = triangles[index]
+            new = tuple(u if number == v else number for number in triangle)
+            before = _normal(*(points[number] for number in triangle))
+            after = _normal(*(points[number] for number in new))
+            dot = before[0] * after[0] + before[1] * after[1] + before[2] * after[2]
+            lengths = math.sqrt((before[0] ** 2 + before[1] ** 2 + before[2] ** 2) * (after[0] ** 2 + after[1] ** 2 + after[2] ** 2))
+            if not lengths or dot < minimum * lengths:
+                return 0
+            moved.append((index, new))
+        for index in shared:
+            alive[index] = 0
+            for number in triangles[index]:
+                faces[number].discard(index)
+        for index, new in moved:
+            triangles[index] = new
+            faces[u].add(index)
+        faces[v].clear()
+        quadrics[u] = [a + b for a, b in zip(quadrics[u], quadrics[v])]
+        stamps[u] += 1
+        stamps[v] = -1
+        for number in neighbours_u | neighbours_v:
+            if stamps[number] >= 0 and number != u:
+                heapq.heappush(heap, candidate(number, u))
+        return len(shared)
+
+    count = sum(alive)
+    results = {}
+    for target in sorted(set(targets), reverse=True):
+        while count > target and heap:
+            cost, stamp_v, stamp_u, v, u = heapq.heappop(heap)
+            if stamps[v] != stamp_v or stamps[u] != stamp_u:
+                continue
+            count -= collapse(v, u)
+        results[target] = [(index, triangles[index]) for index in range(len(triangles)) if alive[index]]
+    return [results[target] for target in targets]
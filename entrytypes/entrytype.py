@@ -1,31 +1,174 @@
 from .tools import strname, ProtectedDict
+from .registry import Registry
+from .parallel import render
+
+# The container used for each kind of child entry, None means only one entry of this kind is allowed
+CONTAINERS = dict(
+    Binormal=None,
+    Comment=list,
+    CoordinateSystem=None,
+    Group=dict,
+    Instance=dict,
+    Material=dict,
+    Matrix3=None,
+    Matrix4=None,
+    MRef=None,
+    Normal=None,
+    Polygon=list,
+    Ref=None,
+    Rotate=None,
+    Scalar=dict,
+    Texture=dict,
+    Tangent=None,
+    Transform=None,
+    TRef=list,
+    UV=dict,
+    Vertex=dict,
+    VertexPool=dict,
+    VertexRef=list,
+    Opaque=list,
+)
+
+# The order in which the child entries are written in the egg file, after the content and the scalars
+ENTRY_ORDER = (
+    "Comment", "CoordinateSystem", "Transform", "Matrix3", "Matrix4", "Rotate",
+    "MRef", "TRef", "Normal", "Tangent", "Binormal", "Texture", "Material",
+    "VertexPool", "Vertex", "VertexRef", "Polygon", "Ref", "Group", "Instance",
+    "UV", "Opaque")
+
+# Pieces of cached egg text of at least this length, like the text of a cached child,
+# are kept by reference by the cached text of the parent instead of being copied
+SHARED_TEXT_SIZE = 2**8
+
+# The slot names of each EntryType class, see EntryType._copy()
+_SLOTS = {}
+_MISSING = object()
+
+class Entries(dict):
+    """
+    Holds the child entries of an EntryType by kind. The list or dict for a kind
+    is only created the first time it is used, and only for the kinds the owner
+    allows. A missing single-entry kind reads as None.
+    """
+    __slots__ = ("_allowed", )
+
+    def __init__(self, allowed):
+        super().__init__()
+        self._allowed = allowed
+
+    def __missing__(self, key):
+        if key not in self._allowed:
+            raise KeyError("{0!r} entries are not allowed here.".format(key))
+        container = CONTAINERS[key]
+        if container is None:
+            return None
+        value = self[key] = container()
+        return value
 
 class EntryType:
+    __slots__ = ("_parent", "_name", "_root", "_registry", "_children")
+
+    # The kinds of child entries allowed, collected from the _entrytypes of all (MixIn) classes.
+    # Opaque entries (entries read from an egg file which pegg does not know) are allowed everywhere.
+    _entrytypes = ("Opaque", )
+    _allowed = frozenset(_entrytypes)
+
+    # True for EntryTypes which keep their egg text in the cache, see set_cache()
+    _cacheable = False
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._allowed = frozenset(name for klass in cls.__mro__ for name in vars(klass).get("_entrytypes", ()))
+
     def __init__(self, parent=None, name=None):
         self._parent = parent
         self._name = None if name is None else strname(name) # We want this to be safe string, except for None
-        self._entries = dict(
-            Comment=list(),
-            CoordinateSystem=None,
-            Group=dict(),
-            Instance=dict(),
-            Material=dict(),
-            Matrix3=None,
-            Matrix4=None,
-            MRef=None,
-            Normal=None,
-            Polygon=list(),
-            Ref=None,
-            Rotate=None,
-            Scalar=dict(),
-            Texture=dict(),
-            Transform=None,
-            TRef=list(),
-            UV=dict(),
-            Vertex=dict(),
-            VertexPool=dict(),
-            VertexRef=list(),
-        )
+        self._root = self if parent is None else parent._root
+        self._registry = Registry() if parent is None else None # Only the root keeps a registry
+        self._children = None # Created on first use, see _entries
+
+    @property
+    def _entries(self):
+        """
+        Returns the Entries with all child entries, created on first use.
+        """
+        if self._children is None:
+            self._children = Entries(self._allowed)
+        return self._children
+
+    def _peek(self, key):
+        """
+        Returns the list, dict or EntryType for the given kind without creating it, None if not set.
+        """
+        return None if self._children is None else self._children.get(key)
+
+    def _changed(self):
+        """
+        Drops the cached egg text of this EntryType and all its ancestors.
+        Every method which changes the egg text of an EntryType must call this method.
+        """
+        registry = self._root._registry
+        registry.changes += 1
+        if registry.cache or registry.templates:
+            entry = self
+            while entry is not None:
+                registry.cache.pop(entry, None)
+                registry.templates.pop(entry, None)
+                entry = entry._parent
+
+    def set_cache(self, enabled=True):
+        """
+        Turns the cache with the egg text of Groups, Instances, VertexPools, Textures
+        and Materials on or off for the total pegg instance. The cache is on by default.
+
+        When the cache is on, the egg text of these entries is kept after prettify()
+        creates it, until the entry or an entry below it is changed. Creating the
+        egg text again after a small change only creates the text for the changed
+        entries. The text of an entry is kept once, the cached text of its parent
+        refers to it. write() and iter_egg() use the cached text, but don't add
+        to the cache, so streaming a huge egg file doesn't keep its text in memory.
+        """
+        registry = self.get_pegg()._registry
+        registry.cache_enabled = enabled
+        if not enabled:
+            registry.cache.clear()
+
+    def get_cache_info(self):
+        """
+        Returns a dictionary with the cache hits, misses, the number of cached
+        entries and the total length of the cached egg text, see set_cache().
+        """
+        registry = self.get_pegg()._registry
+        return dict(
+            hits=registry.cache_hits,
+            misses=registry.cache_misses,
+            entries=len(registry.cache),
+            size=sum({id(piece): len(piece) for key, pieces in registry.cache.values() for piece in pieces}.values()))
+
+    def set_profiler(self, profiler=None):
+        """
+        Sets the Profiler which collects statistics about the egg export by
+        EntryType class, for the total pegg instance. None turns it off again.
+        Returns the profiler, see Profiler.report() for the results:
+
+            profiler = pegg.set_profiler(Profiler())
+            pegg.write("model.egg")
+            print(profiler.report())
+
+        Turn the cache off (see set_cache()) to instrument all entries, entries
+        written from the cache are counted as a whole. Exporting with workers
+        only instruments the entries which are not rendered by the workers.
+        Without a profiler, the export doesn't do any extra work.
+        """
+        self.get_pegg()._registry.profiler = profiler
+        return profiler
+
+    @property
+    def _tag(self):
+        """
+        Returns the entry type written in the <header> of this EntryType.
+        """
+        return self.__class__.__name__
 
     def __repr__(self):
         return "<{0}>".format(self.__class__.__name__) if self._name is None else "<{0} name={1!r}>".format(self.__class__.__name__, self._name)
@@ -35,22 +178,68 @@ class EntryType:
         """
         Returns a dictionary with all VertexPools within the total pegg instance.
         """
-        vertexpools = {}
-        def search_pegg(entry):
-            vertexpools.update(entry._entries["VertexPool"])
-            for group in list(entry._entries["Instance"].values()) + list(entry._entries["Group"].values()):
-                search_pegg(group)
-        search_pegg(self.get_pegg())
-        return ProtectedDict(vertexpools)
+        return ProtectedDict(self.get_pegg()._registry.vertexpools)
 
     def _get(self, key, **kwargs):
         """
         Returns a string for the Entry/Entries for the given key.
         This method can handle dict, list and a single EntryType.
         """
-        value = self._entries[key]
-        entries = value if isinstance(value, list) else self._sorted(value) if isinstance(value, dict) else (value, ) if value is not None else ""
-        return "".join([entry._prettify(**kwargs) for entry in entries])
+        return "".join(self._iter_get(key, **kwargs))
+
+    def _iter_get(self, key, **kwargs):
+        """
+        Yields the strings for the Entry/Entries for the given key, see _get().
+        """
+        entries = self._iter_entries(key)
+        if not entries:
+            return
+        profiler = self._root._registry.profiler
+        for entry in entries:
+            pieces = entry._iter_cached(**kwargs) if entry._cacheable else entry._iter_prettify(**kwargs)
+            yield from pieces if profiler is None else profiler._iter_entry(entry, pieces)
+
+    def _iter_entries(self, key):
+        """
+        Returns the child EntryTypes for the given key in the order they are written.
+        """
+        value = self._peek(key)
+        return value if isinstance(value, list) else self._sorted(value) if isinstance(value, dict) else (value, ) if value is not None else ()
+
+    def _iter_cached(self, indentation, compact, _level=0):
+        """
+        Yields the egg text like _iter_prettify() from the cache, or creates it.
+        The text is only added to the cache while prettify() creates it.
+        """
+        registry = self._root._registry
+        key = (indentation, compact, _level)
+        cached = registry.cache.get(self)
+        if cached is not None and cached[0] == key:
+            registry.cache_hits += 1
+            yield from cached[1]
+            return
+        if not (registry.cache_enabled and registry.filling):
+            yield from self._iter_prettify(indentation, compact, _level)
+            return
+        registry.cache_misses += 1
+        changes = registry.changes
+        pieces, short = [], []
+        for pretty in self._iter_prettify(indentation, compact, _level):
+            if len(pretty) < SHARED_TEXT_SIZE:
+                short.append(pretty)
+                continue
+            if short:
+                pieces.append("".join(short))
+                short = []
+            pieces.append(pretty)
+        if short:
+            pieces.append("".join(short))
+        pieces = tuple(pieces)
+        # Don't cache the text if anything was changed while the text was created
+        if registry.changes == changes and registry.cache_enabled:
+            registry.cache[self] = (key, pieces)
+        # The parent gets the cached pieces, so it refers to the same text
+        yield from pieces
 
     @staticmethod
     def _sorted(dictionary):
@@ -77,7 +266,8 @@ class EntryType:
         """
         Returns the content of the given scalar, None if the scalar is not found.
         """
-        return self._entries["Scalar"][name].get_content() if name in self._entries["Scalar"] else None
+        scalars = self._peek("Scalar")
+        return scalars[name].get_content() if scalars and name in scalars else None
 
     def get_childs(self):
         """
@@ -85,7 +275,7 @@ class EntryType:
         Note: this method is not recursive, sub-childs are not included.
         """
         childs = []
-        for item in self._entries.values():
+        for item in (self._children or {}).values():
             if isinstance(item, list):
                 childs += item
             elif isinstance(item, dict):
@@ -94,23 +284,105 @@ class EntryType:
                 childs.append(item)
         return childs
 
+    def _has_childs(self):
+        """
+        Returns True if this instance has at least one child EntryType.
+        """
+        return self._children is not None and any(self._children.values())
+
+    def _has_only(self, kinds):
+        """
+        Returns True if this instance has no child EntryTypes other than the given kinds.
+        """
+        return all(kind in kinds or not value for kind, value in (self._children or {}).items())
+
+    def _walk(self):
+        """
+        Yields this instance and all EntryTypes below it.
+        Entries which are only created on demand (like the vertices in a VertexArray) are not included.
+        """
+        stack = [self]
+        while stack:
+            entry = stack.pop()
+            yield entry
+            stack.extend(EntryType.get_childs(entry))
+
+    def _iter_ordered(self):
+        """
+        Yields this instance and all EntryTypes below it in the order they are written in the egg file.
+        Scalars and entries which are only created on demand are not included.
+        """
+        yield self
+        for key in ENTRY_ORDER:
+            for entry in self._iter_entries(key):
+                yield from entry._iter_ordered()
+
+    def _copy(self, parent):
+        """
+        Returns a copy of this EntryType and all EntryTypes below it, with the given parent.
+        Values which are not EntryTypes (like content strings) are shared with the original.
+        """
+        cls = self.__class__
+        slots = _SLOTS.get(cls)
+        if slots is None:
+            slots = _SLOTS[cls] = [name for klass in cls.__mro__ for name in getattr(klass, "__slots__", ())]
+        entry = cls.__new__(cls)
+        for name in slots:
+            value = getattr(self, name, _MISSING)
+            if value is not _MISSING:
+                setattr(entry, name, value)
+        if hasattr(self, "__dict__"):
+            entry.__dict__.update(self.__dict__)
+        entry._parent = parent
+        entry._root = parent._root
+        if self._children is not None:
+            entry._children = Entries(self._allowed)
+            for key, value in self._children.items():
+                if isinstance(value, list):
+                    value = [child._copy(entry) for child in value]
+                elif isinstance(value, dict):
+                    value = {name: child._copy(entry) for name, child in value.items()}
+                elif value is not None:
+                    value = value._copy(entry)
+                entry._children[key] = value
+        return entry
+
+    def _share(self):
+        """
+        Replaces the shared entries directly below this EntryType by the shared
+        entries of its own pegg instance, see InternedEntryType.
+        """
+        children = self._children
+        for key, value in list(children.items()) if children else ():
+            if isinstance(value, list):
+                children[key] = [child._copy(self) if isinstance(child, InternedEntryType) else child for child in value]
+            elif isinstance(value, dict):
+                children[key] = {name: child._copy(self) if isinstance(child, InternedEntryType) else child for name, child in value.items()}
+            elif isinstance(value, InternedEntryType):
+                children[key] = value._copy(self)
+
     def get_pegg(self, _entry=None):
         """
         Returns the top-level Pegg instance.
         """
-        if _entry is None: _entry = self
-        if _entry._parent is not None:
-            _entry = _entry.get_pegg(_entry._parent)
-        return _entry
+        return (self if _entry is None else _entry)._root
 
     def get_parent(self):
         """
         Returns the parent EntryType.
         None will be returned if this method is ran from the root (Pegg) instance.
+        TRef, MRef, Ref and Scalar entries are shared, their parent is the root
+        (Pegg) instance, see InternedEntryType.
         """
         return self._parent
 
     def _prettify(self, indentation, compact, _level=0):
+        return "".join(self._iter_prettify(indentation, compact, _level))
+
+    def _iter_prettify(self, indentation, compact, _level=0):
+        """
+        Yields the egg text for this EntryType and all its childs, depth-first.
+        """
         # Lower the _level by one if this is the root of the pegg instance
         _level -= self._parent == None
 
@@ -119,50 +391,64 @@ class EntryType:
             "compact":compact,
             "_level":_level+1}
 
-        content = self.get_content()
+        profiler = self._root._registry.profiler
+        content = self.get_content() if profiler is None else profiler.get_content(self)
 
         # Set "On one line" to true if compact is set to True and the EntryType contains only one line content.
-        on_one_line = compact and (not self.get_childs() and (content is None or "\n" not in content))
-
-        # Start with an empty list
-        pretty = []
+        on_one_line = compact and (not self._has_childs() and (content is None or "\n" not in content))
 
         # Add the header except if this is the root
         if self._parent is not None:
-            pretty.append("{indentation}<{entryType}>{name}{{{separator}".format(
+            yield "{indentation}<{entryType}>{name}{{{separator}".format(
                 indentation=indentation*_level,
-                entryType=self.__class__.__name__,
+                entryType=self._tag,
                 name=" {0} ".format(self._name) if self._name else " ",
-                separator=" " if on_one_line else "\n"))
+                separator=" " if on_one_line else "\n")
 
         # Add the content
         if content:
             for line in content.split("\n"):
-                pretty.append("{indentation}{line}{separator}".format(
+                yield "{indentation}{line}{separator}".format(
                     indentation="" if on_one_line else indentation*(_level+1),
                     line=line,
-                    separator=" " if on_one_line else "\n"))
+                    separator=" " if on_one_line else "\n")
 
-        # We want the scalers in order which is defined by the _scalers attribute of the class
-        if hasattr(self.__class__, "_scalars"):
-            for name in [name for name in self.__class__._scalars if name in self._entries["Scalar"]]:
-                pretty.append(self._entries["Scalar"][name]._prettify(**kwargs))
+        # We want the scalers in order which is defined by the _scalers attribute of the class,
+        # other scalars (for example read from an egg file) follow in the order they were added.
+        scalars = self._peek("Scalar")
+        if scalars:
+            order = getattr(self.__class__, "_scalars", ())
+            for name in [name for name in order if name in scalars] + [name for name in scalars if name not in order]:
+                pieces = scalars[name]._iter_prettify(**kwargs)
+                yield from pieces if profiler is None else profiler._iter_entry(scalars[name], pieces)
 
-        # Here we define the order of how entrytypes are appliad in the egg file.
-        for entryname in [
-                "Comment", "CoordinateSystem", "Transform", "Matrix3", "Matrix4", "Rotate",
-                "MRef", "TRef", "Normal", "Texture", "Material", "VertexPool", "Vertex",
-                "VertexRef", "Polygon", "Ref", "Group", "Instance", "UV"]:
-            pretty.append(self._get(entryname, **kwargs))
+        # The order of how entrytypes are appliad in the egg file is defined by ENTRY_ORDER.
+        for entryname in ENTRY_ORDER:
+            yield from self._iter_get(entryname, **kwargs)
 
         # Close the EntryType, except if this is the root
         if self._parent is not None:
-            pretty.append("{indentation}}}\n".format(indentation="" if on_one_line else indentation*_level))
+            yield "{indentation}}}\n".format(indentation="" if on_one_line else indentation*_level)
 
-        # Return the pretty string
-        return "".join(pretty)
+    def _render_groups(self, indentation, compact, workers):
+        """
+        Renders the child Groups and Instances which are not in the cache with
+        a pool of workers and puts their egg text in the cache, see parallel.render().
+        Returns the list of rendered entries.
+        """
+        registry = self._root._registry
+        level = 0 if self._parent is None else 1
+        key = (indentation, compact, level)
+        entries = [entry for kind in ("Group", "Instance") for entry in self._sorted(self._peek(kind) or {})
+            if registry.cache.get(entry, (None, ))[0] != key]
+        if len(entries) > 1:
+            registry.cache_misses += len(entries)
+            for entry, text in zip(entries, render(entries, indentation, compact, level, workers)):
+                registry.cache[entry] = (key, (text, ))
+            return entries
+        return []
 
-    def prettify(self, indentation=" "*4, compact=True):
+    def prettify(self, indentation=" "*4, compact=True, workers=None):
         """
         Returns a string representing the egg format.
 
@@ -170,9 +456,137 @@ class EntryType:
                      other example values are "\t" for one tab indentation or " "*2 for two spaces.
         compact : When set to True EntryType with only one line content and no child entries
                   will be diplayed on the same line.
+        workers : When set to a number above one, the child Groups and Instances are
+                  rendered in parallel by a pool of workers processes. The egg text is
+                  the same as without workers.
+        """
+        registry = self._root._registry
+        # The complete text is in memory anyway, so the egg text of the cacheable entries is kept
+        filling, registry.filling = registry.filling, True
+        try:
+            if workers and workers > 1:
+                return "".join(self.iter_egg(indentation, compact, workers=workers))
+            if registry.deferred:
+                self._root.validate()
+            if registry.profiler is not None:
+                return "".join(registry.profiler._iter_entry(self, self._iter_prettify(indentation, compact)))
+            return self._prettify(indentation, compact)
+        finally:
+            registry.filling = filling
+
+    def iter_egg(self, indentation=" "*4, compact=True, buffer_size=2**16, workers=None):
+        """
+        Yields the egg format in chunks of about buffer_size characters.
+        Joining all chunks gives the same string as prettify(), but the
+        complete egg text never needs to be in memory at once, unless it
+        is rendered by workers. Cached egg text is used, but the text is
+        not added to the cache, see set_cache().
+
+        See prettify() for the indentation, compact and workers arguments.
+        """
+        if self._root._registry.deferred:
+            self._root.validate()
+        rendered = self._render_groups(indentation, compact, workers) if workers and workers > 1 else []
+        profiler = self._root._registry.profiler
+        pieces = self._iter_prettify(indentation, compact)
+        try:
+            chunk, size = [], 0
+            for pretty in pieces if profiler is None else profiler._iter_entry(self, pieces):
+                chunk.append(pretty)
+                size += len(pretty)
+                if size >= buffer_size:
+                    yield "".join(chunk)
+                    chunk, size = [], 0
+            if chunk:
+                yield "".join(chunk)
+        finally:
+            registry = self._root._registry
+            if not (registry.cache_enabled and registry.filling):
+                for entry in rendered:
+                    registry.cache.pop(entry, None)
+
+    def write(self, file, indentation=" "*4, compact=True, buffer_size=2**16, workers=None):
+        """
+        Writes the egg format to the given file, which can be a path or a file
+        object opened in text mode. The output is streamed in chunks of about
+        buffer_size characters, see iter_egg().
+
+        See prettify() for the indentation, compact and workers arguments.
         """
-        return self._prettify(indentation, compact)
+        if hasattr(file, "write"):
+            for chunk in self.iter_egg(indentation, compact, buffer_size, workers):
+                file.write(chunk)
+            return
+        with open(file, "w", encoding="utf-8", newline="") as fileobj:
+            self.write(fileobj, indentation, compact, buffer_size, workers)
 
     def pprint(self, indentation=" "*4, compact=True, **kwargs):
         print(self._prettify(indentation, compact), **kwargs)
 
+
+class InternedEntryType(EntryType):
+    """
+    An EntryType without child entries which never changes after it is created,
+    like a TRef. Many entries refer to the same texture, material or VertexPool,
+    so each value is created once for each pegg instance and shared by all
+    parents, see _interned(). The egg text of a shared entry is kept for each
+    indentation and level it is written with.
+
+    The parent of a shared entry is the root of the pegg instance, so
+    get_parent() of the TRef of a polygon returns the Pegg, not the polygon.
+    """
+    __slots__ = ("_key", "_pretty")
+
+    def __init__(self, parent=None, name=None):
+        super().__init__(parent=parent, name=name)
+        self._key = None # The arguments of a shared entry, None if the entry is not shared
+        self._pretty = None # The egg text by (indentation, compact, level), created on first use
+
+    @classmethod
+    def _interned(cls, parent, *args):
+        """
+        Returns the shared cls(root, *args) for the pegg instance of parent, which is
+        created on first use. Arguments which can't be hashed give an entry which
+        is not shared. The types of the arguments are part of the key, values
+        which are equal but written differently are not shared:
+
+            Scalar._interned(texture, "foo", 1) is not Scalar._interned(texture, "foo", 1.0)
+        """
+        root = parent._root
+        interned = root._registry.interned
+        key = (cls, ) + args + tuple(type(arg) for arg in args)
+        try:
+            entry = interned.get(key)
+        except TypeError:
+            return cls(parent, *args)
+        if entry is None:
+            entry = interned[key] = cls(root, *args)
+            entry._key = args
+        else:
+            cls._test(root, *args)
+        return entry
+
+    @staticmethod
+    def _test(root, *args):
+        """
+        Raises an error when the arguments refer to an entry which does not exist,
+        it is called for each use of a shared entry.
+        """
+
+    def _copy(self, parent):
+        if self._key is None:
+            return super()._copy(parent)
+        return self._interned(parent, *self._key)
+
+    def _iter_prettify(self, indentation, compact, _level=0):
+        if self._root._registry.profiler is not None:
+            # Written without the kept text, so the profiler counts get_content()
+            yield from super()._iter_prettify(indentation, compact, _level)
+            return
+        key = (indentation, compact, _level)
+        if self._pretty is None:
+            self._pretty = {}
+        pretty = self._pretty.get(key)
+        if pretty is None:
+            pretty = self._pretty[key] = "".join(super()._iter_prettify(indentation, compact, _level))
+        yield pretty
@@ -1,10 +1,34 @@
-from .entrytype import EntryType
+from array import array
+from bisect import bisect_left
+from itertools import accumulate
+from .entrytype import EntryType, InternedEntryType
 from .transform import MixInTransform
-from .vertexpool import MixInVertexPool
+from .vertexpool import MixInVertexPool, VertexPool
 from .polygon import MixInPolygon
-from .tools import ProtectedDict
+from .opaque import MixInOpaque, Opaque
+from .polygon import PolygonArray, _copy_polygon, _pack_polygons
+from .ref import Ref
+from .triangulate import triangulate
+from .decimate import decimate
+from .partition import centroids, select, renumber, grid_cells, octree_cells
+from .vertexref import VertexRef
+from .validation import test_dangling
+from .tools import ProtectedDict, strname, fjoin, toarray, numpy
+
+def _unique_vertexpool_name(registry, name):
+    """
+    Returns name, followed by ".2", ".3", ... when a VertexPool with that name already exists.
+    """
+    new, count = name, 1
+    while new in registry.vertexpools:
+        count += 1
+        new = "{0}.{1}".format(name, count)
+    return new
 
 class MixInGroup:
+    __slots__ = ()
+    _entrytypes = ("Group", )
+
     def add_group(self, name):
         """
         <Group> name { group-body }
@@ -20,13 +44,53 @@ class MixInGroup:
         if name in self._entries["Group"]:
             raise ValueError("Cannot add {0!r}, the group already exists.".format(name))
         group = self._entries["Group"][name] = Group(self, name)
+        self._changed()
         return group
 
     @property
     def groups(self):
         return ProtectedDict(self._entries["Group"])
 
+    def triangulate(self):
+        """
+        Splits all polygons with more than three vertices, in this entry and all
+        Groups and Instances below it, in triangles. Returns the number of
+        polygons which are split.
+
+        Convex polygons are split in a fan, concave polygons by ear clipping.
+        Each triangle keeps the vertex order, MRef, TRefs and Normal of its polygon.
+        Egg files with only triangles don't need to be triangulated by the egg
+        loader each time they are loaded.
+        """
+        return sum(entry._triangulate() for entry in list(self._walk()) if isinstance(entry, MixInPolygon))
+
+    def optimize_vertex_cache(self, cache_size=32):
+        """
+        Reorders the polygons, in this entry and all Groups and Instances below it,
+        so the vertices are reused from the vertex cache of the GPU as much as
+        possible. Returns a tuple with the average cache miss ratio (ACMR, the
+        vertex cache misses per triangle) before and after.
+
+        cache_size : The number of vertices in the simulated vertex cache.
+
+        Polygons are only reordered among polygons with the same attributes
+        (in a polygon array) or the same VertexPool. The order is found with
+        Tom Forsyth's linear-speed vertex cache optimisation, it works best
+        after triangulate().
+        """
+        before = after = triangles = 0
+        for entry in list(self._walk()):
+            if isinstance(entry, MixInPolygon):
+                misses_before, misses_after, count = entry._optimize_vertex_cache(cache_size)
+                before, after, triangles = before + misses_before, after + misses_after, triangles + count
+        if not triangles:
+            return 0.0, 0.0
+        return before / triangles, after / triangles
+
 class MixInInstance:
+    __slots__ = ()
+    _entrytypes = ("Instance", )
+
     def add_instance(self, name):
         """
         <Instance> name { instance-body }
@@ -47,17 +111,398 @@ class MixInInstance:
         if name in self._entries["Instance"]:
             raise ValueError("Cannot add {0!r}, the instance already exists.".format(name))
         instance = self._entries["Instance"][name] = Instance(self, name)
+        self._changed()
         return instance
 
     @property
     def instances(self):
         return ProtectedDict(self._entries["Instance"])
 
-class Group(EntryType, MixInGroup, MixInInstance, MixInTransform, MixInVertexPool, MixInPolygon):
+class Group(EntryType, MixInGroup, MixInInstance, MixInTransform, MixInVertexPool, MixInPolygon, MixInOpaque):
+    __slots__ = ()
+    _cacheable = True
+
     def __init__(self, parent, name):
         super().__init__(parent=parent, name=name)
 
+    def reparent(self, parent):
+        """
+        Moves this group, including all entries below it, to the given parent.
+        The parent can be a Group, Instance or Pegg, also in another pegg instance
+        in which case all VertexPool names below this group must be unique
+        within the new pegg instance. After a move to another pegg instance the
+        references below this group are checked and a ValueError is raised when
+        a VertexPool, vertex, Texture, Material or uv-name does not exist there
+        (the group is moved anyway), unless this is done within
+        deferred_validation() of the new pegg instance.
+        """
+        kind = "Instance" if isinstance(self, Instance) else "Group"
+        ancestor = parent
+        while ancestor is not None:
+            if ancestor is self:
+                raise ValueError("Cannot move {0!r} to {1!r}, the new parent is part of the group itself.".format(self, parent))
+            ancestor = ancestor._parent
+        name = next(key for key, value in self._parent._entries[kind].items() if value is self)
+        if name in parent._entries[kind]:
+            raise ValueError("Cannot move {0!r}, the {1} already exists.".format(name, kind.lower()))
+        root = parent.get_pegg()
+        self._changed()
+        if root is not self.get_pegg():
+            entries = list(self._walk())
+            vertexpools = [item for entry in entries for item in (entry._peek("VertexPool") or {}).items()]
+            for key, vertexpool in vertexpools:
+                if key in root._registry.vertexpools:
+                    raise ValueError("Cannot move {0!r}, the vertexpool {1!r} already exists within the new pegg instance.".format(name, key))
+            for key, vertexpool in vertexpools:
+                del self.get_pegg()._registry.vertexpools[key]
+                root._registry.vertexpools[key] = vertexpool
+            # The shared entries stay with the old pegg instance, the new one has its own
+            entries = [entry for entry in entries if not isinstance(entry, InternedEntryType) or entry._key is None]
+            cache = self.get_pegg()._registry.cache
+            for entry in entries:
+                cache.pop(entry, None)
+                entry._root = root
+            root._registry.deferred += 1
+            try:
+                for entry in entries:
+                    entry._share()
+            finally:
+                root._registry.deferred -= 1
+        del self._parent._entries[kind][name]
+        parent._entries[kind][name] = self
+        moved, self._parent = self._parent._root is not root, parent
+        self._changed()
+        if moved and not root._registry.deferred:
+            test_dangling(root, self)
+
+    def clone(self, name, parent=None):
+        """
+        Adds a copy of this group, including all entries below it, with the
+        given name to parent (default: the parent of this group) and returns it.
+        The parent can be in another pegg instance.
+
+        Each VertexPool below the clone is renamed to "<name>.<vertexpool name>",
+        followed by ".2", ".3", ... when that name already exists, and all
+        references to it below the clone are changed. The vertices and polygons
+        stored in arrays are shared with this group until either is changed.
+        Vertex and Polygon EntryTypes are stored in arrays in the clone where the
+        arrays write them exactly the same (see add_vertices() and
+        append_polygons()), these arrays are made by the first clone and shared
+        by all clones until this group is changed. So cloning a template many
+        times is cheap, also when it is built with add_vertex() and append_polygon().
+        The other entries are copied, a clone costs some microseconds for each of them.
+
+        A clone in another pegg instance is checked like reparent() does.
+        """
+        parent = self._parent if parent is None else parent
+        kind = "Instance" if isinstance(self, Instance) else "Group"
+        if name in parent._entries[kind]:
+            raise ValueError("Cannot add {0!r}, the {1} already exists.".format(name, kind.lower()))
+        packed = self._packed()
+        registry = parent.get_pegg()._registry
+        # The references are copied as they are, also to another pegg instance
+        registry.deferred += 1
+        try:
+            clone = packed._copy(parent)
+        finally:
+            registry.deferred -= 1
+        clone._name = strname(name)
+        entries = list(clone._walk())
+        renamed = {}
+        for entry in entries:
+            vertexpools = entry._peek("VertexPool")
+            if vertexpools:
+                for key in list(vertexpools):
+                    new = _unique_vertexpool_name(registry, "{0}.{1}".format(name, key))
+                    vertexpool = vertexpools.pop(key)
+                    vertexpool._name = strname(new)
+                    vertexpools[new] = vertexpool
+                    registry.add_vertexpool(new, vertexpool)
+                    renamed[strname(key)] = new
+                    if vertexpool._vertexarray is not None:
+                        vertexpool._vertexarray.shared = True
+        if renamed:
+            for entry in entries:
+                ref = entry._peek("Ref")
+                if ref is not None and ref._ref in renamed:
+                    entry._children["Ref"] = Ref._interned(entry, renamed[ref._ref])
+                if isinstance(entry, PolygonArray) and strname(entry._refname) in renamed:
+                    entry._refname = renamed[strname(entry._refname)]
+        parent._entries[kind][name] = clone
+        parent._changed()
+        if parent._root is not self._root and not registry.deferred:
+            test_dangling(parent._root, clone)
+        return clone
+
+    def _packed(self):
+        """
+        Returns a copy of this group without a parent, with the vertices and
+        polygons stored in arrays where possible, which is kept until this group
+        is changed. The clones of this group are copies of it, see clone().
+        """
+        registry = self._root._registry
+        packed = registry.templates.get(self)
+        if packed is None:
+            registry.deferred += 1
+            try:
+                packed = self._copy(self._parent)
+                packed._parent = None
+                for entry in list(packed._walk()):
+                    if isinstance(entry, VertexPool):
+                        entry._pack_vertices()
+                    if "Polygon" in entry._allowed:
+                        _pack_polygons(entry)
+            finally:
+                registry.deferred -= 1
+            registry.templates[self] = packed
+        return packed
+
+    def set_switch_condition(self, switch_in, switch_out, center=(0.0, 0.0, 0.0), fade=None, precision=None):
+        """
+        <SwitchCondition> {
+            <Distance> { in out [fade] <Vertex> { x y z } }
+        }
+
+        The subtree beginning at this node and below represents a single
+        level of detail for a particular model.  Sibling nodes represent
+        the additional levels of detail.  The geometry at this node will
+        be visible when the point (x, y, z) is closer than <in> units, but
+        further than <out> units, from the camera.  <fade> is presently
+        ignored.
+
+        A SwitchCondition which was set before is replaced.
+        """
+        if switch_in <= switch_out:
+            raise ValueError("The in distance ({0}) must be larger than the out distance ({1})".format(switch_in, switch_out))
+        opaques = self._entries["Opaque"]
+        opaques[:] = [opaque for opaque in opaques if opaque._entrytype != "SwitchCondition"]
+        condition = Opaque(self, "SwitchCondition")
+        distances = (switch_in, switch_out) if fade is None else (switch_in, switch_out, fade)
+        distance = condition.append_opaque("Distance", content=fjoin(distances, precision))
+        distance.append_opaque("Vertex", content=fjoin(center, precision))
+        opaques.append(condition)
+        self._changed()
+        return condition
+
+    def generate_lods(self, ratios=(1.0, 0.5, 0.25), distances=(50.0, 200.0, 1000.0), center=None):
+        """
+        Turns this group into a level of detail group and returns a list with
+        a child Group for each level. The polygons of this group are moved to
+        the levels, named "<name>.lod0", "<name>.lod1", ..., which keep ratio
+        times the triangles of the polygons. Level i is visible from distances[i-1]
+        (0.0 for the first level) up to distances[i], see set_switch_condition().
+
+        ratios : The share of the triangles which each level keeps, a level with
+                 ratio 1.0 keeps the polygons as they are.
+        distances : The distance up to which each level is visible, ascending.
+        center : The (x, y, z) point the distances are measured from, by default
+                 the center of the bounding box of the vertices of the polygons.
+
+        The polygons are triangulated and decimated with quadric error edge
+        collapses for each VertexPool, see decimate(). A collapse moves a vertex
+        onto a neighbouring vertex, so all levels use the vertices of the
+        original VertexPools. The triangles keep the MRef, TRefs and Normal
+        of their polygon. Polygons below child Groups, polygons with less than
+        three vertices and polygons using several VertexPools are kept as
+        they are in all levels.
+        """
+        if len(ratios) != len(distances):
+            raise ValueError("Expected a distance for each of the {0} ratios, got {1}".format(len(ratios), len(distances)))
+        if any(ratio <= 0 for ratio in ratios):
+            raise ValueError("The ratios must be larger than 0")
+        if any(far <= near for near, far in zip((0.0, ) + tuple(distances), distances)):
+            raise ValueError("The distances must be ascending and larger than 0")
+        name = next(key for key, value in self._parent._entries["Instance" if isinstance(self, Instance) else "Group"].items() if value is self)
+        names = ["{0}.lod{1}".format(name, level) for level in range(len(ratios))]
+        for key in names:
+            if key in self._entries["Group"]:
+                raise ValueError("Cannot add {0!r}, the group already exists.".format(key))
+        entries = list(self._peek("Polygon") or ())
+        vertexpools = {strname(key): vertexpool for key, vertexpool in self.get_pegg()._registry.vertexpools.items()}
+        kept = set() # The polygons which are not decimated
+        batches = {} # The polygon entries, polygon indices and vertex numbers by VertexPool name
+        for entry in entries:
+            if isinstance(entry, PolygonArray):
+                ref, polygons = strname(entry._refname), [(entry, index, entry.get_polygon(index)) for index in range(len(entry))]
+            else:
+                vertexrefs = entry._peek("VertexRef") or ()
+                refs = {vertexref._peek("Ref")._ref for vertexref in vertexrefs}
+                vertices = tuple(vertex for vertexref in vertexrefs for vertex in vertexref._vertices)
+                if len(refs) != 1 or len(vertices) < 3:
+                    kept.add(entry)
+                    continue
+                ref, polygons = refs.pop(), [(entry, None, vertices)]
+            batches.setdefault(ref, []).extend(polygons)
+        levels = [{} for ratio in ratios] # The triangles by polygon entry of each level
+        bounds = []
+        for ref, polygons in batches.items():
+            numbers = list(dict.fromkeys(number for entry, index, vertices in polygons for number in vertices))
+            points = dict(zip(numbers, vertexpools[ref]._get_coordinates(numbers)))
+            coordinates = lambda numbers: [points[number] for number in numbers]
+            bounds.extend(points.values())
+            sources, triangles = [], []
+            for (entry, index, vertices), split in zip(polygons, triangulate([vertices for entry, index, vertices in polygons], coordinates)):
+                sources += [(entry, index)] * len(split)
+                triangles += split
+            targets = [max(int(round(ratio * len(triangles))), 1) for ratio in ratios if ratio < 1.0]
+            results = iter(decimate(triangles, coordinates, targets))
+            for ratio, level in zip(ratios, levels):
+                if ratio < 1.0:
+                    for position, triangle in next(results):
+                        entry, index = sources[position]
+                        level.setdefault(entry, []).append((index, triangle))
+        if center is None and bounds:
+            center = tuple((min(point[axis] for point in bounds) + max(point[axis] for point in bounds)) / 2 for axis in range(3))
+        groups = []
+        for key, ratio, level, near, far in zip(names, ratios, levels, (0.0, ) + tuple(distances), distances):
+            group = self.add_group(key)
+            polygons = group._entries["Polygon"]
+            for entry in entries:
+                if ratio >= 1.0 or entry in kept:
+                    polygons.append(entry._copy(group))
+                elif isinstance(entry, PolygonArray):
+                    triangles = level.get(entry)
+                    if triangles:
+                        polygonarray = group.append_polygons([triangle for index, triangle in triangles], entry._refname, counts=3, mref=entry._mrefname, trefs=entry._trefnames)
+                        normals = entry._normals
+                        if normals is not None:
+                            polygonarray.set_normals([value for index, triangle in triangles for value in normals[index*3:index*3+3]], entry._normal_precision)
+                else:
+                    polygons.extend(_copy_polygon(entry, triangle, group) for index, triangle in level.get(entry, ()))
+            group.set_switch_condition(far, near, center or (0.0, 0.0, 0.0))
+            groups.append(group)
+        self._entries["Polygon"] = []
+        self._changed()
+        return groups
+
+    def partition(self, cell_size=None, max_polys=None):
+        """
+        Splits the polygons of this group by location in child Groups, so the
+        egg loader creates a node for each part which can be culled on its own.
+        Returns a list with the child Groups which hold the polygons.
+
+        cell_size : The size of the cells of a uniform grid, one value or (x, y, z).
+                    Each cell becomes a child Group "<name>.<x>_<y>_<z>", with the
+                    index of the cell.
+        max_polys : Instead of a grid, the polygons are split in an octree: the
+                    bounding cube is split in octants until each octant holds at
+                    most max_polys polygons. The octants become nested Groups
+                    named after their path, like "<name>.3.5".
+
+        Each polygon belongs to the cell of its centroid. Each cell gets its own
+        VertexPool "<group name>.<vertexpool name>" with copies of only the vertices
+        its polygons use, numbered from 1; vertices used by polygons in several
+        cells are copied to each of them. The VertexPools of this group which are
+        not used anymore are removed. Polygons using several VertexPools stay in
+        this group.
+
+        The time needed grows linear with the number of polygons (times the depth
+        of the octree). With NumPy, polygon arrays using vertices added with
+        add_vertices() are split with array operations, without a Python step for
+        each polygon or vertex.
+        """
+        if (cell_size is None) == (max_polys is None):
+            raise ValueError("Expected either cell_size or max_polys")
+        name = next(key for key, value in self._parent._entries["Instance" if isinstance(self, Instance) else "Group"].items() if value is self)
+        registry = self.get_pegg()._registry
+        vertexpools = {strname(key): (key, vertexpool) for key, vertexpool in registry.vertexpools.items()}
+        entries = list(self._peek("Polygon") or ())
+        kept = [] # The polygons which are not partitioned
+        units = [] # (entry, VertexPool name, indices, offsets) for each polygon array and for the Polygon EntryTypes of each VertexPool
+        polygons = {} # The Polygon EntryTypes and their vertex numbers by VertexPool name
+        for entry in entries:
+            if isinstance(entry, PolygonArray):
+                if len(entry):
+                    units.append((entry, strname(entry._refname), entry._indices, entry._offsets))
+                continue
+            vertexrefs = entry._peek("VertexRef") or ()
+            refs = {vertexref._peek("Ref")._ref for vertexref in vertexrefs}
+            vertices = [vertex for vertexref in vertexrefs for vertex in vertexref._vertices]
+            if len(refs) != 1 or not vertices:
+                kept.append(entry)
+                continue
+            polygons.setdefault(refs.pop(), []).append((entry, vertices))
+        for ref, batch in polygons.items():
+            offsets = array("q", [0])
+            offsets.extend(accumulate(len(vertices) for entry, vertices in batch))
+            units.append(([entry for entry, vertices in batch], ref, array("q", [vertex for entry, vertices in batch for vertex in vertices]), offsets))
+        points = [centroids(vertexpools[ref][1], indices, offsets) for entry, ref, indices, offsets in units]
+        if numpy is not None:
+            points = numpy.concatenate(points) if points else numpy.empty((0, 3))
+        else:
+            points = [point for unit in points for point in unit]
+        cells = grid_cells(points, cell_size) if max_polys is None else octree_cells(points, max_polys)
+        starts = list(accumulate((len(offsets) - 1 for entry, ref, indices, offsets in units), initial=0))
+
+        groups, parents = [], {(): self}
+        for key, members in cells.items():
+            if max_polys is None:
+                parent, key = self, "{0}.{1}".format(name, "_".join(map(str, key)))
+            else:
+                path = key or (0, )
+                for depth in range(1, len(path)):
+                    if path[:depth] not in parents:
+                        parents[path[:depth]] = parents[path[:depth-1]].add_group("{0}.{1}".format(name, ".".join(map(str, path[:depth]))))
+                parent, key = parents[path[:-1]], "{0}.{1}".format(name, ".".join(map(str, path)))
+            group = parent.add_group(key)
+            groups.append(group)
+            selected = {} # The vertex numbers, counts and polygons of each unit by VertexPool name
+            for unit, start, end in zip(units, starts, starts[1:]):
+                if numpy is not None:
+                    local = members[numpy.searchsorted(members, start):numpy.searchsorted(members, end)] - start
+                else:
+                    local = [member - start for member in members[bisect_left(members, start):bisect_left(members, end)]]
+                if len(local):
+                    numbers, counts = select(unit[2], unit[3], local)
+                    selected.setdefault(unit[1], []).append((unit, local, numbers, counts))
+            for ref, batch in selected.items():
+                source, vertexpool = vertexpools[ref]
+                if numpy is not None:
+                    unique, renumbered = renumber(numpy.concatenate([numbers for unit, local, numbers, counts in batch]))
+                else:
+                    unique, renumbered = renumber([number for unit, local, numbers, counts in batch for number in numbers])
+                missing = vertexpool.missing_vertices(unique if numpy is None else toarray("q", unique))
+                if missing:
+                    raise KeyError("Vertices {0} not found in VertexPool {1!r}".format(", ".join(map(str, missing[:10])) + (", ..." if len(missing) > 10 else ""), source))
+                new = _unique_vertexpool_name(registry, "{0}.{1}".format(key, source))
+                group.add_vertexpool(new)._copy_subset(vertexpool, unique)
+                position = 0
+                for (entry, ref, indices, offsets), local, numbers, counts in batch:
+                    numbers = renumbered[position:position+len(numbers)]
+                    position += len(numbers)
+                    if isinstance(entry, PolygonArray):
+                        size = int(counts[0])
+                        uniform = bool((counts == size).all()) if numpy is not None else counts.count(size) == len(counts)
+                        polygonarray = group.append_polygons(numbers, new, counts=size if uniform else counts, mref=entry._mrefname, trefs=entry._trefnames)
+                        if entry._normals is not None:
+                            normals = entry._normals
+                            if numpy is not None:
+                                normals = numpy.frombuffer(normals, dtype=numpy.float64).reshape(-1, 3)[local]
+                            else:
+                                normals = [value for index in local for value in normals[index*3:index*3+3]]
+                            polygonarray.set_normals(normals, entry._normal_precision)
+                        continue
+                    numbers = list(numbers)
+                    counts = list(accumulate(counts, initial=0))
+                    for index, start, end in zip(local, counts, counts[1:]):
+                        polygon = _copy_polygon(entry[index], numbers[start:end], group)
+                        vertexref = polygon._entries["VertexRef"][0]
+                        vertexref._children["Ref"] = Ref._interned(vertexref, new)
+                        group._entries["Polygon"].append(polygon)
+        self._entries["Polygon"] = kept
+        used = {strname(entry._refname) if isinstance(entry, PolygonArray) else entry._peek("Ref")._ref
+            for entry in self.get_pegg()._walk() if isinstance(entry, (PolygonArray, VertexRef))}
+        sources = {ref for entry, ref, indices, offsets in units}
+        for key in list(self._peek("VertexPool") or ()):
+            if strname(key) in sources and strname(key) not in used:
+                del self._entries["VertexPool"][key]
+                del registry.vertexpools[key]
+        self._changed()
+        return groups
+
 class Instance(Group):
+    __slots__ = ()
+
     def __init__(self, parent, name):
         super().__init__(parent=parent, name=name)
 
@@ -0,0 +1,72 @@
+"""
+This is not an EntryType module. The grid mesh of the Heightfield class is defined here.
+
+NumPy is used when it is installed, otherwise the same values are computed in Python.
+"""
+import math
+from array import array
+from .tools import numpy
+
+def grid(heights, spacing=1.0, uv_scale=1.0):
+    """
+    Returns a tuple with the vertex numbers, the x y z coordinates, the normals,
+    the u v coordinates and the vertex numbers of the triangles of a grid mesh
+    with the given heights, see Heightfield. The values are arrays accepted by
+    add_vertices() and append_polygons().
+    """
+    dx, dy = spacing if hasattr(spacing, "__len__") else (spacing, spacing)
+    su, sv = uv_scale if hasattr(uv_scale, "__len__") else (uv_scale, uv_scale)
+    if numpy is not None:
+        return _numpy_grid(numpy.asarray(heights, dtype=float), dx, dy, su, sv)
+    heights = [[float(height) for height in row] for row in heights]
+    rows, columns = len(heights), len(heights[0]) if heights else 0
+    _test_shape(rows, columns, all(len(row) == columns for row in heights))
+    coords, normals, uvs = array("d"), array("d"), array("d")
+    for row in range(rows):
+        for column in range(columns):
+            # Central differences inside the grid, one-sided differences at the edges (like numpy.gradient())
+            left, right = max(column - 1, 0), min(column + 1, columns - 1)
+            below, above = max(row - 1, 0), min(row + 1, rows - 1)
+            slope_x = (heights[row][right] - heights[row][left]) / ((right - left) * dx)
+            slope_y = (heights[above][column] - heights[below][column]) / ((above - below) * dy)
+            length = math.sqrt(slope_x * slope_x + slope_y * slope_y + 1.0)
+            coords.extend((column * dx, row * dy, heights[row][column]))
+            normals.extend((-slope_x / length, -slope_y / length, 1.0 / length))
+            uvs.extend((column / (columns - 1) * su, row / (rows - 1) * sv))
+    indices = array("q")
+    for row in range(rows - 1):
+        for column in range(columns - 1):
+            a = row * columns + column
+            c = a + columns
+            indices.extend((a, a + 1, c + 1, a, c + 1, c))
+    return range(rows * columns), coords, normals, uvs, indices
+
+def _numpy_grid(heights, dx, dy, su, sv):
+    if heights.ndim != 2:
+        raise ValueError("Expected a 2D array with heights, got {0} dimensions".format(heights.ndim))
+    rows, columns = heights.shape
+    _test_shape(rows, columns)
+    count = rows * columns
+    coords = numpy.empty((rows, columns, 3))
+    coords[:, :, 0] = numpy.arange(columns) * dx
+    coords[:, :, 1] = (numpy.arange(rows) * dy)[:, None]
+    coords[:, :, 2] = heights
+    slope_y, slope_x = numpy.gradient(heights, dy, dx)
+    normals = numpy.empty((rows, columns, 3))
+    normals[:, :, 0] = -slope_x
+    normals[:, :, 1] = -slope_y
+    normals[:, :, 2] = 1.0
+    normals /= numpy.sqrt(slope_x * slope_x + slope_y * slope_y + 1.0)[:, :, None]
+    uvs = numpy.empty((rows, columns, 2))
+    uvs[:, :, 0] = numpy.arange(columns) / (columns - 1) * su
+    uvs[:, :, 1] = (numpy.arange(rows) / (rows - 1) * sv)[:, None]
+    a = numpy.arange(count, dtype=numpy.int64).reshape(rows, columns)[:-1, :-1].ravel()
+    c = a + columns
+    indices = numpy.stack((a, a + 1, c + 1, a, c + 1, c), axis=1)
+    return numpy.arange(count, dtype=numpy.int64), coords, normals, uvs, indices.ravel()
+
+def _test_shape(rows, columns, rectangular=True):
+    if not rectangular:
+        raise ValueError("All rows of heights must have the same length")
+    if rows < 2 or columns < 2:
+        raise ValueError("Expected at least 2 rows and 2 columns of heights, got {0} by {1}".format(rows, columns))
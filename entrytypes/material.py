@@ -3,6 +3,9 @@ from .scalar import MixInScalar
 from .tools import fstr, ProtectedDict
 
 class Material(EntryType, MixInScalar):
+    __slots__ = ()
+    _cacheable = True
+
     _scalars = [
         "diffr", "diffg", "diffb", "diffa", 
         "ambr", "ambg", "ambb", "amba",
@@ -47,7 +50,7 @@ class Material(EntryType, MixInScalar):
         and the value ranges from 0 to 128.  A larger value creates a
         smaller highlight (creating the appearance of a shinier surface).
         """
-        self.add_scaler("shininess", fstr(value, precision))
+        self.add_scalar("shininess", fstr(value, precision))
 
     def __setrgba(self, *args, precision=None, group=None):
         names = [name for name in self.__class__._scalars if name.startswith(group)]
@@ -57,6 +60,9 @@ class Material(EntryType, MixInScalar):
             self.add_scalar(name, fstr(value, precision))
 
 class MixInMaterial:
+    __slots__ = ()
+    _entrytypes = ("Material", )
+
     def add_material(self, name):
         """
         <Material> name { [scalars] }
@@ -74,6 +80,7 @@ class MixInMaterial:
         if name in self._entries["Material"]:
             raise ValueError("Cannot add {0!r}, the material already exists.".format(name))
         material = self._entries["Material"][name] = Material(self, name)
+        self._changed()
         return material
 
     @property
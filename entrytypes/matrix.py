@@ -1,7 +1,9 @@
 from .entrytype import EntryType
-from .tools import fstr
+from .tools import frows
 
 class __Matrix(EntryType):
+    __slots__ = ("_precision", "_matrix")
+
     def __init__(self, parent, matrix, precision=None):
         super().__init__(parent=parent)
         self.__test_matrix(matrix)
@@ -11,7 +13,7 @@ class __Matrix(EntryType):
         self._matrix = matrix
 
     def get_content(self):
-        return "\n".join([" ".join(map(lambda value: fstr(value, self._precision), m)) for m in self._matrix])
+        return "\n".join(frows([value for m in self._matrix for value in m], self._precision, len(self._matrix)))
 
     def __test_matrix(self, test):
         length = {"Matrix3":3, "Matrix4":4}[self.__class__.__name__]
@@ -21,20 +23,29 @@ class __Matrix(EntryType):
                 [[col for col in range(length)] for row in range(length)]))
 
 class Matrix3(__Matrix):
+    __slots__ = ()
+
     def __init__(self, parent, matrix, precision=None):
         super().__init__(parent=parent, matrix=matrix, precision=precision)
 
 
 class Matrix4(__Matrix):
+    __slots__ = ()
+
     def __init__(self, parent, matrix, precision=None):
         super().__init__(parent=parent, matrix=matrix, precision=precision)
 
 
 class MixInMatrix:
+    __slots__ = ()
+    _entrytypes = ("Matrix3", "Matrix4")
+
     def set_matrix3(self, matrix, precision=None):
         if self.get_parent().__class__.__name__ != "Texture":
             raise AttributeError("Matrix3 is only allowed within a Texture Entry")
         self._entries["Matrix3"] = Matrix3(self, matrix, precision=precision)
+        self._changed()
 
     def set_matrix4(self, matrix, precision=None):
-        self._entries["Matrix4"] = Matrix4(self, matrix, precision=precision)
\ No newline at end of file
+        self._entries["Matrix4"] = Matrix4(self, matrix, precision=precision)
+        self._changed()
\ No newline at end of file
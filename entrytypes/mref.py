@@ -1,16 +1,26 @@
-from .entrytype import EntryType
+from .entrytype import InternedEntryType
 from .tools import strname
 
-class MRef(EntryType):
+class MRef(InternedEntryType):
+    __slots__ = ("_mref", )
+
     def __init__(self, parent, mref):
-        if not mref in self.get_pegg(parent).materials:
-            raise KeyError("Material {0!r} does not exists.".format(mref))
+        self._test(self.get_pegg(parent), mref)
         super().__init__(parent=parent)
         self._mref = strname(mref)
-        
+
+    @staticmethod
+    def _test(root, mref):
+        if not root._registry.deferred and not mref in root.materials:
+            raise KeyError("Material {0!r} does not exists.".format(mref))
+
     def get_content(self):
         return self._mref
 
 class MixInMRef:
+    __slots__ = ()
+    _entrytypes = ("MRef", )
+
     def set_mref(self, mref):
-        self._entries["MRef"] = MRef(self, mref)
\ No newline at end of file
+        self._entries["MRef"] = MRef._interned(self, mref)
+        self._changed()
\ No newline at end of file
@@ -1,7 +1,9 @@
 from .entrytype import EntryType
-from .tools import fstr
+from .tools import fjoin
 
 class Normal(EntryType):
+    __slots__ = ("_precision", "_vector")
+
     def __init__(self, parent, *vector, precision=None): # vector x, y, z
 
         super().__init__(parent=parent)
@@ -14,10 +16,13 @@ class Normal(EntryType):
         return self._vector
 
     def get_content(self):
-        return " ".join(map(lambda value: fstr(value, self._precision), self._vector))
+        return fjoin(self._vector, self._precision)
 
 
 class MixInNormal:
+    __slots__ = ()
+    _entrytypes = ("Normal", )
+
     def set_normal(self, *vector, precision=None):
         """
         <Normal> { x y z [morph-list] }
@@ -28,6 +33,7 @@ class MixInNormal:
         similar to the above.
         """
         normal = self._entries["Normal"] = Normal(self, *vector, precision=precision)
+        self._changed()
         return normal
 
     def get_normal(self):
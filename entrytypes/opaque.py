@@ -0,0 +1,40 @@
+from .entrytype import EntryType
+
+class MixInOpaque:
+    __slots__ = ()
+
+    def append_opaque(self, entrytype, name=None, content=None):
+        """
+        Appends an entry which pegg does not know as it is, for example:
+        append_opaque("Scalar", "collide-mask", "0x01") gives <Scalar> collide-mask { 0x01 }
+        The returned Opaque entry accepts child entries with append_opaque() as well.
+        """
+        opaque = Opaque(self, entrytype, name=name, content=content)
+        self._entries["Opaque"].append(opaque)
+        self._changed()
+        return opaque
+
+class Opaque(EntryType, MixInOpaque):
+    """
+    An entry which pegg does not know, for example read from an egg file.
+    The entry type, name, content and child entries are kept as they are so
+    they are written again by prettify(). Opaque entries are written after
+    all other entries of their parent, see ENTRY_ORDER, so an entry read from
+    an egg file may move behind its siblings.
+    """
+    __slots__ = ("_entrytype", "_content")
+
+    def __init__(self, parent, entrytype, name=None, content=None):
+        super().__init__(parent=parent, name=name)
+        self._entrytype = entrytype
+        self._content = content
+
+    @property
+    def _tag(self):
+        return self._entrytype
+
+    def get_content(self):
+        return self._content
+
+    def __repr__(self):
+        return "<Opaque {0}>".format(self._entrytype) if self._name is None else "<Opaque {0} name={1!r}>".format(self._entrytype, self._name)
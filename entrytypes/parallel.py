@@ -0,0 +1,30 @@
+"""
+This is not an EntryType module. The parallel rendering used by prettify(workers=N) and write(workers=N) is defined here.
+"""
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+# The entries, indentation and compact argument for the worker processes. The worker
+# processes are forked, so they inherit the entries instead of receiving a pickled copy.
+_job = None
+
+def _render(index):
+    entries, indentation, compact, level = _job
+    return entries[index]._prettify(indentation, compact, level)
+
+def render(entries, indentation, compact, level, workers):
+    """
+    Returns a list with the egg text for each of the given entries at the given level.
+    The entries are rendered by a pool of workers processes where the platform supports
+    forking processes, on other platforms a pool of threads is used.
+    """
+    global _job
+    if "fork" not in multiprocessing.get_all_start_methods():
+        with ThreadPoolExecutor(workers) as executor:
+            return list(executor.map(lambda entry: entry._prettify(indentation, compact, level), entries))
+    _job = (entries, indentation, compact, level)
+    try:
+        with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("fork")) as executor:
+            return list(executor.map(_render, range(len(entries))))
+    finally:
+        _job = None
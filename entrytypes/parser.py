@@ -0,0 +1,381 @@
+"""
+This is not an EntryType module. The egg parser used by pegg.load() and Pegg.from_string() is defined here.
+"""
+import re
+from array import array
+from .opaque import Opaque
+
+# The text is split in tokens by a single regular expression. A complete <Vertex> with
+# only coordinates and an optional <Normal> and default <UV>, and a complete <Polygon>
+# with only MRef/TRefs and one VertexRef are matched as one token, since these are by
+# far the most common entries in an egg file.
+TOKENS = re.compile(r"""
+    <Vertex>\s*(-?\d+)\s*\{([^{}<>"/]*)       # 1: number, 2: coordinates
+        (?:<Normal>\s*\{([^{}<>"/]*)\}\s*)?   # 3: normal
+        (?:<UV>\s*\{([^{}<>"/]*)\}\s*)?\}     # 4: default uv
+    |<Polygon>\s*\{\s*                       # 5: mrefs and trefs
+        ((?:<[MT]Ref>\s*\{[^{}<>"/]*\}\s*)*)
+        <VertexRef>\s*\{([^{}<>"/]*)          # 6: vertex numbers
+        <Ref>\s*\{\s*([^\s{}<>"/]+)\s*\}\s*\}\s*\} # 7: ref
+    |(//[^\n]*|/\*.*?\*/)                    # 8: comments
+    |<([^>]*)>                               # 9: entry type
+    |([{}])                                  # 10: braces
+    |("[^"]*"|[^\s{}<>"]+)                   # 11: quoted string or word
+    """, re.S | re.X)
+
+REFS = re.compile(r"<([MT]Ref)>\s*\{\s*([^\s{}<>\"/]*)\s*\}")
+# Numbers written unchanged by str() of their float: from 1e-4 up to 1e16 with at least
+# one decimal and no trailing zeros, else with an exponent like 1.5e-05
+STR_NUMBERS = re.compile(r"""(?:\s*-?(?:
+    [1-9]\d{0,15}\.\d*[1-9]|0\.(?!0000)\d*[1-9]|(?:0|[1-9]\d{0,15})\.0
+    |[1-9](?:\.\d*[1-9])?e[-+]\d\d+)(?!\S))*\s*""", re.X)
+
+def parse(text):
+    """
+    Returns the root node for the given egg text. A node is a list with:
+    [entry type, name, values, child nodes, vertices], where vertices holds a
+    (number, coordinates, normal, uv) tuple of strings for each simple vertex
+    of a <VertexPool>. A simple polygon is a (refs, vertices, ref, text)
+    tuple of strings in the child nodes, see _simple_polygon().
+    """
+    root = [None, None, [], [], []]
+    stack = [root]
+    node = root
+    entrytype = name = None
+    for match in TOKENS.finditer(text):
+        index = match.lastindex
+        if index <= 4:
+            if entrytype is not None:
+                raise ValueError("Expected '{{' after <{0}>, got <Vertex> at position {1}".format(entrytype, match.start()))
+            vertex = match.group(1, 2, 3, 4)
+            if node[0] == "VertexPool":
+                node[4].append(vertex)
+            else:
+                node[3].append(_vertex_node(*vertex))
+        elif index <= 7:
+            if entrytype is not None:
+                raise ValueError("Expected '{{' after <{0}>, got <Polygon> at position {1}".format(entrytype, match.start()))
+            node[3].append(match.group(5, 6, 7, 0))
+        elif index == 11:
+            if entrytype is None:
+                node[2].append(match.group(11))
+            elif name is None:
+                name = match.group(11)
+            else:
+                raise ValueError("Expected '{{' after <{0}> {1}, got {2!r} at position {3}".format(entrytype, name, match.group(11), match.start()))
+        elif index == 10:
+            if match.group(10) == "{":
+                if entrytype is None:
+                    raise ValueError("Unexpected '{{' at position {0}".format(match.start()))
+                child = [entrytype, name, [], [], []]
+                node[3].append(child)
+                stack.append(child)
+                node = child
+                entrytype = name = None
+            elif len(stack) == 1:
+                raise ValueError("Unexpected '}}' at position {0}".format(match.start()))
+            else:
+                stack.pop()
+                node = stack[-1]
+        elif index == 9:
+            if entrytype is not None:
+                raise ValueError("Expected '{{' after <{0}>, got <{1}> at position {2}".format(entrytype, match.group(9), match.start()))
+            entrytype = match.group(9).strip()
+    if entrytype is not None or len(stack) > 1:
+        raise ValueError("Unexpected end of the egg text, <{0}> is not closed".format(entrytype or stack[-1][0]))
+    return root
+
+def _vertex_node(number, coordinates, normal, uv):
+    """
+    Returns a node for a simple vertex which is not part of a <VertexPool>.
+    """
+    node = ["Vertex", number, coordinates.split(), [], []]
+    if normal is not None:
+        node[3].append(["Normal", None, normal.split(), [], []])
+    if uv is not None:
+        node[3].append(["UV", None, uv.split(), [], []])
+    return node
+
+def _polygon_node(polygon):
+    """
+    Returns a node for a simple polygon tuple, see parse().
+    """
+    text = polygon[3]
+    return ["Polygon", None, [], parse(text[text.index("{")+1:text.rindex("}")])[3], []]
+
+def read(pegg, text):
+    """
+    Adds all entries from the given egg text to the pegg instance.
+    """
+    polygons = []
+    _read_childs(pegg, parse(text), polygons)
+    # Polygons are added last, so all VertexPools they refer to exist
+    for group, nodes in polygons:
+        _read_polygons(group, nodes)
+
+def _unquote(value):
+    return value[1:-1] if len(value) > 1 and value[0] == value[-1] == '"' else value
+
+def _number(value):
+    try:
+        return int(value)
+    except ValueError:
+        return float(value)
+
+def _precision(values):
+    """
+    Returns the precision which writes the given numbers (strings) again
+    exactly as they are given, like 3 for "0.500", or None when str() of the
+    numbers does, like for "0.5 0.25", or when no precision does.
+    """
+    text = " ".join(values)
+    if STR_NUMBERS.fullmatch(text):
+        return None
+    first = text.split(None, 1)[0]
+    point = first.find(".")
+    decimals = len(first) - point - 1 if point >= 0 else 0
+    number = r"-?(?:0|[1-9]\d*)" + (r"\.\d{{{0}}}".format(decimals) if decimals else "")
+    if re.fullmatch(r"\s*{0}(?:\s+{0})*\s*".format(number), text):
+        return decimals
+    return None
+
+def _opaque(entry, node):
+    """
+    Adds the node and all nodes below it as Opaque entries.
+    """
+    if isinstance(node, tuple):
+        node = _polygon_node(node)
+    opaque = Opaque(entry, node[0], name=None if node[1] is None else _unquote(node[1]), content=" ".join(node[2]) or None)
+    entry._entries["Opaque"].append(opaque)
+    entry._changed()
+    for child in node[3]:
+        _opaque(opaque, child)
+    for vertex in node[4]:
+        _opaque(opaque, _vertex_node(*vertex))
+
+def _read_childs(entry, node, polygons):
+    group_polygons = []
+    allow_polygons = "Polygon" in entry._allowed
+    for child in node[3]:
+        if isinstance(child, tuple):
+            if allow_polygons:
+                group_polygons.append(child)
+            else:
+                _opaque(entry, child)
+            continue
+        entrytype, name, values = child[0], child[1], child[2]
+        name = None if name is None else _unquote(name)
+        allowed = entrytype in entry._allowed
+        if allowed and entrytype == "Comment":
+            entry.append_comment(_unquote(" ".join(values)))
+        elif allowed and entrytype == "CoordinateSystem" and len(values) == 1:
+            try:
+                entry.set_coordinatesystem(values[0])
+            except ValueError:
+                _opaque(entry, child)
+        elif allowed and entrytype == "Texture" and len(values) == 1:
+            _read_childs(entry.add_texture(name, _unquote(values[0])), child, polygons)
+        elif allowed and entrytype == "Material" and not values:
+            _read_childs(entry.add_material(name), child, polygons)
+        elif allowed and entrytype == "Scalar" and name is not None:
+            entry.add_scalar(name, " ".join(values))
+        elif allowed and entrytype == "Group" and not values:
+            _read_childs(entry.add_group(name), child, polygons)
+        elif allowed and entrytype == "Instance" and not values:
+            _read_childs(entry.add_instance(name), child, polygons)
+        elif allowed and entrytype == "Transform" and not values and entry._peek("Transform") is None:
+            _read_childs(entry.transform, child, polygons)
+        elif allowed and entrytype in ("Matrix3", "Matrix4") and not child[3]:
+            size = int(entrytype[-1])
+            if len(values) != size * size:
+                _opaque(entry, child)
+                continue
+            precision = _precision(values)
+            values = [_number(value) for value in values]
+            matrix = [values[row*size:(row+1)*size] for row in range(size)]
+            try:
+                entry.set_matrix3(matrix, precision) if size == 3 else entry.set_matrix4(matrix, precision)
+            except AttributeError:
+                _opaque(entry, child)
+        elif allowed and entrytype == "Rotate" and not child[3] and 1 <= len(values) <= 4:
+            entry.set_rotate(*[_number(value) for value in values], precision=_precision(values))
+        elif allowed and entrytype == "VertexPool" and not values:
+            _read_vertices(entry.add_vertexpool(name), child)
+        elif allowed and entrytype == "Polygon":
+            group_polygons.append(child)
+        else:
+            _opaque(entry, child)
+    if group_polygons:
+        polygons.append((entry, group_polygons))
+
+def _read_vertices(vertexpool, node):
+    if node[2]:
+        raise ValueError("Unexpected value {0!r} in <VertexPool> {1}".format(node[2][0], node[1]))
+    vertices = node[4]
+    layouts = set(map(_layout, vertices))
+    if len(layouts) == 1 and not node[3]:
+        # All vertices have the same attributes, store them in a VertexArray
+        dimension, normals, uvs = layouts.pop()
+        if 1 <= dimension <= 4 and normals in (False, 3) and uvs in (False, 2, 3):
+            columns = [[vertex[column] for vertex in vertices] for column, present in ((1, True), (2, normals), (3, uvs)) if present]
+            precisions = {_precision(values) for values in columns}
+            # Vertices with a different precision for the coordinates, normals and uvs
+            # are kept as Vertex EntryTypes, like integer coordinates (a VertexArray with
+            # precision 0 would also write the normals computed later as integers)
+            if len(precisions) == 1 and precisions != {0}:
+                precision = precisions.pop()
+                numbers, coords, normals, uvs = _vertex_columns(vertices, normals, uvs)
+                vertexpool.add_vertices(numbers, coords, normals=normals, uvs=uvs, precision=precision)
+                return
+    for vertex in vertices:
+        _read_vertex(vertexpool, _vertex_node(*vertex), None)
+    number = None
+    for child in node[3]:
+        if child[0] == "Vertex" and not child[4]:
+            number = _read_vertex(vertexpool, child, number)
+        else:
+            _opaque(vertexpool, child)
+
+def _layout(vertex):
+    """
+    Returns (dimension, normal dimension, uv dimension) for a simple vertex tuple,
+    the normal and uv dimension are False if the vertex has no normal or uv.
+    """
+    number, coordinates, normal, uv = vertex
+    return len(coordinates.split()), normal is not None and len(normal.split()), uv is not None and len(uv.split())
+
+def _vertex_columns(vertices, normals, uvs):
+    """
+    Returns the numbers, coordinates, normals and uvs arrays for simple vertex tuples
+    with the same layout. The normals and uvs are None if normals or uvs is False.
+    """
+    return (
+        array("q", [int(vertex[0]) for vertex in vertices]),
+        array("d", map(float, " ".join([vertex[1] for vertex in vertices]).split())),
+        array("d", map(float, " ".join([vertex[2] for vertex in vertices]).split())) if normals else None,
+        array("d", map(float, " ".join([vertex[3] for vertex in vertices]).split())) if uvs else None)
+
+def _read_vertex(vertexpool, node, previous):
+    """
+    Adds the vertex for the given node and returns its number. Vertices
+    without a number are numbered consecutively, beginning at one.
+    """
+    number = int(node[1]) if node[1] is not None else 1 if previous is None else previous + 1
+    values = node[2]
+    if not 1 <= len(values) <= 4:
+        raise ValueError("Invalid <Vertex> {0}, expected 1 to 4 coordinates".format(number))
+    vertex = vertexpool.add_vertex(number, *[_number(value) for value in values], precision=_precision(values))
+    for child in node[3]:
+        entrytype, name, values = child[0], child[1], child[2]
+        if entrytype == "Normal" and not child[3] and len(values) == 3 and vertex.get_normal() is None:
+            vertex.set_normal(*[_number(value) for value in values], precision=_precision(values))
+        elif entrytype == "UV" and 2 <= len(values) <= 3:
+            uv = vertex.add_uv(*[_number(value) for value in values], name=None if name is None else _unquote(name), precision=_precision(values))
+            for grandchild in child[3]:
+                simple = isinstance(grandchild, list) and grandchild[1] is None and not grandchild[3] and not grandchild[4]
+                entrytype, values = grandchild[0], grandchild[2]
+                if simple and entrytype in ("Tangent", "Binormal") and len(values) == 3 and uv._peek(entrytype) is None:
+                    (uv.set_tangent if entrytype == "Tangent" else uv.set_binormal)(*[_number(value) for value in values], precision=_precision(values))
+                else:
+                    _opaque(uv, grandchild)
+        else:
+            _opaque(vertex, child)
+    return number
+
+def _read_polygons(group, nodes):
+    """
+    Adds the polygons to the group. Consecutive polygons with just a vertex
+    reference and the same ref, mref and trefs are added in bulk with append_polygons().
+    """
+    run, key = [], None
+    keys = {}
+    for node in nodes:
+        simple = _simple_polygon(node, keys)
+        if simple is None or simple[0] != key:
+            if run:
+                _append_polygons(group, key, run)
+            run, key = [], None
+        if simple is None:
+            _read_polygon(group, node if isinstance(node, list) else _polygon_node(node))
+        else:
+            key = simple[0]
+            run.append(simple[1])
+    if run:
+        _append_polygons(group, key, run)
+
+def _simple_polygon(node, keys):
+    """
+    Returns ((ref, mref, trefs), vertices) for a polygon which can be stored in
+    a PolygonArray, None for other polygons. keys caches the (ref, mref, trefs)
+    for the MRef/TRef text of the simple polygons matched by parse().
+    """
+    if isinstance(node, tuple):
+        refs, vertices, ref, text = node
+        if refs not in keys:
+            found = REFS.findall(refs)
+            mrefs = [name for entrytype, name in found if entrytype == "MRef"]
+            trefs = tuple(name for entrytype, name in found if entrytype == "TRef")
+            simple = len(found) == refs.count("<") and len(mrefs) <= 1 and all(mrefs) and all(trefs)
+            keys[refs] = (mrefs[0] if mrefs else None, trefs) if simple else None
+        if keys[refs] is None:
+            return None
+        mref, trefs = keys[refs]
+        return (ref, mref, trefs), vertices.split()
+    if node[1] is not None or node[2] or node[4]:
+        return None
+    mref, trefs, vertexrefs = None, [], []
+    for child in node[3]:
+        entrytype, name, values = child[0], child[1], child[2]
+        if name is not None or child[4] or (child[3] and entrytype != "VertexRef"):
+            return None
+        if entrytype == "MRef" and mref is None and len(values) == 1:
+            mref = _unquote(values[0])
+        elif entrytype == "TRef" and len(values) == 1:
+            trefs.append(_unquote(values[0]))
+        elif entrytype == "VertexRef":
+            vertexrefs.append(child)
+        else:
+            return None
+    if len(vertexrefs) != 1:
+        return None
+    vertexref = vertexrefs[0]
+    refs = vertexref[3]
+    if len(refs) != 1 or refs[0][0] != "Ref" or refs[0][1] is not None or refs[0][3] or len(refs[0][2]) != 1:
+        return None
+    return (_unquote(refs[0][2][0]), mref, tuple(trefs)), vertexref[2]
+
+def _append_polygons(group, key, polygons):
+    ref, mref, trefs = key
+    group.append_polygons(
+        array("q", map(int, [vertex for polygon in polygons for vertex in polygon])),
+        ref, counts=[len(polygon) for polygon in polygons], mref=mref, trefs=trefs)
+
+def _read_polygon(group, node):
+    vertexrefs = [child for child in node[3] if child[0] == "VertexRef" and _ref(child) is not None]
+    if not vertexrefs or node[1] is not None or node[2]:
+        _opaque(group, node)
+        return
+    polygon = group.append_polygon(*map(int, vertexrefs[0][2]), ref=_ref(vertexrefs[0]))
+    for child in node[3]:
+        entrytype, values = child[0], child[2]
+        if child is vertexrefs[0]:
+            continue
+        elif any(child is vertexref for vertexref in vertexrefs):
+            polygon.append_vertexref(*map(int, values), ref=_ref(child))
+        elif entrytype == "MRef" and len(values) == 1 and polygon._peek("MRef") is None:
+            polygon.set_mref(_unquote(values[0]))
+        elif entrytype == "TRef" and len(values) == 1:
+            polygon.append_tref(_unquote(values[0]))
+        elif entrytype == "Normal" and not child[3] and len(values) == 3 and polygon.get_normal() is None:
+            polygon.set_normal(*[_number(value) for value in values], precision=_precision(values))
+        else:
+            _opaque(polygon, child)
+
+def _ref(vertexref):
+    """
+    Returns the VertexPool name of a <VertexRef> node, None if it is not a simple reference.
+    """
+    refs = vertexref[3]
+    if vertexref[1] is not None or len(refs) != 1 or refs[0][0] != "Ref" or refs[0][3] or len(refs[0][2]) != 1:
+        return None
+    return _unquote(refs[0][2][0])
@@ -0,0 +1,160 @@
+"""
+This is not an EntryType module. The spatial partitioning used by partition() is defined here.
+
+NumPy is used when it is installed, otherwise the same cells are computed in Python.
+"""
+import math
+from array import array
+from .tools import numpy
+
+def _numpy_coordinates(vertexpool, numbers):
+    """
+    Returns an n x 3 NumPy array with the x y z coordinates of the given vertex numbers (a NumPy array).
+    Raises a KeyError if a vertex number is not found.
+    """
+    vertexarray = vertexpool._vertexarray
+    if vertexarray and vertexarray.contiguous and not vertexpool._peek("Vertex") and len(numbers):
+        rows = numbers - vertexarray.numbers[0]
+        # Rows outside the array are left to _get_coordinates(), which raises the KeyError
+        if rows.min() >= 0 and rows.max() < len(vertexarray.numbers):
+            dimension = vertexarray.dimension
+            width = min(dimension, 3)
+            coords = numpy.frombuffer(vertexarray.coords, dtype=numpy.float64).reshape(-1, dimension)
+            points = numpy.zeros((len(numbers), 3))
+            points[:, :width] = coords[rows, :width]
+            return points
+    unique, inverse = numpy.unique(numbers, return_inverse=True)
+    return numpy.array(vertexpool._get_coordinates(unique.tolist()), dtype=numpy.float64).reshape(-1, 3)[inverse]
+
+def centroids(vertexpool, indices, offsets):
+    """
+    Returns the (x, y, z) centroid of each polygon, with the vertex numbers of
+    polygon i in indices[offsets[i]:offsets[i+1]] (array("q") or NumPy arrays),
+    as an n x 3 NumPy array when NumPy is installed, else a list of tuples.
+    """
+    if numpy is not None:
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        offsets = numpy.asarray(offsets, dtype=numpy.int64)
+        if len(offsets) < 2:
+            return numpy.empty((0, 3))
+        sums = numpy.add.reduceat(_numpy_coordinates(vertexpool, indices), offsets[:-1], axis=0)
+        return sums / numpy.diff(offsets)[:, None]
+    points = vertexpool._get_coordinates(list(indices))
+    result = []
+    for index in range(len(offsets) - 1):
+        start, end = offsets[index], offsets[index+1]
+        count = end - start
+        result.append(tuple(sum(point[axis] for point in points[start:end]) / count for axis in range(3)))
+    return result
+
+def select(indices, offsets, polygons):
+    """
+    Returns the vertex numbers and the number of vertices of the given polygons
+    (a sorted sequence of polygon indices), NumPy arrays when NumPy is installed, else lists.
+    """
+    if numpy is not None:
+        indices = numpy.asarray(indices, dtype=numpy.int64)
+        offsets = numpy.asarray(offsets, dtype=numpy.int64)
+        polygons = numpy.asarray(polygons, dtype=numpy.int64)
+        starts = offsets[polygons]
+        counts = offsets[polygons + 1] - starts
+        if len(counts) and (counts == counts[0]).all() and len(indices) == counts[0] * (len(offsets) - 1):
+            # All polygons have the same size, the rows are taken at once
+            return indices.reshape(-1, counts[0])[polygons].ravel(), counts
+        # The position of each vertex number: the start of its polygon plus its place in the polygon
+        ends = numpy.cumsum(counts)
+        positions = numpy.arange(ends[-1] if len(ends) else 0) + numpy.repeat(starts - ends + counts, counts)
+        return indices[positions], counts
+    numbers, counts = [], []
+    for polygon in polygons:
+        start, end = offsets[polygon], offsets[polygon+1]
+        numbers.extend(indices[start:end])
+        counts.append(end - start)
+    return numbers, counts
+
+def renumber(numbers):
+    """
+    Returns the sorted unique vertex numbers of the given vertex numbers and the
+    given vertex numbers changed to their position in the unique numbers plus one,
+    NumPy arrays when NumPy is installed, else a list and an array("q").
+    """
+    if numpy is not None:
+        unique, inverse = numpy.unique(numpy.asarray(numbers, dtype=numpy.int64), return_inverse=True)
+        return unique, inverse.astype(numpy.int64) + 1
+    unique = sorted(set(numbers))
+    lookup = {number: position for position, number in enumerate(unique, 1)}
+    return unique, array("q", [lookup[number] for number in numbers])
+
+def _cell_size(cell_size):
+    cell_size = tuple(float(value) for value in cell_size) if hasattr(cell_size, "__len__") else (float(cell_size), ) * 3
+    if len(cell_size) != 3 or min(cell_size) <= 0:
+        raise ValueError("Expected a cell size larger than 0, or 3 for x y and z, got {0}".format(cell_size))
+    return cell_size
+
+def grid_cells(points, cell_size):
+    """
+    Returns a dict with the sorted indices of the given (x, y, z) points in
+    each cell of a uniform grid, by the (x, y, z) index of the cell. The cells
+    are sorted by their index. cell_size is one value or (x, y, z).
+    """
+    cell_size = _cell_size(cell_size)
+    if numpy is not None:
+        points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 3)
+        if not len(points):
+            return {}
+        cells = numpy.floor(points / numpy.array(cell_size)).astype(numpy.int64)
+        low = cells.min(axis=0)
+        span = cells.max(axis=0) - low + 1
+        shifted = cells - low
+        keys = (shifted[:, 0] * span[1] + shifted[:, 1]) * span[2] + shifted[:, 2]
+        order = numpy.argsort(keys, kind="stable")
+        bounds = numpy.flatnonzero(numpy.diff(keys[order])) + 1
+        return {tuple(cells[chunk[0]].tolist()): chunk for chunk in numpy.split(order, bounds)}
+    cells = {}
+    for index, point in enumerate(points):
+        cells.setdefault(tuple(math.floor(value / size) for value, size in zip(point, cell_size)), []).append(index)
+    return dict(sorted(cells.items()))
+
+def octree_cells(points, max_polys, max_depth=16):
+    """
+    Returns a dict with the sorted indices of the given (x, y, z) points in
+    each leaf of an octree, by the path of the leaf: a tuple with the octant
+    (0 to 7, bit 0 for x, 1 for y and 2 for z) at each level, the empty tuple
+    when all points fit in the root. The bounding cube of the points is split
+    in octants until a leaf has at most max_polys points or max_depth levels.
+    """
+    if max_polys < 1:
+        raise ValueError("max_polys must be at least 1, got {0}".format(max_polys))
+    if numpy is not None:
+        points = numpy.asarray(points, dtype=numpy.float64).reshape(-1, 3)
+        indices = numpy.arange(len(points))
+    else:
+        indices = list(range(len(points)))
+    if not len(indices):
+        return {}
+    low = [min(point[axis] for point in points) for axis in range(3)] if numpy is None else points.min(axis=0).tolist()
+    high = [max(point[axis] for point in points) for axis in range(3)] if numpy is None else points.max(axis=0).tolist()
+    size = max(high[axis] - low[axis] for axis in range(3)) or 1.0
+    leaves = {}
+    stack = [((), indices, low, size)]
+    while stack:
+        path, indices, low, size = stack.pop()
+        if len(indices) <= max_polys or len(path) >= max_depth:
+            leaves[path] = indices
+            continue
+        half = size / 2
+        middle = [value + half for value in low]
+        if numpy is not None:
+            selected = points[indices]
+            octants = (selected[:, 0] >= middle[0]) + 2 * (selected[:, 1] >= middle[1]) + 4 * (selected[:, 2] >= middle[2])
+            children = [indices[octants == octant] for octant in range(8)]
+        else:
+            children = [[] for octant in range(8)]
+            for index in indices:
+                point = points[index]
+                children[(point[0] >= middle[0]) + 2 * (point[1] >= middle[1]) + 4 * (point[2] >= middle[2])].append(index)
+        for octant, child in enumerate(children):
+            if len(child):
+                corner = [value + half if octant >> axis & 1 else value for axis, value in enumerate(low)]
+                stack.append((path + (octant, ), child, corner, half))
+    return dict(sorted(leaves.items()))
@@ -1,23 +1,391 @@
+from array import array
+from itertools import accumulate
 from .entrytype import EntryType
 from .vertexref import MixInVertexRef
 from .normal import MixInNormal
 from .mref import MixInMRef
 from .tref import MixInTRef
+from .ref import MixInRef
+from .tools import toarray, strname, frows
+from .triangulate import triangulate, triangulate_array
+from .vertexcache import count_misses, reorder
 
 class Polygon(EntryType, MixInVertexRef, MixInNormal, MixInMRef, MixInTRef):
+    __slots__ = ()
+
     def __init__(self, parent, *vertices, ref):
         super().__init__(parent=parent)
         self.append_vertexref(*vertices, ref=ref)
 
+    @classmethod
+    def _detached(cls, root, *vertices, ref):
+        """
+        Returns a Polygon in the pegg instance of root without a parent, so
+        changes to it don't drop the cached egg text of any other entry.
+        """
+        polygon = cls.__new__(cls)
+        EntryType.__init__(polygon, parent=root)
+        polygon._parent = None
+        polygon.append_vertexref(*vertices, ref=ref)
+        return polygon
+
+class PolygonArray(EntryType, MixInMRef, MixInTRef, MixInRef):
+    """
+    Stores a batch of polygons sharing the same ref, mref and trefs as a flat
+    array with the vertex numbers of all polygons and an array with offsets.
+    The vertices of polygon i are indices[offsets[i]:offsets[i+1]]. Optional
+    normals hold the x y z normal of each polygon, see set_normals().
+
+    A PolygonArray is written as one <Polygon> entry for each polygon,
+    exactly like Polygon EntryTypes with the same values.
+    """
+    __slots__ = ("_refname", "_mrefname", "_trefnames", "_indices", "_offsets", "_normals", "_normal_precision")
+
+    def __init__(self, parent, indices, ref, counts=None, mref=None, trefs=()):
+        super().__init__(parent=parent)
+        if counts is None:
+            counts = _get_counts(indices)
+        indices = toarray("q", indices)
+        if isinstance(counts, int):
+            if counts < 1 or len(indices) % counts:
+                raise ValueError("Cannot split {0} vertex numbers in polygons of {1} vertices".format(len(indices), counts))
+            offsets = array("q", range(0, len(indices) + 1, counts))
+        else:
+            counts = toarray("q", counts)
+            if counts and min(counts) < 1:
+                raise ValueError("Every polygon needs at least one vertex")
+            offsets = array("q", [0])
+            offsets.extend(accumulate(counts))
+            if offsets[-1] != len(indices):
+                raise ValueError("The counts add up to {0} vertex numbers, {1} are given".format(offsets[-1], len(indices)))
+        self.set_ref(ref)
+        missing = [] if self._root._registry.deferred else self.vertexpools[ref].missing_vertices(indices)
+        if missing:
+            raise KeyError("Vertices {0} not found in VertexPool {1!r}".format(", ".join(map(str, missing[:10])) + (", ..." if len(missing) > 10 else ""), ref))
+        if mref is not None:
+            self.set_mref(mref)
+        for tref in trefs:
+            self.append_tref(tref)
+        self._refname = ref
+        self._mrefname = mref
+        self._trefnames = tuple(trefs)
+        self._indices = indices
+        self._offsets = offsets
+        self._normals = None
+        self._normal_precision = None
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def get_polygon(self, index):
+        """
+        Returns a tuple with the vertex numbers for the polygon at the given index.
+        """
+        return tuple(self._indices[self._offsets[index]:self._offsets[index+1]])
+
+    def set_normals(self, normals, precision=None):
+        """
+        Sets the <Normal> of each polygon, see set_normal() of a Polygon.
+        normals holds x y z for each polygon, it can be anything accepted by
+        append_polygons() for the indices. None removes the normals.
+        """
+        if normals is not None:
+            normals = toarray("d", normals)
+            if len(normals) != 3 * len(self):
+                raise ValueError("Expected {0} normal values for {1} polygons, got {2}".format(3 * len(self), len(self), len(normals)))
+        self._normals = normals
+        self._normal_precision = precision
+        self._changed()
+
+    def _set_rows(self, rows, normals=None):
+        """
+        Replaces the polygons by the given rows of vertex numbers, with one
+        (x, y, z) normal for each row if this array has normals.
+        """
+        self._indices = array("q", [number for row in rows for number in row])
+        self._offsets = array("q", [0])
+        self._offsets.extend(accumulate(len(row) for row in rows))
+        if self._normals is not None:
+            self._normals = array("d", [value for normal in normals for value in normal])
+        self._changed()
+
+    def _get_normals(self):
+        """
+        Returns a list with the (x, y, z) normal of each polygon, None if this array has no normals.
+        """
+        if self._normals is None:
+            return None
+        normals = self._normals.tolist()
+        return [tuple(normals[index:index+3]) for index in range(0, len(normals), 3)]
+
+    def to_polygons(self, parent):
+        """
+        Returns a list with a detached Polygon EntryType for each polygon in this
+        array. The polygons are copies without a parent (get_parent() returns None),
+        they are not part of parent and changes to them are not written. The
+        cached egg text of parent and its ancestors is kept.
+        """
+        polygons = []
+        for index in range(len(self)):
+            polygon = Polygon._detached(parent._root, *self.get_polygon(index), ref=self._refname)
+            if self._mrefname is not None:
+                polygon.set_mref(self._mrefname)
+            for tref in self._trefnames:
+                polygon.append_tref(tref)
+            if self._normals is not None:
+                polygon.set_normal(*self._normals[index*3:index*3+3], precision=self._normal_precision)
+            polygons.append(polygon)
+        return polygons
+
+    def _iter_prettify(self, indentation, compact, _level=0, chunk_size=2**10):
+        """
+        Yields the egg text of the polygons in chunks of chunk_size polygons.
+        """
+        kwargs = {
+            "indentation":indentation,
+            "compact":compact,
+            "_level":_level+1}
+        # Everything except the vertex numbers and normals is the same for each polygon
+        head = "".join([
+            "{0}<Polygon> {{\n".format(indentation*_level),
+            self._get("MRef", **kwargs),
+            self._get("TRef", **kwargs)])
+        vertexref = "{0}<VertexRef> {{\n{1}".format(indentation*(_level+1), indentation*(_level+2))
+        tail = "".join([
+            "\n",
+            self._entries["Ref"]._prettify(indentation, compact, _level+2),
+            "{0}}}\n{1}}}\n".format(indentation*(_level+1), indentation*_level)])
+        indices, offsets = self._indices, self._offsets
+        count = len(offsets) - 1
+        if self._normals is None:
+            head += vertexref
+            size = offsets[1] if count else 0
+            if size and offsets == array("q", range(0, len(indices) + 1, size)):
+                # All polygons have the same number of vertices, a chunk is formatted with a single %-operation
+                row_format = head.replace("%", "%%") + " ".join(["%d"] * size) + tail.replace("%", "%%")
+                for start in range(0, count, chunk_size):
+                    end = min(start + chunk_size, count)
+                    yield (row_format * (end - start)) % tuple(indices[start*size:end*size])
+                return
+            for start in range(0, count, chunk_size):
+                yield "".join([head + " ".join(map(str, indices[offsets[index]:offsets[index+1]])) + tail
+                    for index in range(start, min(start + chunk_size, count))])
+            return
+        # Written like the <Normal> of a Polygon EntryType
+        if compact:
+            before, after = "{0}<Normal> {{ ".format(indentation*(_level+1)), " }\n" + vertexref
+        else:
+            before = "{0}<Normal> {{\n{1}".format(indentation*(_level+1), indentation*(_level+2))
+            after = "\n{0}}}\n{1}".format(indentation*(_level+1), vertexref)
+        normals = frows(self._normals, self._normal_precision, 3)
+        for start in range(0, count, chunk_size):
+            yield "".join([head + before + normals[index] + after + " ".join(map(str, indices[offsets[index]:offsets[index+1]])) + tail
+                for index in range(start, min(start + chunk_size, count))])
+
+def _get_counts(indices):
+    """
+    Returns the polygon sizes for indices given as rows, or 3 (triangles) for flat indices.
+    """
+    try:
+        view = memoryview(indices)
+    except TypeError:
+        if len(indices) and hasattr(indices[0], "__len__"):
+            counts = [len(row) for row in indices]
+            return counts[0] if counts.count(counts[0]) == len(counts) else counts
+        return 3
+    return view.shape[1] if view.ndim == 2 else 3
+
+def _copy_polygon(polygon, vertices, parent=None):
+    """
+    Returns a copy of the given Polygon which refers to the given vertices
+    with one VertexRef instead of the VertexRefs of the polygon, with the
+    given parent (default: the parent of the polygon).
+    """
+    copied = polygon._copy(polygon._parent if parent is None else parent)
+    vertexref = copied._entries["VertexRef"][0]
+    vertexref._vertices = tuple(vertices)
+    copied._entries["VertexRef"] = [vertexref]
+    return copied
+
+def _pack_key(polygon):
+    """
+    Returns (ref, mref, trefs, (normal, precision)) for a Polygon EntryType which
+    a PolygonArray writes exactly the same, None for other polygons.
+    """
+    if not polygon._has_only(("VertexRef", "MRef", "TRef", "Normal")):
+        return None
+    vertexrefs = polygon._peek("VertexRef") or ()
+    if len(vertexrefs) != 1:
+        return None
+    vertexref = vertexrefs[0]
+    ref = vertexref._peek("Ref")
+    if ref is None or ref._key is None or not vertexref._has_only(("Ref", )) or not vertexref._vertices:
+        return None
+    if not all(type(number) is int for number in vertexref._vertices):
+        return None
+    mref, trefs, normal = polygon._peek("MRef"), polygon._peek("TRef") or (), polygon._peek("Normal")
+    if (mref is not None and mref._key is None) or any(tref._key is None for tref in trefs):
+        return None
+    if normal is not None and (normal._has_childs() or (normal._precision is None and not all(isinstance(value, float) for value in normal._vector))):
+        return None
+    return (ref._key[0], None if mref is None else mref._key[0], tuple(tref._key[0] for tref in trefs),
+        (normal is not None, None if normal is None else normal._precision))
+
+def _pack_polygons(entry):
+    """
+    Replaces each run of Polygon EntryTypes of the given entry with the same
+    ref, mref, trefs and normal precision by a PolygonArray, which writes them
+    exactly the same. See Group.clone().
+    """
+    polygons = entry._peek("Polygon")
+    if not polygons:
+        return
+    packed, run, key = [], [], None
+    for polygon in polygons + [None]:
+        current = None if polygon is None or isinstance(polygon, PolygonArray) else _pack_key(polygon)
+        if run and current != key:
+            ref, mref, trefs, (normals, precision) = key
+            vertices = [item._entries["VertexRef"][0]._vertices for item in run]
+            batch = PolygonArray(entry, [number for numbers in vertices for number in numbers], ref,
+                counts=[len(numbers) for numbers in vertices], mref=mref, trefs=trefs)
+            if normals:
+                batch.set_normals([value for item in run for value in item._entries["Normal"]._vector], precision)
+            packed.append(batch)
+            run = []
+        if current is not None:
+            run.append(polygon)
+            key = current
+        elif polygon is not None:
+            packed.append(polygon)
+    entry._children["Polygon"] = packed
+
 class MixInPolygon:
+    __slots__ = ()
+    _entrytypes = ("Polygon", )
+
     def append_polygon(self, *vertices, ref):
         polygon = Polygon(self, *vertices, ref=ref)
         self._entries["Polygon"].append(polygon)
+        self._changed()
         return polygon
 
-    @property
-    def polygons(self):
-        return tuple(self._entries["Polygon"])
+    def append_polygons(self, indices, ref, counts=None, mref=None, trefs=()):
+        """
+        Appends a batch of polygons which all use the VertexPool ref and share
+        the same (optional) mref and trefs. The polygons are stored in compact
+        arrays instead of creating Polygon EntryTypes for each polygon.
+
+        indices : The vertex numbers of all polygons. This can be any object
+                  supporting the buffer protocol (array.array, NumPy arrays, ...),
+                  a flat sequence or a sequence of rows, one row for each polygon.
+        counts : The number of vertices for each polygon, or one int if all polygons
+                 have the same number of vertices. When omitted, the size of the rows
+                 is used or, for flat indices, all polygons are triangles.
 
+        All vertex numbers are checked against the VertexPool in one pass.
+        """
+        polygons = PolygonArray(self, indices, ref, counts=counts, mref=mref, trefs=trefs)
+        self._entries["Polygon"].append(polygons)
+        self._changed()
+        return polygons
 
+    def _triangulate(self):
+        """
+        Splits the polygons of this entry which have more than three vertices in
+        triangles, see triangulate(). Returns the number of polygons which are split.
 
+        Polygon arrays are split in place. Each triangle of a Polygon EntryType
+        is a copy of the polygon, so the MRef, TRefs, Normal and other attributes
+        of the polygon are kept on each triangle.
+        """
+        entries = self._peek("Polygon")
+        if not entries:
+            return 0
+        vertexpools = {strname(name): vertexpool for name, vertexpool in self.get_pegg()._registry.vertexpools.items()}
+        split = 0
+        pending = {} # The polygons to split by VertexPool name, so the coordinates are looked up in batches
+        for position, polygon in enumerate(entries):
+            if isinstance(polygon, PolygonArray):
+                split += triangulate_array(polygon, vertexpools[strname(polygon._refname)]._get_coordinates)
+                continue
+            vertexrefs = polygon._peek("VertexRef") or ()
+            refs = {vertexref._peek("Ref")._ref for vertexref in vertexrefs}
+            vertices = [vertex for vertexref in vertexrefs for vertex in vertexref._vertices]
+            if len(vertices) > 3 and len(refs) == 1:
+                pending.setdefault(refs.pop(), []).append((position, polygon, vertices))
+        if not pending:
+            if split:
+                self._changed()
+            return split
+        replaced = {}
+        for ref, polygons in pending.items():
+            splits = triangulate([vertices for position, polygon, vertices in polygons], vertexpools[ref]._get_coordinates)
+            for (position, polygon, vertices), triangles in zip(polygons, splits):
+                replaced[position] = [_copy_polygon(polygon, triangle) for triangle in triangles]
+        self._entries["Polygon"] = [triangle for position, polygon in enumerate(entries) for triangle in replaced.get(position, (polygon, ))]
+        self._changed()
+        return split + len(replaced)
+
+    def _optimize_vertex_cache(self, cache_size):
+        """
+        Reorders the polygons of this entry for the vertex cache, see optimize_vertex_cache().
+        Returns the cache misses before, the cache misses after and the number of triangles.
+
+        The polygons in each polygon array are reordered in place. The Polygon
+        EntryTypes are reordered by VertexPool, among the positions of the
+        Polygon EntryTypes using that VertexPool. The order is only changed
+        when it gives less cache misses.
+        """
+        totals = [0, 0, 0]
+
+        def optimize(rows):
+            # Returns the new order of the rows, None if the order is kept
+            misses, triangles = count_misses(rows, cache_size)
+            order = reorder(rows, cache_size)
+            reordered = count_misses([rows[index] for index in order], cache_size)[0]
+            totals[0] += misses
+            totals[1] += min(misses, reordered)
+            totals[2] += triangles
+            return order if reordered < misses else None
+
+        entries = self._peek("Polygon") or []
+        batches = {} # The positions and vertices of the Polygon EntryTypes by VertexPool name
+        for position, polygon in enumerate(entries):
+            if isinstance(polygon, PolygonArray):
+                indices, offsets = polygon._indices, polygon._offsets
+                rows = [indices[offsets[index]:offsets[index+1]] for index in range(len(polygon))]
+                order = optimize(rows)
+                if order is not None:
+                    normals = polygon._get_normals()
+                    polygon._set_rows([rows[index] for index in order], normals and [normals[index] for index in order])
+                continue
+            vertexrefs = polygon._peek("VertexRef") or ()
+            refs = {vertexref._peek("Ref")._ref for vertexref in vertexrefs}
+            if len(refs) == 1:
+                vertices = [vertex for vertexref in vertexrefs for vertex in vertexref._vertices]
+                batches.setdefault(refs.pop(), []).append((position, vertices))
+        reordered = list(entries)
+        for batch in batches.values():
+            order = optimize([vertices for position, vertices in batch])
+            if order is not None:
+                for (position, vertices), index in zip(batch, order):
+                    reordered[position] = entries[batch[index][0]]
+        if reordered != entries:
+            self._entries["Polygon"] = reordered
+            self._changed()
+        return tuple(totals)
+
+    @property
+    def polygons(self):
+        """
+        Returns a tuple with all polygons. Polygon EntryTypes for polygons added
+        with append_polygons() are created on demand as detached copies, see
+        PolygonArray.to_polygons(); change these polygons through their array.
+        """
+        polygons = []
+        for polygon in self._entries["Polygon"]:
+            if isinstance(polygon, PolygonArray):
+                polygons += polygon.to_polygons(self)
+            else:
+                polygons.append(polygon)
+        return tuple(polygons)
@@ -0,0 +1,99 @@
+"""
+This is not an EntryType module. The Profiler which instruments the egg export is defined here.
+"""
+from time import perf_counter
+
+class Profiler:
+    """
+    Collects statistics about the egg export by EntryType class, see EntryType.set_profiler().
+
+    stats : dict with a dict by class name with:
+            nodes : the number of entries written.
+            bytes : the length of the egg text of the entries, without their child entries.
+            content_seconds : the time spent in get_content().
+            seconds : the time spent creating the egg text, without the child entries.
+            total_seconds : the time spent creating the egg text, including the child entries.
+    on_enter : list with callables which are called with the entry before it is written.
+    on_exit : list with callables which are called with the entry, the length of its egg
+              text and the seconds it took (both including the child entries) after it is written.
+
+    Entries written from the cache (see set_cache()) are counted with all text below
+    them, the entries below them are not visited. Vertices and polygons stored in
+    arrays are counted as part of their VertexPool or polygon array. Shared
+    entries (see InternedEntryType) don't use their kept egg text while a
+    profiler is set, so get_content() is counted for each of them.
+    """
+    def __init__(self):
+        self.stats = {}
+        self.on_enter = []
+        self.on_exit = []
+        self._stack = [] # [seconds, bytes] of the child entries of each entry being written
+
+    def reset(self):
+        """
+        Clears the statistics, the hooks are kept.
+        """
+        self.stats.clear()
+
+    def _get_stats(self, entry):
+        name = entry.__class__.__name__
+        stats = self.stats.get(name)
+        if stats is None:
+            stats = self.stats[name] = dict(nodes=0, bytes=0, content_seconds=0.0, seconds=0.0, total_seconds=0.0)
+        return stats
+
+    def get_content(self, entry):
+        """
+        Returns entry.get_content() and counts the time it took.
+        """
+        start = perf_counter()
+        content = entry.get_content()
+        self._get_stats(entry)["content_seconds"] += perf_counter() - start
+        return content
+
+    def _iter_entry(self, entry, pieces):
+        """
+        Yields the egg text in pieces for entry and counts it. Only the time spent
+        in the pieces iterator is counted, not the time the consumer spends between pieces.
+        """
+        for hook in self.on_enter:
+            hook(entry)
+        seconds, size = 0.0, 0
+        children = [0.0, 0]
+        self._stack.append(children)
+        try:
+            pieces = iter(pieces)
+            while True:
+                start = perf_counter()
+                try:
+                    pretty = next(pieces)
+                except StopIteration:
+                    break
+                finally:
+                    seconds += perf_counter() - start
+                size += len(pretty)
+                yield pretty
+        finally:
+            self._stack.pop()
+            stats = self._get_stats(entry)
+            stats["nodes"] += 1
+            stats["bytes"] += size - children[1]
+            stats["seconds"] += seconds - children[0]
+            stats["total_seconds"] += seconds
+            if self._stack:
+                self._stack[-1][0] += seconds
+                self._stack[-1][1] += size
+        for hook in self.on_exit:
+            hook(entry, size, seconds)
+
+    def report(self, sort="seconds"):
+        """
+        Returns a table with the statistics by EntryType class, sorted from high
+        to low by sort, which is one of the keys of the stats.
+        """
+        lines = ["{0:<16} {1:>10} {2:>12} {3:>10} {4:>10} {5:>10}".format("entry type", "nodes", "bytes", "content s", "self s", "total s")]
+        for name, stats in sorted(self.stats.items(), key=lambda item: item[1][sort], reverse=True):
+            lines.append("{0:<16} {nodes:>10,} {bytes:>12,} {content_seconds:>10.4f} {seconds:>10.4f} {total_seconds:>10.4f}".format(name, **stats))
+        lines.append("{0:<16} {1:>10,} {2:>12,} {3:>10.4f} {4:>10.4f}".format(
+            "total", *(sum(stats[key] for stats in self.stats.values()) for key in ("nodes", "bytes", "content_seconds", "seconds"))))
+        return "\n".join(lines)
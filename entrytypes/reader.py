@@ -0,0 +1,236 @@
+"""
+This is not an EntryType module. The event based egg reader used by pegg.iter_events() is defined here.
+"""
+import re
+import time
+from collections import Counter
+from .entrytype import ENTRY_ORDER
+from .parser import TOKENS, REFS, _unquote, _layout, _vertex_columns, _vertex_node, _polygon_node
+from .vertexarray import VertexArray
+
+BRACES = re.compile(r"[{}]")
+
+class EventReader:
+    """
+    Reads an egg file entry by entry without creating EntryTypes. Iterating
+    the reader yields these events:
+
+        ("start", entrytype, name) : an entry is opened, name is None for unnamed entries.
+        ("content", values) : a list with the values (strings) within the current entry.
+        ("end", entrytype, name) : the current entry is closed.
+        ("vertices", vertexarray) : a batch of consecutive simple vertices (only
+            coordinates with an optional <Normal> and default <UV>) with the same
+            layout, stored in a VertexArray. Other vertices give start/end events.
+
+    The file is read in pieces of buffer_size characters, only an entry which
+    does not fit in the buffer makes the buffer grow. At most batch_size
+    vertices are held before a "vertices" event is yielded.
+
+    After (or while) iterating, these attributes hold the statistics:
+    size : The number of characters read.
+    seconds : The time between the start of the iteration and the end of the last
+              top-level entry, this includes the time spent handling the events.
+    entries : Counter with the number of entries for each entrytype. Entries which
+              pegg does not know (see ENTRY_ORDER) are also counted as "Opaque".
+    vertices : The number of vertices, including the vertices in batches.
+    """
+    def __init__(self, file, buffer_size=2**16, batch_size=2**12):
+        self.file = file
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+        self.size = 0
+        self.seconds = 0.0
+        self.entries = Counter()
+        self.vertices = 0
+
+    @property
+    def throughput(self):
+        """
+        Returns the number of characters read per second, in millions.
+        """
+        return self.size / self.seconds / 10**6 if self.seconds else 0.0
+
+    def __iter__(self):
+        if hasattr(self.file, "read"):
+            yield from self._iter_events(self.file)
+            return
+        with open(self.file, encoding="utf-8") as fileobj:
+            yield from self._iter_events(fileobj)
+
+    def _iter_matches(self, fileobj):
+        """
+        Yields (offset, match) for the tokens in the file, where offset is the
+        position of the buffer in the file. A token which may continue in the
+        next piece of the file is held back until the next piece is read.
+        """
+        buffer, offset, eof = "", 0, False
+        while not eof:
+            piece = fileobj.read(self.buffer_size)
+            eof = not piece
+            buffer += piece
+            self.size += len(piece)
+            position = 0
+            for match in TOKENS.finditer(buffer):
+                if not eof and not _complete(buffer, position, match):
+                    break
+                position = match.end()
+                yield offset, match
+            buffer = buffer[position:]
+            offset += position
+
+    def _iter_events(self, fileobj):
+        start = time.perf_counter()
+        stack = []
+        entrytype = name = None
+        values, vertices, layout = [], [], None
+        known = frozenset(ENTRY_ORDER + ("Scalar", ))
+        for offset, match in self._iter_matches(fileobj):
+            index = match.lastindex
+            if index <= 4:
+                if entrytype is not None:
+                    raise ValueError("Expected '{{' after <{0}>, got <Vertex> at position {1}".format(entrytype, offset + match.start()))
+                if values:
+                    yield "content", values
+                    values = []
+                vertex = match.group(1, 2, 3, 4)
+                if _layout(vertex) != layout or len(vertices) >= self.batch_size:
+                    if vertices:
+                        yield "vertices", self._vertexarray(vertices, layout)
+                    vertices, layout = [], _layout(vertex)
+                dimension, normals, uvs = layout
+                if 1 <= dimension <= 4 and normals in (False, 3) and uvs in (False, 2, 3):
+                    vertices.append(vertex)
+                else:
+                    yield from self._node_events(_vertex_node(*vertex), known)
+                    layout = None
+                continue
+            if vertices and index != 8:
+                yield "vertices", self._vertexarray(vertices, layout)
+                vertices, layout = [], None
+            if index <= 7:
+                if entrytype is not None:
+                    raise ValueError("Expected '{{' after <{0}>, got <Polygon> at position {1}".format(entrytype, offset + match.start()))
+                if values:
+                    yield "content", values
+                    values = []
+                yield from self._polygon_events(match.group(5, 6, 7, 0), known)
+            elif index == 11:
+                if entrytype is None:
+                    values.append(_unquote(match.group(11)))
+                elif name is None:
+                    name = _unquote(match.group(11))
+                else:
+                    raise ValueError("Expected '{{' after <{0}> {1}, got {2!r} at position {3}".format(entrytype, name, match.group(11), offset + match.start()))
+            elif index == 10:
+                if values:
+                    yield "content", values
+                    values = []
+                if match.group(10) == "{":
+                    if entrytype is None:
+                        raise ValueError("Unexpected '{{' at position {0}".format(offset + match.start()))
+                    self._count(entrytype, known)
+                    stack.append((entrytype, name))
+                    yield "start", entrytype, name
+                    entrytype = name = None
+                elif not stack:
+                    raise ValueError("Unexpected '}}' at position {0}".format(offset + match.start()))
+                else:
+                    yield ("end", ) + stack.pop()
+                    if not stack:
+                        self.seconds = time.perf_counter() - start
+            elif index == 9:
+                if entrytype is not None:
+                    raise ValueError("Expected '{{' after <{0}>, got <{1}> at position {2}".format(entrytype, match.group(9), offset + match.start()))
+                if values:
+                    yield "content", values
+                    values = []
+                entrytype = match.group(9).strip()
+        if vertices:
+            yield "vertices", self._vertexarray(vertices, layout)
+        if values:
+            yield "content", values
+        if entrytype is not None or stack:
+            raise ValueError("Unexpected end of the egg text, <{0}> is not closed".format(entrytype or stack[-1][0]))
+        self.seconds = time.perf_counter() - start
+
+    def _node_events(self, node, known):
+        """
+        Yields the events for a node created by the parser, see parser.parse().
+        """
+        entrytype, name = node[0], None if node[1] is None else _unquote(node[1])
+        self._count(entrytype, known)
+        yield "start", entrytype, name
+        if node[2]:
+            yield "content", [_unquote(value) for value in node[2]]
+        for child in node[3]:
+            yield from self._node_events(child, known)
+        yield "end", entrytype, name
+
+    def _polygon_events(self, polygon, known):
+        """
+        Yields the events for a simple polygon tuple, see parser.parse().
+        """
+        refs, vertices, ref, text = polygon
+        found = REFS.findall(refs)
+        if len(found) != refs.count("<"):
+            yield from self._node_events(_polygon_node(polygon), known)
+            return
+        yield "start", "Polygon", None
+        for entrytype, name in found:
+            self.entries[entrytype] += 1
+            yield "start", entrytype, None
+            if name:
+                yield "content", [name]
+            yield "end", entrytype, None
+        yield "start", "VertexRef", None
+        yield "content", vertices.split()
+        yield "start", "Ref", None
+        yield "content", [ref]
+        yield "end", "Ref", None
+        yield "end", "VertexRef", None
+        yield "end", "Polygon", None
+        self.entries["Polygon"] += 1
+        self.entries["VertexRef"] += 1
+        self.entries["Ref"] += 1
+
+    def _count(self, entrytype, known):
+        self.entries[entrytype] += 1
+        if entrytype not in known:
+            self.entries["Opaque"] += 1
+
+    def _vertexarray(self, vertices, layout):
+        dimension, normals, uvs = layout
+        vertexarray = VertexArray(dimension, normals=normals, uvs={None: uvs} if uvs else None)
+        numbers, coords, normals, uvs = _vertex_columns(vertices, normals, uvs)
+        vertexarray.extend(numbers, coords, normals=normals, uvs=uvs)
+        self.entries["Vertex"] += len(vertices)
+        self.vertices += len(vertices)
+        return vertexarray
+
+def _complete(buffer, position, match):
+    """
+    Returns False if the token may continue after the end of the buffer, or if an
+    unclosed quote is found between the previous token (ending at position) and this token.
+    """
+    if match.end() == len(buffer) or '"' in buffer[position:match.start()]:
+        return False
+    index = match.lastindex
+    if index == 11:
+        return not match.group(11).startswith("/*")
+    if index == 9 and match.group(9).strip() in ("Vertex", "Polygon"):
+        # Only a complete <Vertex> or <Polygon> is matched as one token by the fast path,
+        # so wait for the end of the entry before handling it as separate tokens.
+        depth = 0
+        for brace in BRACES.finditer(buffer, match.end()):
+            depth += 1 if brace.group() == "{" else -1
+            if depth <= 0:
+                return True
+        return False
+    return True
+
+def iter_events(file, buffer_size=2**16, batch_size=2**12):
+    """
+    Returns an EventReader for the egg file, which can be a path or a file object
+    opened in text mode. Iterate it to get the events, see EventReader.
+    """
+    return EventReader(file, buffer_size=buffer_size, batch_size=batch_size)
@@ -1,17 +1,27 @@
-from .entrytype import EntryType
+from .entrytype import InternedEntryType
 from .tools import strname
 
-class Ref(EntryType):
+class Ref(InternedEntryType):
+    __slots__ = ("_ref", )
+
     def __init__(self, parent, ref):
         super().__init__(parent=parent)
-        if not ref in self.vertexpools:
-            raise KeyError("VertexPool {0!r} does not exist.".format(ref))
+        self._test(self._root, ref)
         self._ref = strname(ref)
 
+    @staticmethod
+    def _test(root, ref):
+        if not root._registry.deferred and not ref in root._registry.vertexpools:
+            raise KeyError("VertexPool {0!r} does not exist.".format(ref))
+
     def get_content(self):
         return self._ref
 
 
 class MixInRef:
+    __slots__ = ()
+    _entrytypes = ("Ref", )
+
     def set_ref(self, ref):
-        self._entries["Ref"] = Ref(self, ref)
+        self._entries["Ref"] = Ref._interned(self, ref)
+        self._changed()
@@ -0,0 +1,50 @@
+"""
+This is not an EntryType module. The registry kept by the root of a pegg instance is defined here.
+"""
+from collections import Counter
+
+class Registry:
+    """
+    Keeps track of the entries which are looked up by name from anywhere in a
+    pegg instance, so these lookups don't need to walk the tree.
+
+    vertexpools : dict with all VertexPools by name, VertexPool names are unique
+                  within a pegg instance.
+    uv_names : Counter with the uv-name scalar values of all textures.
+    cache : dict with the cached egg text by EntryType, see EntryType.set_cache().
+    filling : True while prettify() creates the egg text, only then the text is added to the cache.
+    changes : The number of changes, used to detect changes while egg text is created.
+    deferred : Larger than zero while references are not checked when entries are added, see Pegg.deferred_validation().
+    interned : dict with the shared TRef, MRef, Ref and Scalar entries, see InternedEntryType.
+    templates : dict with the packed copy of each cloned Group, dropped when the Group is changed, see Group.clone().
+    profiler : The Profiler which instruments the egg export, None when turned off, see EntryType.set_profiler().
+    """
+    def __init__(self):
+        self.vertexpools = dict()
+        self.uv_names = Counter()
+        self.cache = dict()
+        self.cache_enabled = True
+        self.filling = False
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.changes = 0
+        self.deferred = 0
+        self.interned = dict()
+        self.templates = dict()
+        self.profiler = None
+
+    def add_vertexpool(self, name, vertexpool):
+        if name in self.vertexpools:
+            raise ValueError("Cannot add {0!r}, the vertexpool already exists within this pegg instance.".format(name))
+        self.vertexpools[name] = vertexpool
+
+    def replace_uv_name(self, old, new):
+        """
+        Registers the uv-name value new instead of old, both can be None.
+        """
+        if old is not None:
+            self.uv_names[old] -= 1
+            if not self.uv_names[old]:
+                del self.uv_names[old]
+        if new is not None:
+            self.uv_names[new] += 1
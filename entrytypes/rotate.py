@@ -1,7 +1,9 @@
 from .entrytype import EntryType
-from .tools import fstr
+from .tools import fjoin
 
 class Rotate(EntryType):
+    __slots__ = ("_precision", "_values")
+
     def __init__(self, parent, degrees, *args, precision=None):
         super().__init__(parent=parent)
         values = list(args)
@@ -12,11 +14,15 @@ class Rotate(EntryType):
         self._values = values
 
     def get_content(self):
-        return " ".join(map(lambda value: fstr(value, self._precision), self._values))
+        return fjoin(self._values, self._precision)
 
 
 class MixInRotate:
+    __slots__ = ()
+    _entrytypes = ("Rotate", )
+
     def set_rotate(self, degrees, *args, precision=None):
         #if self.get_parent().__class__.__name__ != "Texture":
         #    raise Matrix3NotAllowedError("Matrix3 is only allowed within a Texture Entry")
         self._entries["Rotate"] = Rotate(self, degrees, *args, precision=precision)
+        self._changed()
@@ -1,6 +1,8 @@
-from .entrytype import EntryType
+from .entrytype import InternedEntryType
+
+class Scalar(InternedEntryType):
+    __slots__ = ("_value", )
 
-class Scalar(EntryType):
     def __init__(self, parent, name, value):
         super().__init__(parent=parent, name=name)
         self._value = value
@@ -9,8 +11,12 @@ class Scalar(EntryType):
         return str(self._value)
 
 class MixInScalar:
+    __slots__ = ()
+    _entrytypes = ("Scalar", )
+
     def add_scalar(self, name, value):
-        self._entries["Scalar"][name] = Scalar(self, name, value)
+        self._entries["Scalar"][name] = Scalar._interned(self, name, value)
+        self._changed()
 
     def get_scaler(self, name, default=None):
         return self._entries["Scalar"][name].get_content() if name in self._entries["Scalar"] else default;
\ No newline at end of file
@@ -4,6 +4,9 @@ from .transform import MixInTransform
 from .tools import fstr, strname, ProtectedDict
 
 class Texture(EntryType, MixInScalar, MixInTransform):
+    __slots__ = ("_filename", )
+    _cacheable = True
+
     _scalars = [
         "alpha-file", "alpha-file-channel", "format", "compression",
         "wrap", "wrapu", "wrapv", "wrapw", "borderr", "borderg", "borderb", "bordera",
@@ -16,6 +19,12 @@ class Texture(EntryType, MixInScalar, MixInTransform):
     def get_content(self):
         return '"' + self._filename + '"'
 
+    def add_scalar(self, name, value):
+        if name == "uv-name":
+            # Keep the registry in sync so add_uv() can check uv-names without scanning all textures
+            self.get_pegg()._registry.replace_uv_name(self.get_scalar("uv-name"), str(value))
+        super().add_scalar(name, value)
+
     def __set_wrap(self, name, repeat_definition):
         self.__set_uppercase_value(name, repeat_definition, (
             "CLAMP", "REPEAT", "MIRROR", "MIRROR_ONCE", "BORDER_COLOR"))
@@ -266,6 +275,9 @@ class Texture(EntryType, MixInScalar, MixInTransform):
 
 
 class MixInTexture:
+    __slots__ = ()
+    _entrytypes = ("Texture", )
+
     def add_texture(self, name, filename):
         """
         <Texture> name { filename [scalars] }
@@ -284,6 +296,7 @@ class MixInTexture:
         if name in self._entries["Texture"]:
             raise TextureExistError("Cannot add {0!r}, the texture already exists.".format(name))
         texture = self._entries["Texture"][name] = Texture(self, name, filename)
+        self._changed()
         return texture
 
     @property
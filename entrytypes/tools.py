@@ -1,6 +1,39 @@
 """
 This is not an EntryType module. Some tools used by EntryTypes are defined here.
 """
+from array import array
+from itertools import chain
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+def toarray(typecode, values):
+    """
+    Returns a new array.array with the given typecode holding the given values.
+
+    values can be any object supporting the buffer protocol (array.array,
+    NumPy arrays, ...), a flat sequence of numbers or a sequence of sequences
+    like [(x, y, z), ...] which will be flattened. Buffers with a matching
+    item format are copied in one go, other values are converted one by one.
+    """
+    try:
+        view = memoryview(values)
+    except TypeError:
+        values = list(values)
+        if values and hasattr(values[0], "__len__"):
+            values = list(chain.from_iterable(values))
+        return array(typecode, values)
+    result = array(typecode)
+    if view.c_contiguous and view.itemsize == result.itemsize and (
+            view.format == typecode or (view.format in "lq" and typecode in "lq")):
+        result.frombytes(view.cast("B"))
+        return result
+    values = view.tolist()
+    if view.ndim > 1:
+        values = list(chain.from_iterable(values))
+    return array(typecode, values)
 
 def fstr(value, precision):
     """
@@ -16,6 +49,51 @@ def fstr(value, precision):
     """
     return str(value) if precision is None else "{0:.{1}f}".format(value, precision)
 
+def _format(precision):
+    return "%s" if precision is None else "%.{0}f".format(precision)
+
+def _tolist(values):
+    """
+    Returns the values as a list or tuple of Python numbers. NumPy arrays and
+    array.array are converted in one call, which is much faster than reading
+    them value by value.
+    """
+    if numpy is not None and isinstance(values, numpy.ndarray):
+        return values.ravel().tolist()
+    if isinstance(values, array):
+        return values.tolist()
+    return values if isinstance(values, (list, tuple)) else list(values)
+
+def fjoin(values, precision, separator=" "):
+    """
+    Returns one string with all given values formatted like fstr() and joined by separator.
+    The complete block is formatted with a single %-operation instead of a call for each value.
+
+    examples:
+        fjoin([3, .5], None) --> "3 0.5"
+        fjoin([3, .5], 2)    --> "3.00 0.50"
+    """
+    values = _tolist(values)
+    return separator.join([_format(precision)] * len(values)) % tuple(values)
+
+def frows(values, precision, width, chunk_size=2**12):
+    """
+    Returns a list of strings, one for each row of width values, formatted like fjoin().
+    values is a flat block (list, array.array, NumPy array, ...) holding the rows one
+    after another. The rows are formatted in chunks of chunk_size rows at once.
+
+    examples:
+        frows([1, 2, 3, 4], 1, 2) --> ["1.0 2.0", "3.0 4.0"]
+    """
+    values = _tolist(values)
+    row_format = " ".join([_format(precision)] * width)
+    rows = []
+    step = width * chunk_size
+    for start in range(0, len(values), step):
+        chunk = tuple(values[start:start+step])
+        rows += ("\n".join([row_format] * (len(chunk) // width)) % chunk).split("\n")
+    return rows
+
 def strname(name, quote=False):
     """
     Returns a string with a safe name for the egg format.
@@ -44,6 +122,12 @@ class ProtectedDict:
         for key in self._dict.keys():
             yield key
 
+    def __contains__(self, key):
+        return key in self._dict
+
+    def __len__(self):
+        return len(self._dict)
+
     def items(self):
         return self._dict.items()
 
@@ -59,6 +143,9 @@ if __name__ == "__main__":
     print(fstr(.123456, None))
     print(fstr(.123456, 4))
     print(fstr(.999999, 4))
+    print(fjoin([3, .5], None))
+    print(fjoin([3, .5], 2))
+    print(frows([1, 2, 3, 4], 1, 2))
     print(strname("{test}"))
     print(strname("Blue 001"))
     print(strname("Blue"))
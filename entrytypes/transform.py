@@ -3,6 +3,8 @@ from .matrix import MixInMatrix
 from .rotate import MixInRotate
 
 class Transform(EntryType, MixInMatrix, MixInRotate):
+    __slots__ = ()
+
     def __init__(self, parent):
         super().__init__(parent=parent)
 
@@ -10,8 +12,12 @@ class MixInTransform:
     """
     This MixIn is used for the Texture and Group entry-types"
     """
+    __slots__ = ()
+    _entrytypes = ("Transform", )
+
     @property
     def transform(self):
         if self._entries["Transform"] is None:
             self._entries["Transform"] = Transform(self)
+            self._changed()
         return self._entries["Transform"]
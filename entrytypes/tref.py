@@ -1,18 +1,27 @@
-from .entrytype import EntryType
+from .entrytype import InternedEntryType
 from .tools import strname
 
-class TRef(EntryType):
+class TRef(InternedEntryType):
+    __slots__ = ("_tref", )
+
     def __init__(self, parent, tref):
-        if not tref in self.get_pegg(parent).textures:
-            raise KeyError("Texture {0!r} does not exists.".format(tref))
+        self._test(self.get_pegg(parent), tref)
         super().__init__(parent=parent)
         self._tref = strname(tref)
-        
+
+    @staticmethod
+    def _test(root, tref):
+        if not root._registry.deferred and not tref in root.textures:
+            raise KeyError("Texture {0!r} does not exists.".format(tref))
+
     def get_content(self):
         return self._tref
 
 
 class MixInTRef:
+    __slots__ = ()
+    _entrytypes = ("TRef", )
+
     def append_tref(self, tref):
         """
         This refers to a named <Texture> entry given earlier.  It applies
@@ -23,4 +32,5 @@ class MixInTRef:
         multitexture.  In this case, each named texture is applied to the
         polygon, in the order specified.
         """
-        self._entries["TRef"].append(TRef(self, tref))
\ No newline at end of file
+        self._entries["TRef"].append(TRef._interned(self, tref))
+        self._changed()
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+This is not an EntryType module. The triangulation used by triangulate() is defined here.
+"""
+
+def _project(points):
+    """
+    Returns the given (x, y, z) points as (u, v) points in the plane of the
+    polygon, by leaving out the axis the polygon normal (Newell's method) is
+    closest to. The orientation of the polygon is kept.
+    """
+    normal = [0.0, 0.0, 0.0]
+    for (x1, y1, z1), (x2, y2, z2) in zip(points, points[1:] + points[:1]):
+        normal[0] += (y1 - y2) * (z1 + z2)
+        normal[1] += (z1 - z2) * (x1 + x2)
+        normal[2] += (x1 - x2) * (y1 + y2)
+    axis = max(range(3), key=lambda axis: abs(normal[axis]))
+    u, v = ((1, 2), (2, 0), (0, 1))[axis]
+    if normal[axis] < 0:
+        u, v = v, u
+    return [(point[u], point[v]) for point in points]
+
+def _cross(a, b, c):
+    return (b[0] - a[0]) * (c[1] - a[1]) - (b[1] - a[1]) * (c[0] - a[0])
+
+def _is_convex(points):
+    """
+    Returns True if the polygon with the given (u, v) points (counter-clockwise) is convex.
+    """
+    count = len(points)
+    return all(_cross(points[index-2], points[index-1], points[index]) >= 0 for index in range(count))
+
+def _ear_clip(points):
+    """
+    Returns a list with (a, b, c) index triangles for the counter-clockwise
+    polygon with the given (u, v) points. The rest of a polygon without ears
+    (for example a self-intersecting polygon) is split as a fan.
+    """
+    remaining = list(range(len(points)))
+    triangles = []
+    index = 0
+    misses = 0
+    while len(remaining) > 3 and misses < len(remaining):
+        count = len(remaining)
+        a, b, c = remaining[(index - 1) % count], remaining[index % count], remaining[(index + 1) % count]
+        pa, pb, pc = points[a], points[b], points[c]
+        ear = _cross(pa, pb, pc) > 0 and not any(
+            _cross(pa, pb, points[other]) >= 0 and _cross(pb, pc, points[other]) >= 0 and _cross(pc, pa, points[other]) >= 0
+            for other in remaining if other not in (a, b, c) and points[other] not in (pa, pb, pc))
+        if ear:
+            triangles.append((a, b, c))
+            del remaining[index % count]
+            misses = 0
+        else:
+            index += 1
+            misses += 1
+    triangles += [(remaining[0], remaining[position], remaining[position+1]) for position in range(1, len(remaining) - 1)]
+    return triangles
+
+def triangulate(polygons, coordinates):
+    """
+    Returns a list with a list of (a, b, c) triangles for each of the given polygons,
+    polygons with less than four vertices are returned as they are.
+
+    polygons : A sequence with a sequence of vertex numbers for each polygon.
+    coordinates : A function which returns the (x, y, z) coordinates for a list of vertex numbers.
+
+    The coordinates of all polygons with more than three vertices are looked
+    up at once. Convex polygons are split in a fan, concave polygons by ear
+    clipping. The triangles keep the vertex order (winding) of the polygon.
+    """
+    polygons = [tuple(polygon) for polygon in polygons]
+    numbers = [number for polygon in polygons if len(polygon) > 3 for number in polygon]
+    points = iter(coordinates(numbers) if numbers else ())
+    result = []
+    for polygon in polygons:
+        count = len(polygon)
+        if count <= 3:
+            result.append([polygon])
+            continue
+        projected = _project([next(points) for number in polygon])
+        if _is_convex(projected):
+            result.append([(polygon[0], polygon[index], polygon[index+1]) for index in range(1, count - 1)])
+        else:
+            result.append([(polygon[a], polygon[b], polygon[c]) for a, b, c in _ear_clip(projected)])
+    return result
+
+def triangulate_array(polygons, coordinates):
+    """
+    Splits all polygons in the given PolygonArray in triangles, in place.
+    Returns the number of polygons which are split.
+    """
+    indices, offsets = polygons._indices, polygons._offsets
+    counts = [offsets[index+1] - offsets[index] for index in range(len(offsets) - 1)]
+    if all(count <= 3 for count in counts):
+        return 0
+    rows = [indices[offsets[index]:offsets[index+1]] for index in range(len(counts))]
+    splits = triangulate(rows, coordinates)
+    normals = polygons._get_normals() or [None] * len(rows)
+    polygons._set_rows(
+        [triangle for split in splits for triangle in split],
+        [normal for split, normal in zip(splits, normals) for triangle in split])
+    return sum(count > 3 for count in counts)
@@ -1,20 +1,71 @@
 from .entrytype import EntryType
-from .tools import fstr, ProtectedDict
+from .normal import Normal
+from .tools import fjoin, ProtectedDict
+
+class Tangent(Normal):
+    __slots__ = ()
+
+class Binormal(Normal):
+    __slots__ = ()
 
 class UV(EntryType):
+    __slots__ = ("_precision", "_co")
+    _entrytypes = ("Tangent", "Binormal")
+
     def __init__(self, parent, u, v, w=None, name=None, precision=None): # Name can be None for an UV EntryType
         super().__init__(parent=parent, name=name)
         self._precision = precision
         self._co = [value for value in [u, v, w] if value is not None]
 
     def get_content(self):
-        return " ".join(map(lambda value: fstr(value, self._precision), self._co))
+        return fjoin(self._co, self._precision)
 
     @property
     def co(self):
         return self._co
 
+    def set_tangent(self, *vector, precision=None):
+        """
+        <Tangent> { x y z }
+
+        The tangent of the vertex for this UV set, the direction in which u
+        increases. See set_binormal() and VertexPool.compute_tangents().
+        """
+        tangent = self._entries["Tangent"] = Tangent(self, *vector, precision=precision)
+        self._changed()
+        return tangent
+
+    def get_tangent(self):
+        return self._entries["Tangent"]
+
+    def set_binormal(self, *vector, precision=None):
+        """
+        <Binormal> { x y z }
+
+        The binormal of the vertex for this UV set, the direction in which v
+        increases. See set_tangent() and VertexPool.compute_tangents().
+        """
+        binormal = self._entries["Binormal"] = Binormal(self, *vector, precision=precision)
+        self._changed()
+        return binormal
+
+    def get_binormal(self):
+        return self._entries["Binormal"]
+
+def test_uv_name(entry, name):
+    """
+    Raises a ValueError if there is no texture in the pegg instance of the given entry
+    with a scalar for uv-name matching the given name, except while the validation
+    is deferred, see Pegg.deferred_validation().
+    """
+    registry = entry.get_pegg()._registry
+    if not registry.deferred and name not in registry.uv_names:
+        raise ValueError("Cannot add {0!r}, there is not texture with a reference to this uv-name.".format(name))
+
 class MixInUV:
+    __slots__ = ()
+    _entrytypes = ("UV", )
+
     def add_uv(self, u, v, w=None, name=None, precision=None):
         """
         <UV> [name] { u v [w] [tangent] [binormal] [morph-list] }
@@ -46,9 +97,10 @@ class MixInUV:
         name = None if name in ["", None] else str(name) # Replace "" with None and make sure 0 translates to string "0".
         if name in self._entries["UV"]:
             raise ValueError("Cannot add {0!r}, the UV already exists.".format("default" if name is None else name))
-        if name is not None and name not in [texentry.get_scalar("uv-name") for texentry in self.get_pegg().textures.values()]:
-            raise ValueError("Cannot add {0!r}, there is not texture with a reference to this uv-name.".format(name))
+        if name is not None:
+            test_uv_name(self, name)
         uv = self._entries["UV"][name] = UV(self, u, v, w, name, precision=precision)
+        self._changed()
         return uv
 
     @property
@@ -0,0 +1,105 @@
+"""
+This is not an EntryType module. The validation of all references in a pegg instance,
+used by Pegg.validate() and Pegg.deferred_validation(), is defined here.
+"""
+from collections import Counter
+from .entrytype import EntryType
+from .mref import MRef
+from .polygon import PolygonArray
+from .ref import Ref
+from .tref import TRef
+from .vertexpool import VertexPool
+from .vertexref import VertexRef
+from .tools import strname
+
+class _Names:
+    """
+    Looks up the values of a dict by the strname() of their key. Names which
+    strname() doesn't change are found directly, the other keys are only
+    converted on the first lookup of another name, so checking a few names
+    doesn't take time for each key.
+    """
+    def __init__(self, dictionary):
+        self._dict = dictionary
+        self._names = None
+
+    def get(self, name):
+        value = self._dict.get(name)
+        if value is not None and strname(name) == name:
+            return value
+        if self._names is None:
+            self._names = {strname(key): value for key, value in self._dict.items()}
+        return self._names.get(name)
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+def find_dangling(pegg, entry=None):
+    """
+    Returns a list with a message for each reference in the given pegg instance
+    to a VertexPool, vertex, Texture, Material or uv-name which does not exist,
+    only for the references below entry when it is given.
+    The tree is walked once, without the entries below the vertices, and the
+    vertex numbers are checked with one set operation for each VertexPool and
+    each polygon array.
+    """
+    registry = pegg._registry
+    vertexpools = _Names(registry.vertexpools)
+    textures = _Names(pegg._peek("Texture") or {})
+    materials = _Names(pegg._peek("Material") or {})
+    problems = Counter()
+    vertices = {} # The vertex numbers used by VertexRefs for each VertexPool name
+    missing = {} # The missing vertex numbers for each VertexPool name
+    stack = [pegg if entry is None else entry]
+    while stack:
+        entry = stack.pop()
+        if isinstance(entry, VertexRef):
+            # The Ref of a VertexRef is checked here, a VertexRef has no other child entries
+            ref = entry._peek("Ref")._ref
+            if ref in vertexpools:
+                vertices.setdefault(ref, set()).update(entry._vertices)
+            else:
+                problems["VertexPool {0!r} does not exist".format(ref)] += 1
+            continue
+        if isinstance(entry, VertexPool):
+            # Only the uv-names are checked, the entries below the vertices have no references
+            names = [name for name in entry._vertexarray.uvs if name is not None] if entry._vertexarray is not None else []
+            for name in names:
+                if name not in registry.uv_names:
+                    problems["There is no texture with a reference to uv-name {0!r}".format(name)] += len(entry._vertexarray)
+            for vertex in (entry._peek("Vertex") or {}).values():
+                for name in vertex._peek("UV") or ():
+                    if name is not None and name not in registry.uv_names:
+                        problems["There is no texture with a reference to uv-name {0!r}".format(name)] += 1
+            continue
+        if isinstance(entry, Ref):
+            if entry._ref not in vertexpools:
+                problems["VertexPool {0!r} does not exist".format(entry._ref)] += 1
+        elif isinstance(entry, PolygonArray):
+            ref = strname(entry._refname)
+            if ref in vertexpools:
+                missing.setdefault(ref, set()).update(vertexpools.get(ref).missing_vertices(entry._indices))
+        elif isinstance(entry, TRef):
+            if entry._tref not in textures:
+                problems["Texture {0!r} does not exist".format(entry._tref)] += 1
+        elif isinstance(entry, MRef):
+            if entry._mref not in materials:
+                problems["Material {0!r} does not exist".format(entry._mref)] += 1
+        stack.extend(EntryType.get_childs(entry))
+    for ref, numbers in vertices.items():
+        if ref in vertexpools:
+            missing.setdefault(ref, set()).update(vertexpools.get(ref).missing_vertices(numbers))
+    for ref, numbers in missing.items():
+        if numbers:
+            numbers = sorted(numbers)
+            problems["Vertices {0} not found in VertexPool {1!r}".format(
+                ", ".join(map(str, numbers[:10])) + (", ..." if len(numbers) > 10 else ""), ref)] += 1
+    return ["{0} ({1} times)".format(problem, count) if count > 1 else problem for problem, count in problems.items()]
+
+def test_dangling(pegg, entry=None):
+    """
+    Raises a ValueError listing the problems found by find_dangling().
+    """
+    problems = find_dangling(pegg, entry)
+    if problems:
+        raise ValueError("Found {0} invalid reference(s):\n    {1}".format(len(problems), "\n    ".join(problems)))
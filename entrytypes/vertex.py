@@ -1,9 +1,13 @@
+from array import array
 from .entrytype import EntryType
-from .uv import MixInUV
-from .normal import MixInNormal
-from .tools import fstr, ProtectedDict
+from .uv import MixInUV, UV, Tangent, Binormal, test_uv_name
+from .normal import MixInNormal, Normal
+from .vertexarray import VertexArray
+from .tools import fjoin, toarray, ProtectedDict
 
 class Vertex(EntryType, MixInUV, MixInNormal):
+    __slots__ = ("_precision", "_coordinates")
+
     def __init__(self, parent, number, x, *coordinates, precision=None): # coordinates y, z, and w are optional
         super().__init__(parent=parent, name=number)
         self._precision = precision
@@ -13,7 +17,7 @@ class Vertex(EntryType, MixInUV, MixInNormal):
             raise ValueError("Too many coordinate values given: {0} (maximum=4)".format(len(self._coordinates)))
 
     def get_content(self):
-        return " ".join(map(lambda value: fstr(value, self._precision), self._coordinates))
+        return fjoin(self._coordinates, self._precision)
 
     @property
     def x(self):
@@ -38,6 +42,9 @@ class Vertex(EntryType, MixInUV, MixInNormal):
             return None
 
 class MixInVertex:
+    __slots__ = ()
+    _entrytypes = ("Vertex", )
+
     def add_vertex(self, number, x, *coordinates, precision=None):
         """
         <Vertex> number { x [y [z [w]]] [attributes] }
@@ -75,11 +82,133 @@ class MixInVertex:
         """
         if type(number) is not int:
             raise TypeError("number should be a type int, not {0}".format(type(number)))
-        if number in self._entries["Vertex"]:
+        if number in self._entries["Vertex"] or (self._vertexarray is not None and number in self._vertexarray):
             raise ValueError("Cannot add {0!r}, the vertex number already exists.".format(number))
         vertex = self._entries["Vertex"][number] = Vertex(self, number, x, *coordinates, precision=precision)
+        self._changed()
         return vertex
 
+    def add_vertices(self, numbers, coords, normals=None, uvs=None, uv_name=None, precision=None):
+        """
+        Adds a batch of vertices which are stored in contiguous arrays instead of
+        creating a Vertex EntryType for each vertex. This is the preferred way for
+        adding large amounts of vertices.
+
+        numbers : The vertex numbers, one int for each vertex.
+        coords : The x [y [z [w]]] coordinates for each vertex. This can be any object
+                 supporting the buffer protocol (array.array, NumPy arrays, ...), a flat
+                 sequence or a sequence of rows. The number of coordinates per vertex
+                 is derived from the total number of values.
+        normals : Optional x y z normal for each vertex, see <Normal> in set_normal().
+        uvs : Optional u v [w] texture coordinates for each vertex, see <UV> in add_uv().
+        uv_name : Optional name for the uvs, see add_uv().
+
+        All values are stored as floats. The first batch defines which attributes
+        the vertices in the arrays have, all following batches must give the same
+        attributes and precision.
+        Vertex EntryTypes for these vertices are only created when they are
+        requested with the vertices property.
+        """
+        numbers = toarray("q", numbers)
+        count = len(numbers)
+        if not count:
+            return
+        start = numbers[0]
+        if numbers == array("q", range(start, start + count)):
+            # Consecutive numbers are unique, only the existing vertices in this range are looked up
+            vertices, stop = self._entries["Vertex"], start + count
+            if count < len(vertices):
+                existing = {number for number in range(start, stop) if number in vertices}
+            else:
+                existing = {number for number in vertices if start <= number < stop}
+            if self._vertexarray is not None:
+                existing.update(self._vertexarray.intersection(range(start, stop)))
+        else:
+            unique = set(numbers)
+            if len(unique) != count:
+                raise ValueError("Cannot add vertices, the given vertex numbers are not unique.")
+            existing = unique.intersection(self._entries["Vertex"])
+            if self._vertexarray is not None:
+                existing.update(number for number in unique if number in self._vertexarray)
+        if existing:
+            raise ValueError("Cannot add {0!r}, the vertex number already exists.".format(min(existing)))
+        coords = toarray("d", coords)
+        if uvs is not None and uv_name is not None:
+            uv_name = str(uv_name)
+            test_uv_name(self, uv_name)
+        if self._vertexarray is None:
+            dimension, remainder = divmod(len(coords), count)
+            if remainder or not 1 <= dimension <= 4:
+                raise ValueError("Expected 1 to 4 coordinate values for each of the {0} vertices, got {1} values".format(count, len(coords)))
+            uv_dimensions = None
+            if uvs is not None:
+                uvs = toarray("d", uvs)
+                uv_dimension, remainder = divmod(len(uvs), count)
+                if remainder or not 2 <= uv_dimension <= 3:
+                    raise ValueError("Expected 2 or 3 uv values for each of the {0} vertices, got {1} values".format(count, len(uvs)))
+                uv_dimensions = {uv_name: uv_dimension}
+            # The VertexArray is only kept when the first batch is valid
+            vertexarray = VertexArray(dimension, normals is not None, uv_dimensions, precision=precision)
+            vertexarray.extend(numbers, coords, normals, uvs, uv_name)
+            self._vertexarray = vertexarray
+        elif precision != self._vertexarray.precision:
+            raise ValueError("Cannot add vertices with precision {0}, the other vertices in this VertexPool have precision {1}".format(
+                precision, self._vertexarray.precision))
+        else:
+            self._change_vertexarray().extend(numbers, coords, normals, uvs, uv_name)
+        self._changed()
+
     @property
     def vertices(self):
-        return ProtectedDict(self._entries["Vertex"])
\ No newline at end of file
+        if self._vertexarray is None:
+            return ProtectedDict(self._entries["Vertex"])
+        return VertexMapping(self)
+
+class VertexMapping(ProtectedDict):
+    """
+    Used for the vertices of a VertexPool which stores vertices in a VertexArray.
+    Vertex EntryTypes for vertices in the array are created on demand, changing
+    them does not change the vertices stored in the VertexPool.
+    """
+    def __init__(self, vertexpool):
+        super().__init__(vertexpool._entries["Vertex"])
+        self._vertexpool = vertexpool
+        self._vertexarray = vertexpool._vertexarray
+
+    def __getitem__(self, number):
+        if number in self._dict:
+            return self._dict[number]
+        row = self._vertexarray.find(number)
+        if row is None:
+            raise KeyError(number)
+        number, coords, normal, uvs = self._vertexarray.get_row(row)
+        precision = self._vertexarray.precision
+        vertex = Vertex(self._vertexpool, number, *coords, precision=precision)
+        if normal is not None:
+            vertex._entries["Normal"] = Normal(vertex, *normal, precision=precision)
+        for name, uv in uvs.items():
+            vertex._entries["UV"][name] = UV(vertex, *uv, name=name, precision=precision)
+        for name, (tangent, binormal) in self._vertexarray.get_tangents(row).items():
+            uv = vertex._entries["UV"][name]
+            uv._entries["Tangent"] = Tangent(uv, *tangent, precision=precision)
+            uv._entries["Binormal"] = Binormal(uv, *binormal, precision=precision)
+        return vertex
+
+    def __contains__(self, number):
+        return number in self._dict or number in self._vertexarray
+
+    def __iter__(self):
+        yield from self._dict.keys()
+        yield from self._vertexarray.numbers
+
+    def __len__(self):
+        return len(self._dict) + len(self._vertexarray)
+
+    def items(self):
+        return [(number, self[number]) for number in self]
+
+    def keys(self):
+        return list(self)
+
+    def values(self):
+        return [self[number] for number in self]
\ No newline at end of file
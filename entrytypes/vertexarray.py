@@ -0,0 +1,286 @@
+"""
+This is not an EntryType module. The columnar vertex storage used by a VertexPool is defined here.
+"""
+from array import array
+from itertools import chain
+from .tools import toarray, frows, strname, numpy
+
+class VertexArray:
+    """
+    Stores vertices in contiguous arrays instead of one Vertex EntryType per vertex.
+
+    numbers holds the vertex numbers, coords, normals and the uvs hold the values
+    of each vertex row after row. The layout (dimensions, normals and uv sets) is
+    defined by the first batch of vertices, all following batches must match.
+    tangents holds the tangents and binormals for uv sets, see set_tangents().
+    shared is True when the VertexArray is shared by VertexPools of cloned groups,
+    these VertexPools must copy it before changing it, see Group.clone().
+    """
+    def __init__(self, dimension, normals=False, uvs=None, precision=None):
+        self.numbers = array("q")
+        self.coords = array("d")
+        self.dimension = dimension
+        self.normals = array("d") if normals else None
+        self.uvs = {name: (uv_dimension, array("d")) for name, uv_dimension in (uvs or {}).items()}
+        self.tangents = {}
+        self.precision = precision
+        self.contiguous = True # True as long as the numbers are consecutive, starting at numbers[0]
+        self.shared = False
+        self._index = None
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def copy(self):
+        """
+        Returns a copy of this VertexArray with copies of all arrays, which is not shared.
+        """
+        vertexarray = VertexArray.__new__(VertexArray)
+        vertexarray.__dict__.update(self.__dict__)
+        vertexarray.numbers = self.numbers[:]
+        vertexarray.coords = self.coords[:]
+        vertexarray.normals = None if self.normals is None else self.normals[:]
+        vertexarray.uvs = {name: (uv_dimension, values[:]) for name, (uv_dimension, values) in self.uvs.items()}
+        vertexarray.tangents = {name: (tangents[:], binormals[:]) for name, (tangents, binormals) in self.tangents.items()}
+        vertexarray.shared = False
+        vertexarray._index = None
+        return vertexarray
+
+    def subset(self, rows, numbers):
+        """
+        Returns a new VertexArray with copies of the vertices in the given rows, with the given numbers.
+        """
+        vertexarray = VertexArray.__new__(VertexArray)
+        vertexarray.__dict__.update(self.__dict__)
+        vertexarray.shared = False
+        vertexarray.keep(rows, numbers)
+        return vertexarray
+
+    def __contains__(self, number):
+        return self.find(number) is not None
+
+    def find(self, number):
+        """
+        Returns the row for the given vertex number, None if the number is not found.
+        """
+        if self.contiguous:
+            row = number - self.numbers[0] if self.numbers else -1
+            return row if 0 <= row < len(self.numbers) else None
+        return self._lookup().get(number)
+
+    def difference(self, numbers):
+        """
+        Returns a set with the given vertex numbers which are not in this VertexArray.
+        """
+        if not self.contiguous:
+            return set(numbers).difference(self._lookup())
+        numbers = numbers if isinstance(numbers, (set, frozenset)) else set(numbers)
+        if not self.numbers:
+            return set(numbers)
+        low, high = self.numbers[0], self.numbers[0] + len(self.numbers)
+        return {number for number in numbers if not low <= number < high}
+
+    def intersection(self, numbers):
+        """
+        Returns a set with the given vertex numbers which are in this VertexArray.
+        A range is compared with consecutive numbers without a lookup for each number.
+        """
+        if self.contiguous and isinstance(numbers, range) and numbers.step == 1:
+            low = self.numbers[0] if self.numbers else 0
+            return set(range(max(numbers.start, low), min(numbers.stop, low + len(self.numbers))))
+        return {number for number in numbers if number in self}
+
+    def _lookup(self):
+        """
+        Returns a dictionary to look up the row for a vertex number.
+        The dictionary is created on first use and dropped when vertices are added.
+        """
+        if self._index is None:
+            self._index = dict(zip(self.numbers, range(len(self.numbers))))
+        return self._index
+
+    def extend(self, numbers, coords, normals=None, uvs=None, uv_name=None):
+        """
+        Appends a batch of vertices. numbers must be an array("q"), the other values
+        may be anything accepted by tools.toarray().
+        """
+        count = len(numbers)
+        coords = toarray("d", coords)
+        if len(coords) != count * self.dimension:
+            raise ValueError("Expected {0} coordinate values for {1} vertices, got {2}".format(
+                count * self.dimension, count, len(coords)))
+        if (normals is None) != (self.normals is None):
+            raise ValueError("Normals must be given for all or for none of the vertices in a VertexPool")
+        if normals is not None:
+            normals = toarray("d", normals)
+            if len(normals) != count * 3:
+                raise ValueError("Expected {0} normal values for {1} vertices, got {2}".format(count * 3, count, len(normals)))
+        if set(self.uvs) != (set() if uvs is None else {uv_name}):
+            raise ValueError("UVs must be given for all or for none of the vertices in a VertexPool")
+        if uvs is not None:
+            uv_dimension = self.uvs[uv_name][0]
+            uvs = toarray("d", uvs)
+            if len(uvs) != count * uv_dimension:
+                raise ValueError("Expected {0} uv values for {1} vertices, got {2}".format(count * uv_dimension, count, len(uvs)))
+        if self.contiguous and count:
+            start = self.numbers[0] + len(self.numbers) if self.numbers else numbers[0]
+            self.contiguous = numbers == array("q", range(start, start + count))
+        if self._index is not None:
+            # The lookup is extended, so adding many small batches doesn't rebuild it each time
+            self._index.update(zip(numbers, range(len(self.numbers), len(self.numbers) + count)))
+        self.numbers.extend(numbers)
+        self.coords.extend(coords)
+        if normals is not None:
+            self.normals.extend(normals)
+        if uvs is not None:
+            self.uvs[uv_name][1].extend(uvs)
+        # Vertices added after the tangents are computed get zero tangents and binormals
+        for tangents, binormals in self.tangents.values():
+            tangents.extend([0.0] * (count * 3))
+            binormals.extend([0.0] * (count * 3))
+
+    def keep(self, rows, numbers=None):
+        """
+        Removes all vertices except the vertices in the given rows, which are
+        stored in the given order. When numbers is given, the kept vertices get
+        these numbers instead of their own numbers. rows and numbers may be NumPy arrays.
+        """
+        if numpy is None or not isinstance(rows, numpy.ndarray):
+            rows = list(rows)
+        self.numbers = toarray("q", [self.numbers[row] for row in rows] if numbers is None else numbers)
+        self.coords = toarray("d", _gather(self.coords, rows, self.dimension))
+        if self.normals is not None:
+            self.normals = toarray("d", _gather(self.normals, rows, 3))
+        self.uvs = {name: (uv_dimension, toarray("d", _gather(values, rows, uv_dimension))) for name, (uv_dimension, values) in self.uvs.items()}
+        self.tangents = {name: (toarray("d", _gather(tangents, rows, 3)), toarray("d", _gather(binormals, rows, 3)))
+            for name, (tangents, binormals) in self.tangents.items()}
+        numbers = self.numbers
+        self.contiguous = not numbers or numbers == array("q", range(numbers[0], numbers[0] + len(numbers)))
+        self._index = None
+
+    def copy_rows(self, rows, numbers):
+        """
+        Appends a copy of the vertices in the given rows, with the given numbers.
+        """
+        rows = list(rows)
+        if self.contiguous and numbers:
+            start = self.numbers[0] + len(self.numbers) if self.numbers else numbers[0]
+            self.contiguous = array("q", numbers) == array("q", range(start, start + len(numbers)))
+        self.numbers.extend(numbers)
+        self.coords.extend(_gather(self.coords, rows, self.dimension))
+        if self.normals is not None:
+            self.normals.extend(_gather(self.normals, rows, 3))
+        for uv_dimension, values in self.uvs.values():
+            values.extend(_gather(values, rows, uv_dimension))
+        for tangents, binormals in self.tangents.values():
+            tangents.extend(_gather(tangents, rows, 3))
+            binormals.extend(_gather(binormals, rows, 3))
+        self._index = None
+
+    def set_normals(self, normals):
+        """
+        Sets the normals of the vertices with a number in the given dict to the
+        (x, y, z) values in the dict. Normals are added to all vertices when
+        this VertexArray has no normals yet, other vertices get (0, 0, 0).
+        """
+        values = [0.0] * (3 * len(self.numbers)) if self.normals is None else self.normals.tolist()
+        for row, number in enumerate(self.numbers):
+            normal = normals.get(number)
+            if normal is not None:
+                values[row*3:row*3+3] = normal
+        self.normals = array("d", values)
+
+    def set_tangents(self, name, values):
+        """
+        Sets the tangents and binormals of uv set name for the vertices with a
+        number in the given dict to the ((x, y, z), (x, y, z)) values in the dict.
+        Other vertices keep their values, or get (0, 0, 0) for a new uv set.
+        """
+        tangents, binormals = self.tangents.get(name, (None, None))
+        tangents = [0.0] * (3 * len(self.numbers)) if tangents is None else tangents.tolist()
+        binormals = [0.0] * (3 * len(self.numbers)) if binormals is None else binormals.tolist()
+        for row, number in enumerate(self.numbers):
+            value = values.get(number)
+            if value is not None:
+                tangents[row*3:row*3+3], binormals[row*3:row*3+3] = value
+        self.tangents[name] = (array("d", tangents), array("d", binormals))
+
+    def get_tangents(self, row):
+        """
+        Returns a dict with the (tangent, binormal) lists by uv name for the given row.
+        """
+        return {name: (tangents[row*3:row*3+3].tolist(), binormals[row*3:row*3+3].tolist())
+            for name, (tangents, binormals) in self.tangents.items()}
+
+    def get_row(self, row):
+        """
+        Returns a tuple with the number, coordinates, normal and a dict with
+        the uvs for the given row.
+        """
+        dimension = self.dimension
+        coords = self.coords[row*dimension:(row+1)*dimension].tolist()
+        normal = None if self.normals is None else self.normals[row*3:row*3+3].tolist()
+        uvs = {name: values[row*uv_dimension:(row+1)*uv_dimension].tolist() for name, (uv_dimension, values) in self.uvs.items()}
+        return self.numbers[row], coords, normal, uvs
+
+    def iter_rows(self, rows, indentation, compact, _level, chunk_size=2**10):
+        """
+        Yields the egg text for the given rows, formatted exactly like Vertex
+        EntryTypes with the same values would format themselves. The numbers
+        are formatted in chunks of chunk_size rows with tools.frows().
+        """
+        precision = self.precision
+        uvs = [(strname(name) if name is not None else None, uv_dimension, values, self.tangents.get(name))
+            for name, (uv_dimension, values) in sorted(self.uvs.items(), key=lambda item: (item[0] is not None, str(item[0]).lower()))]
+        on_one_line = compact and self.normals is None and not uvs
+        indent, child_indent = indentation*_level, indentation*(_level+1)
+
+        def child(entrytype, name, level=_level+1):
+            # Returns the text before and after the values of a Normal, UV, Tangent or Binormal
+            header = "{0}<{1}>{2}{{".format(indentation*level, entrytype, " {0} ".format(name) if name else " ")
+            if compact:
+                return header + " ", " }\n"
+            return header + "\n" + indentation*(level+1), "\n" + indentation*level + "}\n"
+
+        columns = [(self.coords, self.dimension, None)]
+        if self.normals is not None:
+            columns.append((self.normals, 3, child("Normal", None)))
+        for name, uv_dimension, values, tangents in uvs:
+            if tangents is None:
+                columns.append((values, uv_dimension, child("UV", name)))
+                continue
+            # A UV with a tangent and binormal is never written on one line
+            head, tail = child("UV", name)
+            if compact:
+                head = head[:-1] + "\n" + indentation*(_level+2)
+            columns.append((values, uv_dimension, (head, "\n")))
+            head, tail = child("Binormal", None, _level+2)
+            columns += [
+                (tangents[0], 3, child("Tangent", None, _level+2)),
+                (tangents[1], 3, (head, tail + child_indent + "}\n"))]
+        # The text of a vertex with a %s for the number and for each formatted column
+        def escape(text):
+            return text.replace("%", "%%")
+        prefix = escape(indent + "<Vertex> ")
+        if on_one_line:
+            row_format = prefix + "%s { %s }\n"
+        else:
+            row_format = prefix + "%s {\n" + escape(child_indent) + "%s\n" + "".join(
+                escape(head) + "%s" + escape(tail) for values, width, (head, tail) in columns[1:]) + escape(indent) + "}\n"
+        rows = rows if isinstance(rows, range) else list(rows)
+        for start in range(0, len(rows), chunk_size):
+            chunk = rows[start:start+chunk_size]
+            numbers = [self.numbers[row] for row in chunk]
+            texts = [frows(_gather(values, chunk, width), precision, width) for values, width, around in columns]
+            yield (row_format * len(chunk)) % tuple(chain.from_iterable(zip(numbers, *texts)))
+
+def _gather(values, rows, width):
+    """
+    Returns the values for the given rows, where each row holds width values.
+    Rows given as a NumPy array are taken with a single indexing operation.
+    """
+    if numpy is not None and isinstance(rows, numpy.ndarray):
+        return numpy.frombuffer(values, dtype=numpy.float64).reshape(-1, width)[rows].ravel()
+    if isinstance(rows, range) and rows.step == 1:
+        return values[rows.start*width:rows.stop*width]
+    return list(chain.from_iterable(values[row*width:(row+1)*width] for row in rows))
@@ -0,0 +1,191 @@
+"""
+This is not an EntryType module. The normal and tangent generation used by
+VertexPool.compute_normals() and VertexPool.compute_tangents() is defined here.
+
+The polygons are given as a flat list with a point row for each corner and
+offsets, the corners of polygon i are corners[offsets[i]:offsets[i+1]]. The
+points are given as a flat list with x y z for each row. NumPy is used when
+it is installed, otherwise the same is done in Python.
+"""
+import math
+from .tools import numpy
+
+def face_normals(points, corners, offsets):
+    """
+    Returns a list with the (x, y, z) normal of each polygon, with a length of
+    twice the area of the polygon (Newell's method, the sum of the cross
+    products of the corners and their next corner).
+    """
+    count = len(offsets) - 1
+    if not count:
+        return []
+    if numpy is not None:
+        points = numpy.asarray(points, dtype=float).reshape(-1, 3)
+        corners = numpy.asarray(corners, dtype=numpy.int64)
+        offsets = numpy.asarray(offsets, dtype=numpy.int64)
+        following = numpy.arange(1, len(corners) + 1)
+        following[offsets[1:] - 1] = offsets[:-1]
+        crosses = numpy.cross(points[corners], points[corners[following]])
+        return numpy.add.reduceat(crosses, offsets[:-1]).tolist()
+    normals = []
+    for index in range(count):
+        x = y = z = 0.0
+        polygon = corners[offsets[index]:offsets[index+1]]
+        for row, following in zip(polygon, polygon[1:] + polygon[:1]):
+            x1, y1, z1 = points[row*3:row*3+3]
+            x2, y2, z2 = points[following*3:following*3+3]
+            x += y1 * z2 - z1 * y2
+            y += z1 * x2 - x1 * z2
+            z += x1 * y2 - y1 * x2
+        normals.append((x, y, z))
+    return normals
+
+def vertex_sums(normals, corners, offsets, rows):
+    """
+    Returns the sum of the normals of the polygons using each point row, as
+    a list of (x, y, z) or, with NumPy, an array with a row for each point row.
+    """
+    if numpy is not None and len(corners):
+        counts = numpy.diff(numpy.asarray(offsets, dtype=numpy.int64))
+        sums = numpy.zeros((rows, 3))
+        numpy.add.at(sums, numpy.asarray(corners, dtype=numpy.int64), numpy.repeat(numpy.asarray(normals, dtype=float).reshape(-1, 3), counts, axis=0))
+        return sums
+    sums = [[0.0, 0.0, 0.0] for row in range(rows)]
+    for index, (x, y, z) in enumerate(normals):
+        for row in corners[offsets[index]:offsets[index+1]]:
+            total = sums[row]
+            total[0] += x
+            total[1] += y
+            total[2] += z
+    return [tuple(total) for total in sums]
+
+def unit(vector):
+    """
+    Returns the given (x, y, z) vector with length 1, (0.0, 0.0, 0.0) for a vector without length.
+    """
+    length = math.sqrt(sum(value * value for value in vector))
+    return tuple(value / length for value in vector) if length else (0.0, 0.0, 0.0)
+
+def units(vectors):
+    """
+    Returns a list with each of the given (x, y, z) vectors with length 1, see unit().
+    """
+    if numpy is not None and len(vectors):
+        vectors = numpy.asarray(vectors, dtype=float).reshape(-1, 3)
+        lengths = numpy.sqrt((vectors * vectors).sum(axis=1))
+        lengths[lengths == 0] = 1.0
+        return [tuple(row) for row in (vectors / lengths[:, None]).tolist()]
+    return [unit(vector) for vector in vectors]
+
+def corner_normals(normals, corners, offsets, angle_threshold):
+    """
+    Returns a list with the normal of each corner: the sum of the normals of
+    the polygons using the same point row, except the polygons whose normal
+    differs more than angle_threshold degrees from the normal of the polygon
+    of the corner. Corners with the same normal get the same (equal) tuple.
+    """
+    directions = units(normals)
+    limit = math.cos(math.radians(angle_threshold))
+    polygons = [index for index in range(len(offsets) - 1) for corner in range(offsets[index], offsets[index+1])]
+    by_row = {}
+    for corner, row in enumerate(corners):
+        by_row.setdefault(row, []).append(polygons[corner])
+    result = []
+    for corner, row in enumerate(corners):
+        x1, y1, z1 = directions[polygons[corner]]
+        total = [0.0, 0.0, 0.0]
+        for polygon in by_row[row]:
+            x2, y2, z2 = directions[polygon]
+            if polygon == polygons[corner] or x1 * x2 + y1 * y2 + z1 * z2 >= limit:
+                x, y, z = normals[polygon]
+                total[0] += x
+                total[1] += y
+                total[2] += z
+        result.append(unit(total))
+    return result
+
+def _triangles(offsets):
+    """
+    Returns three lists with the first, second and third corner of each
+    triangle when each polygon is split in a fan.
+    """
+    first, second, third = [], [], []
+    for index in range(len(offsets) - 1):
+        start, end = offsets[index], offsets[index+1]
+        first += [start] * max(end - start - 2, 0)
+        second += range(start + 1, end - 1)
+        third += range(start + 2, end)
+    return first, second, third
+
+def tangent_sums(points, uvs, corners, offsets, rows):
+    """
+    Returns the sums of the tangents and of the binormals of the triangles
+    using each point row, the directions in which u and v increase. uvs holds
+    u v for each point row. Each polygon is split in a fan of triangles.
+    """
+    first, second, third = _triangles(offsets)
+    if numpy is not None and first:
+        points = numpy.asarray(points, dtype=float).reshape(-1, 3)
+        uvs = numpy.asarray(uvs, dtype=float).reshape(-1, 2)
+        corners = numpy.asarray(corners, dtype=numpy.int64)
+        a, b, c = (corners[numpy.asarray(triangle, dtype=numpy.int64)] for triangle in (first, second, third))
+        edge1, edge2 = points[b] - points[a], points[c] - points[a]
+        delta1, delta2 = uvs[b] - uvs[a], uvs[c] - uvs[a]
+        determinants = delta1[:, 0] * delta2[:, 1] - delta2[:, 0] * delta1[:, 1]
+        scales = numpy.zeros(len(determinants))
+        numpy.divide(1.0, determinants, out=scales, where=determinants != 0)
+        tangents = (edge1 * delta2[:, 1:2] - edge2 * delta1[:, 1:2]) * scales[:, None]
+        binormals = (edge2 * delta1[:, 0:1] - edge1 * delta2[:, 0:1]) * scales[:, None]
+        tangent_sums, binormal_sums = numpy.zeros((rows, 3)), numpy.zeros((rows, 3))
+        for corner in (a, b, c):
+            numpy.add.at(tangent_sums, corner, tangents)
+            numpy.add.at(binormal_sums, corner, binormals)
+        return tangent_sums, binormal_sums
+    tangent_sums = [[0.0, 0.0, 0.0] for row in range(rows)]
+    binormal_sums = [[0.0, 0.0, 0.0] for row in range(rows)]
+    for a, b, c in zip(first, second, third):
+        a, b, c = corners[a], corners[b], corners[c]
+        x0, y0, z0 = points[a*3:a*3+3]
+        edge1 = [value - origin for value, origin in zip(points[b*3:b*3+3], (x0, y0, z0))]
+        edge2 = [value - origin for value, origin in zip(points[c*3:c*3+3], (x0, y0, z0))]
+        du1, dv1 = uvs[b*2] - uvs[a*2], uvs[b*2+1] - uvs[a*2+1]
+        du2, dv2 = uvs[c*2] - uvs[a*2], uvs[c*2+1] - uvs[a*2+1]
+        determinant = du1 * dv2 - du2 * dv1
+        if not determinant:
+            continue
+        scale = 1.0 / determinant
+        tangent = [(e1 * dv2 - e2 * dv1) * scale for e1, e2 in zip(edge1, edge2)]
+        binormal = [(e2 * du1 - e1 * du2) * scale for e1, e2 in zip(edge1, edge2)]
+        for row in (a, b, c):
+            for axis in range(3):
+                tangent_sums[row][axis] += tangent[axis]
+                binormal_sums[row][axis] += binormal[axis]
+    return tangent_sums, binormal_sums
+
+def orthogonalize(normals, tangents, binormals):
+    """
+    Returns a list with a (tangent, binormal) tuple for each row. The tangent
+    is made perpendicular to the normal (Gram-Schmidt) and the binormal is the
+    cross product of the normal and the tangent, flipped when the given
+    binormal points the other way (mirrored uvs).
+    """
+    if numpy is not None and len(normals):
+        normals = numpy.asarray(normals, dtype=float).reshape(-1, 3)
+        tangents = numpy.asarray(tangents, dtype=float).reshape(-1, 3)
+        binormals = numpy.asarray(binormals, dtype=float).reshape(-1, 3)
+        tangents = tangents - normals * (normals * tangents).sum(axis=1)[:, None]
+        lengths = numpy.sqrt((tangents * tangents).sum(axis=1))
+        lengths[lengths == 0] = 1.0
+        tangents = tangents / lengths[:, None]
+        crosses = numpy.cross(normals, tangents)
+        signs = numpy.where((crosses * binormals).sum(axis=1) < 0, -1.0, 1.0)
+        crosses = crosses * signs[:, None]
+        return [(tuple(tangent), tuple(binormal)) for tangent, binormal in zip(tangents.tolist(), crosses.tolist())]
+    result = []
+    for (nx, ny, nz), tangent, binormal in zip(normals, tangents, binormals):
+        dot = nx * tangent[0] + ny * tangent[1] + nz * tangent[2]
+        tx, ty, tz = unit((tangent[0] - nx * dot, tangent[1] - ny * dot, tangent[2] - nz * dot))
+        cross = (ny * tz - nz * ty, nz * tx - nx * tz, nx * ty - ny * tx)
+        sign = -1.0 if sum(c * b for c, b in zip(cross, binormal)) < 0 else 1.0
+        result.append(((tx, ty, tz), tuple(sign * value for value in cross)))
+    return result
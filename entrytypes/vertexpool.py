@@ -1,12 +1,611 @@
+import math
+from array import array
+from heapq import merge
+from itertools import accumulate, chain
 from .entrytype import EntryType
-from .vertex import MixInVertex
+from .vertex import MixInVertex, Vertex
+from .vertexarray import VertexArray
+from .uv import UV
+from .vertexref import VertexRef
+from .polygon import PolygonArray
+from .vertexnormals import face_normals, vertex_sums, corner_normals, units, tangent_sums, orthogonalize
+from .tools import strname, numpy
 
 class VertexPool(EntryType, MixInVertex):
+    __slots__ = ("_vertexarray", )
+    _cacheable = True
+
     def __init__(self, parent, name):
         super().__init__(parent=parent, name=name)
+        self._vertexarray = None # Created by the first call to add_vertices()
+
+    def _has_childs(self):
+        return super()._has_childs() or bool(self._vertexarray)
+
+    def get_childs(self):
+        childs = super().get_childs()
+        if self._vertexarray is not None:
+            vertices = self.vertices
+            childs += [vertices[number] for number in self._vertexarray.numbers]
+        return childs
+
+    def _change_vertexarray(self):
+        """
+        Returns the VertexArray of this VertexPool to make a change, a VertexArray
+        shared with the VertexPool of a cloned group is copied first, see Group.clone().
+        """
+        if self._vertexarray is not None and self._vertexarray.shared:
+            self._vertexarray = self._vertexarray.copy()
+        return self._vertexarray
+
+    def missing_vertices(self, numbers):
+        """
+        Returns a sorted list with the given vertex numbers which are not found in this VertexPool.
+        numbers can be any sequence, all numbers are checked in one pass.
+        """
+        vertexarray = self._vertexarray
+        if vertexarray and vertexarray.contiguous and not self._entries["Vertex"] and len(numbers):
+            low = vertexarray.numbers[0]
+            if numpy is not None and isinstance(numbers, array) and numbers.typecode == "q":
+                values = numpy.frombuffer(numbers, dtype=numpy.int64)
+                smallest, largest = int(values.min()), int(values.max())
+            else:
+                smallest, largest = min(numbers), max(numbers)
+            if low <= smallest and largest < low + len(vertexarray):
+                return []
+        missing = set(numbers).difference(self._entries["Vertex"])
+        if vertexarray is not None and missing:
+            missing = vertexarray.difference(missing)
+        return sorted(missing)
+
+    def _get_coordinates(self, numbers):
+        """
+        Returns a list with an (x, y, z) tuple for each of the given vertex numbers,
+        missing coordinates are 0.0 and w coordinates are left out. Raises a
+        KeyError if a vertex number is not found.
+        """
+        found = {}
+        vertices = self._peek("Vertex") or {}
+        vertexarray = self._vertexarray
+        low = None
+        if vertexarray is not None:
+            coords, dimension = vertexarray.coords.tolist(), vertexarray.dimension
+            padding = (0.0, ) * (3 - dimension) if dimension < 3 else ()
+            width = min(dimension, 3)
+            count = len(vertexarray.numbers)
+            low = vertexarray.numbers[0] if vertexarray.contiguous and count else None
+        for number in set(numbers):
+            vertex = vertices.get(number)
+            if vertex is not None:
+                values = vertex._coordinates[:3]
+                found[number] = tuple(values) + (0.0, ) * (3 - len(values))
+                continue
+            if vertexarray is None:
+                row = None
+            elif low is None:
+                row = vertexarray.find(number)
+            else:
+                row = number - low if 0 <= number - low < count else None
+            if row is None:
+                raise KeyError("Vertex {0} not found in VertexPool {1!r}".format(number, self._name))
+            found[number] = tuple(coords[row*dimension:row*dimension+width]) + padding
+        return [found[number] for number in numbers]
+
+    def weld(self, tolerance=1e-6, attributes=("normal", "uv")):
+        """
+        Merges vertices which have the same coordinates and the same attributes
+        into one vertex, and returns the number of removed vertices.
+
+        tolerance : Vertices are the same when each value differs at most tolerance,
+                    0 only merges vertices with exactly the same values.
+        attributes : The attributes which must be the same as well, "normal" and/or "uv".
+                     Other attributes are taken from the vertex which is kept.
+
+        Of each set of the same vertices, the vertex with the lowest number is kept.
+        All VertexRefs and polygon arrays using this VertexPool are changed to refer
+        to the kept vertices. Vertices with other attributes (for example read
+        from an egg file) are never merged.
+
+        The vertices are found with a spatial hash, so the time needed grows
+        linear with the number of vertices instead of comparing all pairs.
+        """
+        layouts = {}
+        for number, layout, values in sorted(self._iter_weld_values(attributes)):
+            if layout is not None:
+                layouts.setdefault(layout, ([], []))
+                layouts[layout][0].append(number)
+                layouts[layout][1].append(values)
+        mapping = {}
+        for layout, (numbers, values) in layouts.items():
+            for number, target in zip(numbers, _weld(values, layout[0], tolerance)):
+                if number != numbers[target]:
+                    mapping[number] = numbers[target]
+        if not mapping:
+            return 0
+        vertexarray = self._change_vertexarray()
+        if vertexarray is not None:
+            vertexarray.keep(row for row, number in enumerate(vertexarray.numbers) if number not in mapping)
+        vertices = self._entries["Vertex"]
+        for number in mapping.keys() & vertices.keys():
+            del vertices[number]
+        self._changed()
+        self._renumber(mapping, self._iter_users())
+        return len(mapping)
+
+    def compact(self, start=1):
+        """
+        Removes the vertices which are not used by any polygon and numbers the
+        other vertices consecutively, beginning at start, in the order they are
+        first used in the egg file. Returns the number of removed vertices.
+
+        All VertexRefs and polygon arrays using this VertexPool, in any group,
+        are changed to refer to the new numbers.
+        """
+        users = list(self._iter_users())
+        numbers = {}
+        for entry in users:
+            for number in entry._vertices if isinstance(entry, VertexRef) else entry._indices:
+                if number not in numbers:
+                    numbers[number] = start + len(numbers)
+        removed = len(self.vertices) - len(numbers)
+        vertexarray = self._change_vertexarray()
+        if vertexarray is not None:
+            rows = sorted((numbers[number], row) for row, number in enumerate(vertexarray.numbers) if number in numbers)
+            vertexarray.keep([row for number, row in rows], [number for number, row in rows])
+        vertices = self._peek("Vertex")
+        if vertices:
+            renumbered = sorted((numbers[number], number) for number in vertices if number in numbers)
+            renumbered = [(number, vertices[old]) for number, old in renumbered]
+            vertices.clear()
+            for number, vertex in renumbered:
+                vertex._name = strname(number)
+                vertices[number] = vertex
+        self._changed()
+        self._renumber(numbers, users)
+        return removed
+
+    def compute_normals(self, mode="smooth", angle_threshold=None, precision=None):
+        """
+        Computes the normals from the polygons using this VertexPool, in any
+        group, and returns the number of normals which are set.
+
+        mode : "smooth" sets the normal of each vertex to the average normal of
+               the polygons using the vertex, weighted by the polygon areas.
+               "flat" sets the normal of each polygon instead.
+        angle_threshold : Only for "smooth", polygons which differ more than this
+                          angle in degrees are not smoothed together. A vertex used
+                          by such polygons is split in copies with new numbers, one
+                          for each normal. None smooths all polygons.
+        precision : The precision of the normals of Vertex EntryTypes and polygons,
+                    vertices added with add_vertices() keep the precision of the pool.
+
+        The polygon normals are computed for all polygons at once and added to the
+        vertices with one scatter-add, with NumPy when it is installed. Vertices
+        added with add_vertices() get their normals in one bulk operation; after
+        that, vertices added with add_vertices() need normals as well.
+        """
+        if mode not in ("smooth", "flat"):
+            raise ValueError("Unknown mode {0!r}, expected 'smooth' or 'flat'".format(mode))
+        users = list(self._iter_users())
+        if not users:
+            return 0
+        polygons, numbers, offsets, points, corners = self._gather_polygons(users)
+        normals = face_normals([value for point in self._get_coordinates(points) for value in point], corners, offsets)
+        if mode == "flat":
+            normals = units(normals)
+            start = 0
+            for entry, rows in zip(users, polygons):
+                if isinstance(entry, VertexRef):
+                    entry._parent.set_normal(*normals[start], precision=precision)
+                else:
+                    entry.set_normals(normals[start:start+len(rows)], precision)
+                start += len(rows)
+            return len(normals)
+        if angle_threshold is None:
+            self._set_normals(dict(zip(points, units(vertex_sums(normals, corners, offsets, len(points))))), precision)
+            return len(points)
+        # The corners of a vertex with another normal than the first corner get a copy of the vertex
+        normals = corner_normals(normals, corners, offsets, angle_threshold)
+        vertexarray = self._vertexarray
+        last = max(chain(self._peek("Vertex") or (), vertexarray.numbers if vertexarray is not None else ()))
+        found, used, copies = {}, set(), []
+        for corner, number in enumerate(numbers):
+            key = (number, normals[corner])
+            if key not in found:
+                if number in used:
+                    last += 1
+                    copies.append((number, last))
+                    found[key] = last
+                else:
+                    used.add(number)
+                    found[key] = number
+            numbers[corner] = found[key]
+        self._copy_vertices(copies)
+        start = 0
+        for entry, rows in zip(users, polygons):
+            count = sum(len(row) for row in rows)
+            if isinstance(entry, VertexRef):
+                entry._vertices = tuple(numbers[start:start+count])
+                entry._changed()
+            else:
+                entry._indices = array("q", numbers[start:start+count])
+                entry._changed()
+            start += count
+        self._set_normals({number: normal for (original, normal), number in found.items()}, precision)
+        return len(found)
+
+    def compute_tangents(self, *names, precision=None):
+        """
+        Computes the tangents and binormals of the given uv sets, from the
+        coordinates, normals and uvs of the vertices used by polygons using this
+        VertexPool, in any group. Returns the number of tangents which are set.
+
+        names : The names of the uv sets, None for the default uv set, see add_uv().
+                When omitted, the tangents of all uv sets in this VertexPool are computed.
+        precision : The precision of the tangents and binormals of Vertex EntryTypes,
+                    vertices added with add_vertices() keep the precision of the pool.
+
+        Vertices without a normal use the average normal of their polygons. The
+        tangents and binormals of all polygons are computed at once and added to
+        the vertices with one scatter-add, with NumPy when it is installed.
+        """
+        users = list(self._iter_users())
+        if not users:
+            return 0
+        vertexarray = self._vertexarray
+        if not names:
+            names = set(vertexarray.uvs) if vertexarray is not None else set()
+            names.update(name for vertex in (self._peek("Vertex") or {}).values() for name in (vertex._peek("UV") or ()))
+            names = sorted(names, key=lambda name: _uv_order((name, None)))
+        polygons, numbers, offsets, points, corners = self._gather_polygons(users)
+        coordinates = [value for point in self._get_coordinates(points) for value in point]
+        normals = self._get_normals(points)
+        if None in normals:
+            smooth = units(vertex_sums(face_normals(coordinates, corners, offsets), corners, offsets, len(points)))
+            normals = [smooth[row] if normal is None else normal for row, normal in enumerate(normals)]
+        count = 0
+        for name in names:
+            uvs = self._get_uvs(points, name)
+            tangents, binormals = tangent_sums(coordinates, [value for uv in uvs for value in (uv or (0.0, 0.0))], corners, offsets, len(points))
+            values = {number: value for number, uv, value in zip(points, uvs, orthogonalize(normals, tangents, binormals)) if uv is not None}
+            self._set_tangents(name, values, precision)
+            count += len(values)
+        return count
+
+    def _gather_polygons(self, users):
+        """
+        Returns the polygons of the given users (a list with the rows of vertex numbers
+        of each user), the vertex numbers of all corners, the offsets of the polygons
+        in these numbers, the vertex numbers used (points) and the point row of each corner.
+        """
+        polygons = [[entry._vertices] if isinstance(entry, VertexRef) else
+            [entry._indices[entry._offsets[index]:entry._offsets[index+1]] for index in range(len(entry))] for entry in users]
+        numbers = [number for rows in polygons for row in rows for number in row]
+        offsets = [0]
+        offsets.extend(accumulate(len(row) for rows in polygons for row in rows))
+        points = list(dict.fromkeys(numbers))
+        lookup = {number: row for row, number in enumerate(points)}
+        return polygons, numbers, offsets, points, [lookup[number] for number in numbers]
+
+    def _get_normals(self, numbers):
+        """
+        Returns a list with the (x, y, z) normal of each of the given vertex numbers, None for vertices without a normal.
+        """
+        vertices = self._peek("Vertex") or {}
+        vertexarray = self._vertexarray
+        normals = vertexarray.normals.tolist() if vertexarray is not None and vertexarray.normals is not None else None
+        result = []
+        for number in numbers:
+            vertex = vertices.get(number)
+            if vertex is not None:
+                normal = vertex._peek("Normal")
+                result.append(None if normal is None else tuple(normal._vector))
+            else:
+                row = vertexarray.find(number)
+                result.append(None if normals is None else tuple(normals[row*3:row*3+3]))
+        return result
+
+    def _get_uvs(self, numbers, name):
+        """
+        Returns a list with the (u, v) of uv set name for each of the given vertex numbers, None for vertices without this uv set.
+        """
+        vertices = self._peek("Vertex") or {}
+        vertexarray = self._vertexarray
+        uv_dimension, uvs = vertexarray.uvs.get(name, (None, None)) if vertexarray is not None else (None, None)
+        uvs = None if uvs is None else uvs.tolist()
+        result = []
+        for number in numbers:
+            vertex = vertices.get(number)
+            if vertex is not None:
+                uv = (vertex._peek("UV") or {}).get(name)
+                result.append(None if uv is None else tuple(uv._co[:2]))
+            else:
+                row = vertexarray.find(number)
+                result.append(None if uvs is None else tuple(uvs[row*uv_dimension:row*uv_dimension+2]))
+        return result
+
+    def _set_tangents(self, name, values, precision):
+        """
+        Sets the tangents and binormals of uv set name for the vertices with a
+        number in the given dict to the (tangent, binormal) values in the dict.
+        """
+        vertexarray = self._vertexarray
+        if vertexarray is not None and name in vertexarray.uvs:
+            self._change_vertexarray().set_tangents(name, values)
+        for number, vertex in (self._peek("Vertex") or {}).items():
+            if number in values:
+                uv = vertex._peek("UV")[name]
+                tangent, binormal = values[number]
+                uv.set_tangent(*tangent, precision=precision)
+                uv.set_binormal(*binormal, precision=precision)
+        self._changed()
+
+    def _copy_vertices(self, copies):
+        """
+        Adds a copy of vertices for the given (number, new number) pairs.
+        """
+        vertexarray = self._change_vertexarray()
+        vertices = self._peek("Vertex") or {}
+        rows = []
+        for number, new in copies:
+            vertex = vertices.get(number)
+            if vertex is None:
+                rows.append((vertexarray.find(number), new))
+                continue
+            vertex = vertex._copy(self)
+            vertex._name = strname(new)
+            vertex._coordinates = list(vertex._coordinates)
+            self._entries["Vertex"][new] = vertex
+        if rows:
+            vertexarray.copy_rows([row for row, new in rows], [new for row, new in rows])
+        self._changed()
+
+    def _pack_vertices(self):
+        """
+        Moves the Vertex EntryTypes of this VertexPool to a new VertexArray, if
+        the VertexPool has no VertexArray yet and the VertexArray writes all
+        vertices exactly like the Vertex EntryTypes: with the same attributes
+        and precision, and only floats without a precision. See Group.clone().
+        """
+        vertices = self._peek("Vertex")
+        if not vertices or self._vertexarray is not None or not all(type(number) is int for number in vertices):
+            return
+        numbers = sorted(vertices)
+        layout, columns = None, None
+        for number in numbers:
+            vertex = vertices[number]
+            if not vertex._has_only(("Normal", "UV")):
+                return
+            entries = [vertex]
+            normal = vertex._peek("Normal")
+            if normal is not None:
+                entries.append(normal)
+            uvs = []
+            for name, uv in sorted((vertex._peek("UV") or {}).items(), key=_uv_order):
+                tangent, binormal = uv._peek("Tangent"), uv._peek("Binormal")
+                if not uv._has_only(("Tangent", "Binormal")) or (tangent is None) != (binormal is None):
+                    return
+                entries += [uv] if tangent is None else [uv, tangent, binormal]
+                uvs.append((name, len(uv._co), tangent is not None))
+            if any(entry._has_childs() for entry in entries if not isinstance(entry, (Vertex, UV))):
+                return
+            key = (len(vertex._coordinates), normal is not None, tuple(uvs), {entry._precision for entry in entries})
+            if layout is None:
+                layout, columns = key, [[] for entry in entries]
+            elif key != layout:
+                return
+            for column, entry in zip(columns, entries):
+                column += entry._coordinates if entry is vertex else entry._co if isinstance(entry, UV) else entry._vector
+        dimension, normals, uvs, precisions = layout
+        if len(precisions) != 1:
+            return
+        precision = precisions.pop()
+        if precision is None and not all(isinstance(value, float) for column in columns for value in column):
+            return
+        vertexarray = VertexArray(dimension, normals, {name: uv_dimension for name, uv_dimension, tangents in uvs}, precision=precision)
+        vertexarray.numbers.extend(numbers)
+        vertexarray.contiguous = numbers == list(range(numbers[0], numbers[0] + len(numbers)))
+        columns = iter(columns)
+        vertexarray.coords.extend(next(columns))
+        if normals:
+            vertexarray.normals.extend(next(columns))
+        for name, uv_dimension, tangents in uvs:
+            vertexarray.uvs[name][1].extend(next(columns))
+            if tangents:
+                vertexarray.tangents[name] = (array("d", next(columns)), array("d", next(columns)))
+        self._vertexarray = vertexarray
+        self._children["Vertex"] = {}
+
+    def _copy_subset(self, vertexpool, numbers):
+        """
+        Adds a copy of the vertices of another vertexpool with the given numbers,
+        which are numbered 1, 2, ... in the given order. numbers can be a NumPy array.
+        """
+        vertices = vertexpool._peek("Vertex") or {}
+        vertexarray = vertexpool._vertexarray
+        if numpy is not None and isinstance(numbers, numpy.ndarray):
+            if vertexarray and vertexarray.contiguous and not vertices:
+                self._vertexarray = vertexarray.subset(numbers - vertexarray.numbers[0], numpy.arange(1, len(numbers) + 1))
+                self._changed()
+                return
+            numbers = numbers.tolist()
+        rows, news = [], []
+        for new, number in enumerate(numbers, 1):
+            vertex = vertices.get(number)
+            if vertex is None:
+                rows.append(vertexarray.find(number))
+                news.append(new)
+                continue
+            vertex = vertex._copy(self)
+            vertex._name = strname(new)
+            vertex._coordinates = list(vertex._coordinates)
+            self._entries["Vertex"][new] = vertex
+        if rows:
+            self._vertexarray = vertexarray.subset(rows, news)
+        self._changed()
+
+    def _set_normals(self, normals, precision):
+        """
+        Sets the normals of the vertices with a number in the given dict to the (x, y, z) values in the dict.
+        """
+        if self._vertexarray is not None:
+            self._change_vertexarray().set_normals(normals)
+        for number, vertex in (self._peek("Vertex") or {}).items():
+            if number in normals:
+                vertex.set_normal(*normals[number], precision=precision)
+        self._changed()
+
+    def _iter_users(self):
+        """
+        Yields the VertexRefs and polygon arrays which refer to this VertexPool,
+        in the order they are written in the egg file.
+        """
+        for entry in self.get_pegg()._iter_ordered():
+            if isinstance(entry, VertexRef) and entry._peek("Ref")._ref == self._name:
+                yield entry
+            elif isinstance(entry, PolygonArray) and strname(entry._refname) == self._name:
+                yield entry
+
+    def _renumber(self, mapping, users):
+        """
+        Changes the vertex numbers in the given VertexRefs and polygon arrays
+        from the keys to the values of mapping, other numbers are not changed.
+        """
+        for entry in users:
+            if isinstance(entry, VertexRef):
+                if any(vertex in mapping for vertex in entry._vertices):
+                    entry._vertices = tuple(mapping.get(vertex, vertex) for vertex in entry._vertices)
+                    entry._changed()
+            else:
+                indices = array("q", [mapping.get(vertex, vertex) for vertex in entry._indices])
+                if indices != entry._indices:
+                    entry._indices = indices
+                    entry._changed()
+
+    def _iter_weld_values(self, attributes):
+        """
+        Yields (number, layout, values) for each vertex, only vertices with the same
+        layout can be merged. values holds the coordinates followed by the
+        values of the given attributes. The layout is None for vertices which
+        can't be merged.
+        """
+        vertexarray = self._vertexarray
+        if vertexarray is not None:
+            dimension = vertexarray.dimension
+            columns = [(vertexarray.coords.tolist(), dimension)]
+            normal = vertexarray.normals is not None and "normal" in attributes
+            if normal:
+                columns.append((vertexarray.normals.tolist(), 3))
+            uvs = ()
+            if "uv" in attributes:
+                uvs = tuple(sorted(((name, uv_dimension) for name, (uv_dimension, values) in vertexarray.uvs.items()), key=_uv_order))
+                columns += [(vertexarray.uvs[name][1].tolist(), uv_dimension) for name, uv_dimension in uvs]
+            tangents = tuple(name for name, uv_dimension in uvs if name in vertexarray.tangents)
+            columns += [(values.tolist(), 3) for name in tangents for values in vertexarray.tangents[name]]
+            layout = (dimension, normal, uvs, tangents)
+            for row, number in enumerate(vertexarray.numbers):
+                values = []
+                for column, width in columns:
+                    values += column[row*width:(row+1)*width]
+                yield number, layout, tuple(values)
+        for number, vertex in (self._peek("Vertex") or {}).items():
+            normal = vertex._peek("Normal")
+            uvs = vertex._peek("UV") or {}
+            if set(vertex._children or ()) - {"Normal", "UV"} or any(uv._has_childs() for uv in uvs.values()):
+                yield number, None, None
+                continue
+            values = list(vertex._coordinates)
+            if "normal" in attributes and normal is not None:
+                values += normal._vector
+            layout_uvs = ()
+            if "uv" in attributes:
+                layout_uvs = tuple(sorted(((name, len(uv.co)) for name, uv in uvs.items()), key=_uv_order))
+                for name, uv_dimension in layout_uvs:
+                    values += uvs[name].co
+            yield number, (len(vertex._coordinates), "normal" in attributes and normal is not None, layout_uvs, ()), tuple(values)
+
+    def _iter_get(self, key, **kwargs):
+        """
+        Vertices stored in the VertexArray are merged, ordered by number,
+        with the Vertex EntryTypes.
+        """
+        if key != "Vertex" or not self._vertexarray:
+            yield from super()._iter_get(key, **kwargs)
+            return
+        vertexarray = self._vertexarray
+        numbers = vertexarray.numbers
+        rows = range(len(numbers)) if vertexarray.contiguous else sorted(range(len(numbers)), key=numbers.__getitem__)
+        if not self._entries["Vertex"]:
+            yield from vertexarray.iter_rows(rows, **kwargs)
+            return
+        run = []
+        entries = merge(
+            ((numbers[row], row, None) for row in rows),
+            ((number, None, vertex) for number, vertex in sorted(self._entries["Vertex"].items())))
+        for number, row, vertex in entries:
+            if vertex is None:
+                run.append(row)
+                continue
+            yield from vertexarray.iter_rows(run, **kwargs)
+            profiler = self._root._registry.profiler
+            pieces = vertex._iter_prettify(**kwargs)
+            yield from pieces if profiler is None else profiler._iter_entry(vertex, pieces)
+            run = []
+        yield from vertexarray.iter_rows(run, **kwargs)
 
 
+def _uv_order(item):
+    # Default uvs (name None) first, then ordered by name
+    return (item[0] is not None, str(item[0]))
+
+def _weld(values, dimension, tolerance):
+    """
+    Returns a list with the index of the vertex each vertex is merged into,
+    the index of the vertex itself for vertices which are kept.
+
+    The vertices are put in a grid with a cell size of twice the tolerance. A
+    vertex is only compared with the kept vertices in its own cell and, for each
+    axis, the neighbouring cell on the side it is closest to.
+    """
+    targets = []
+    exact = {}
+    if tolerance <= 0:
+        return [exact.setdefault(value, index) for index, value in enumerate(values)]
+    scale = 0.5 / tolerance
+    positions = [[coordinate * scale for coordinate in value[:dimension]] for value in values]
+    # Each cell is stored by one int key, the keys of neighbouring cells differ by the strides
+    lows = [math.floor(min(position[axis] for position in positions)) - 1 for axis in range(dimension)]
+    highs = [math.floor(max(position[axis] for position in positions)) + 1 for axis in range(dimension)]
+    strides = [1]
+    for axis in range(dimension - 1, 0, -1):
+        strides.insert(0, strides[0] * (highs[axis] - lows[axis] + 1))
+    grid = {}
+    for index, (value, position) in enumerate(zip(values, positions)):
+        target = exact.get(value)
+        if target is None:
+            key, keys = 0, [0]
+            for coordinate, low, stride in zip(position, lows, strides):
+                cell = math.floor(coordinate)
+                key += (cell - low) * stride
+                side = -stride if coordinate - cell < 0.5 else stride
+                keys += [other + side for other in keys]
+            for other_key in keys:
+                for other in grid.get(key + other_key, ()):
+                    if all(abs(a - b) <= tolerance for a, b in zip(value, values[other])):
+                        target = other
+                        break
+                if target is not None:
+                    break
+            if target is None:
+                target = exact[value] = index
+                grid.setdefault(key, []).append(index)
+        targets.append(target)
+    return targets
+
 class MixInVertexPool:
+    __slots__ = ()
+    _entrytypes = ("VertexPool", )
+
     def add_vertexpool(self, name):
         """
         <VertexPool> name { vertices }
@@ -16,9 +615,10 @@ class MixInVertexPool:
         may be one or several vertex pools in an egg file, but all vertices
         that make up a single polygon must come from the same vertex pool.
         """
-        if name in self.vertexpools:
-            raise ValueError("Cannot add {0!r}, the vertexpool already exists within this pegg instance.".format(name))
-        vertexpool = self._entries["VertexPool"][name] = VertexPool(self, name)
+        vertexpool = VertexPool(self, name)
+        self.get_pegg()._registry.add_vertexpool(name, vertexpool)
+        self._entries["VertexPool"][name] = vertexpool
+        self._changed()
         return vertexpool
   
     # Property vertexpools is assign to EntryType to support this property on all subclasses
\ No newline at end of file
@@ -2,12 +2,16 @@ from .entrytype import EntryType
 from .ref import MixInRef
 
 class VertexRef(EntryType, MixInRef):
+    __slots__ = ("_vertices", )
+
     def __init__(self, parent, *vertices, ref):
         super().__init__(parent=parent)
         self.set_ref(ref)
-        for vertex in vertices:
-            if not vertex in self.vertexpools[ref]._entries["Vertex"]:
-                raise KeyError("Vertex {0} not found in VertexPool {1!r}".format(vertex, ref))
+        if not self._root._registry.deferred:
+            pool_vertices = self.vertexpools[ref].vertices
+            for vertex in vertices:
+                if not vertex in pool_vertices:
+                    raise KeyError("Vertex {0} not found in VertexPool {1!r}".format(vertex, ref))
         self._vertices = vertices
 
     def get_content(self):
@@ -15,5 +19,9 @@ class VertexRef(EntryType, MixInRef):
 
 
 class MixInVertexRef:
+    __slots__ = ()
+    _entrytypes = ("VertexRef", )
+
     def append_vertexref(self, *vertices, ref):
-        self._entries["VertexRef"].append(VertexRef(self, *vertices, ref=ref))
\ No newline at end of file
+        self._entries["VertexRef"].append(VertexRef(self, *vertices, ref=ref))
+        self._changed()
\ No newline at end of file